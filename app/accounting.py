@@ -0,0 +1,220 @@
+import logging
+import time
+import uuid
+from flask import current_app, g, request, jsonify, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.cache import TwoTierCache
+from app.database import db, StudentGroup, UserOrganization, get_exam
+from app.redis import redis_client
+
+# Per-organization resource accounting. Every authenticated request is
+# attributed to one organization, from its route (org_id, exam_id, group_id or
+# an organization_id argument) or else from the caller's single membership,
+# and its request count, DB time, rows returned and response bytes are added
+# to per-minute Redis sorted sets. Summing the last N buckets gives rolling
+# windows for the top-N report and for the optional per-organization budgets
+# that answer 429 once exceeded. Attribution and the budget check happen in
+# auth_middleware (check_tenant_budget), so anonymous callers can neither
+# spend nor exhaust an organization's budget; they are not counted at all.
+# Neither can outsiders: a route's organization is only charged when the
+# caller is a member of it, otherwise the caller's own organization is.
+#
+#   acct:<metric>:<minute>   zset organization_id -> amount in that minute
+USAGE_KEY = 'acct:{}:{}'
+METRICS = ('requests', 'db_ms', 'rows', 'bytes')
+UNATTRIBUTED = 'unattributed'
+MAX_WINDOW_MINUTES = 60
+BUCKET_TTL = (MAX_WINDOW_MINUTES + 5) * 60
+DEFAULT_BUDGET_WINDOW_MINUTES = 5
+# Exam-taking endpoints: counted, but a student mid-exam is never throttled
+BUDGET_EXEMPT_ENDPOINTS = frozenset({'exams.save_answers', 'exams.submit_attempt', 'exams.heartbeat'})
+
+logger = logging.getLogger(__name__)
+
+
+def _load_group_organization(group_id):
+    return db.session.query(StudentGroup.organization_id).filter_by(id=uuid.UUID(group_id)).scalar()
+
+def _load_user_organizations(user_id):
+    return sorted(
+        str(org_id) for (org_id,) in
+        db.session.query(UserOrganization.organization_id).filter_by(user_id=user_id)
+    )
+
+
+group_organizations = TwoTierCache('group_organization', _load_group_organization, dump=str, load=uuid.UUID, ttl=3600)
+group_organizations.invalidate_on_commit(StudentGroup, lambda group: str(group.id))
+
+user_organizations = TwoTierCache('user_organizations', _load_user_organizations, ttl=300, max_local=4096)
+user_organizations.invalidate_on_commit(UserOrganization, lambda membership: str(membership.user_id))
+
+
+def _minute(now=None):
+    return int((now or time.time()) // 60)
+
+
+def route_organization():
+    """Organization named by the current route or its arguments, or ``None``."""
+    view_args = request.view_args or {}
+    try:
+        if view_args.get('org_id'):
+            return str(uuid.UUID(view_args['org_id']))
+        if view_args.get('exam_id'):
+            exam = get_exam(uuid.UUID(view_args['exam_id']))
+            return str(exam.organization_id) if exam else None
+        if view_args.get('group_id'):
+            org_id = group_organizations.get(uuid.UUID(view_args['group_id']))
+            return str(org_id) if org_id else None
+        if request.args.get('organization_id'):
+            return str(uuid.UUID(request.args['organization_id']))
+    except ValueError:
+        pass
+    return None
+
+
+def member_organization(user_id):
+    """The caller's organization when it belongs to exactly one."""
+    if not user_id:
+        return None
+    organizations = user_organizations.get(user_id)
+    return organizations[0] if len(organizations) == 1 else None
+
+
+def record_usage(organization_id, usage, now=None):
+    minute = _minute(now)
+    pipe = redis_client.pipeline(transaction=False)
+    for metric in METRICS:
+        if usage.get(metric):
+            key = USAGE_KEY.format(metric, minute)
+            pipe.zincrby(key, usage[metric], organization_id)
+            pipe.expire(key, BUCKET_TTL)
+    pipe.execute()
+
+
+def organization_usage(organization_id, minutes, metrics=METRICS, now=None):
+    """``{metric: total}`` for one organization over the last ``minutes``."""
+    current = _minute(now)
+    pipe = redis_client.pipeline(transaction=False)
+    for metric in metrics:
+        for minute in range(current - minutes + 1, current + 1):
+            pipe.zscore(USAGE_KEY.format(metric, minute), organization_id)
+    scores = pipe.execute()
+    return {
+        metric: sum(score or 0 for score in scores[i * minutes:(i + 1) * minutes])
+        for i, metric in enumerate(metrics)
+    }
+
+
+def top_organizations(metric, minutes, limit, now=None):
+    """The ``limit`` heaviest organizations by ``metric`` over the last ``minutes``, with all metrics."""
+    current = _minute(now)
+    minutes = max(1, min(minutes, MAX_WINDOW_MINUTES))
+    window = range(current - minutes + 1, current + 1)
+    scratch = {m: f"acct:window:{uuid.uuid4().hex}:{m}" for m in METRICS}
+
+    pipe = redis_client.pipeline(transaction=False)
+    for m in METRICS:
+        pipe.zunionstore(scratch[m], [USAGE_KEY.format(m, minute) for minute in window])
+    pipe.zrevrange(scratch[metric], 0, limit - 1, withscores=True)
+    ranked = pipe.execute()[-1]
+
+    pipe = redis_client.pipeline(transaction=False)
+    for organization_id, _ in ranked:
+        for m in METRICS:
+            pipe.zscore(scratch[m], organization_id)
+    pipe.delete(*scratch.values())
+    scores = pipe.execute()
+
+    return [
+        {"organization_id": organization_id,
+         **{m: round(scores[i * len(METRICS) + j] or 0, 3) for j, m in enumerate(METRICS)}}
+        for i, (organization_id, _) in enumerate(ranked)
+    ]
+
+
+def budget_for(app, organization_id):
+    budgets = app.config.get('TENANT_BUDGETS') or {}
+    return budgets.get(organization_id) or budgets.get('*')
+
+
+def over_budget(app, organization_id):
+    """``(metric, limit, used)`` for the first exhausted budget, or ``None``."""
+    budget = budget_for(app, organization_id)
+    if not budget:
+        return None
+    minutes = app.config.get('TENANT_BUDGET_WINDOW_MINUTES', DEFAULT_BUDGET_WINDOW_MINUTES)
+    metrics = [m for m in METRICS if m in budget]
+    used = organization_usage(organization_id, minutes, metrics)
+    for metric in metrics:
+        if used[metric] >= budget[metric]:
+            return metric, budget[metric], used[metric]
+    return None
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and '_tenant_usage' in g:
+        context._tenant_usage_started = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_tenant_usage_started', None)
+    if started is None or not has_request_context() or '_tenant_usage' not in g:
+        return
+    usage = g._tenant_usage
+    usage['db_ms'] += (time.perf_counter() - started) * 1000
+    if cursor.description is not None and cursor.rowcount > 0:
+        usage['rows'] += cursor.rowcount
+
+
+def check_tenant_budget(user_id):
+    """Attribute the request to one of ``user_id``'s organizations once they are authenticated.
+
+    Returns a 429 response when that organization is over a budget and the
+    endpoint is not exempt, else ``None``.
+    """
+    if '_tenant_usage' not in g:
+        return None
+    try:
+        organization_id = route_organization()
+        if organization_id not in user_organizations.get(user_id):
+            organization_id = member_organization(user_id)
+        g._tenant_organization = organization_id
+        exhausted = (organization_id and request.endpoint not in BUDGET_EXEMPT_ENDPOINTS
+                     and over_budget(current_app, organization_id))
+    except Exception as e:
+        logger.warning("Tenant accounting unavailable: %s", e)
+        return None
+    if not exhausted:
+        return None
+    metric, limit, used = exhausted
+    minutes = current_app.config.get('TENANT_BUDGET_WINDOW_MINUTES', DEFAULT_BUDGET_WINDOW_MINUTES)
+    response = jsonify({
+        "success": False,
+        "error": f"Organization over its {metric} budget ({used:.0f} of {limit} in {minutes} min)"
+    })
+    response.headers['Retry-After'] = str(60 - int(time.time()) % 60)
+    return response, 429
+
+
+def init_tenant_accounting(app):
+    @app.before_request
+    def start_tenant_usage():
+        g._tenant_usage = {'requests': 1, 'db_ms': 0.0, 'rows': 0, 'bytes': 0}
+
+    @app.after_request
+    def record_tenant_usage(response):
+        usage = g.pop('_tenant_usage', None)
+        if usage is None or not g.get('user_id'):
+            return response
+        try:
+            organization_id = g.get('_tenant_organization') or member_organization(g.user_id)
+            if not response.is_streamed:
+                usage['bytes'] = response.calculate_content_length() or 0
+            usage['db_ms'] = round(usage['db_ms'], 3)
+            record_usage(organization_id or UNATTRIBUTED, usage)
+        except Exception as e:
+            logger.warning("Could not record tenant usage: %s", e)
+        return response
@@ -0,0 +1,71 @@
+import datetime
+import uuid
+from redis import asyncio as aioredis
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from app.database import APIToken, Permission, RolePermission, UserRole
+from app.redis import REDIS_URL
+from app.tokens import hash_token, validate_jwt_token
+
+# Async counterparts of db.session and the Redis clients, used by the ASGI
+# serving mode (run_asgi.py). Set up once per process by init_async().
+engine = None
+async_session = None
+redis_client = None
+
+
+def async_database_uri(uri):
+    """Swap the sync driver in a SQLAlchemy URI for asyncpg."""
+    scheme, rest = uri.split('://', 1)
+    return f"postgresql+asyncpg://{rest}"
+
+
+def init_async(config):
+    global engine, async_session, redis_client
+    engine = create_async_engine(
+        async_database_uri(config['SQLALCHEMY_DATABASE_URI']),
+        **config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+    )
+    async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    # Same settings as the sync client in auth_routes (bytes, not str)
+    redis_client = aioredis.Redis.from_url(REDIS_URL)
+
+
+async def close_async():
+    if engine is not None:
+        await engine.dispose()
+    if redis_client is not None:
+        await redis_client.close()
+
+
+async def authenticate(request):
+    """Return the caller's user ID from a Bearer JWT or API token, else ``None``."""
+    auth_header = request.headers.get("Authorization", "")
+    if not auth_header.startswith("Bearer "):
+        return None
+    token = auth_header.split(" ", 1)[1]
+    user_id, ok = validate_jwt_token(token)
+    if ok:
+        return uuid.UUID(user_id)
+
+    async with async_session() as session:
+        api_token = await session.scalar(
+            select(APIToken).where(
+                APIToken.token == hash_token(token),
+                APIToken.revoked.is_(False)
+            )
+        )
+    if api_token and api_token.expires_at > datetime.datetime.utcnow():
+        return api_token.user_id
+    return None
+
+
+async def has_permission(session, user_id, permission_name):
+    """Async equivalent of ``rbac.authorize`` as a single query."""
+    return await session.scalar(
+        select(Permission.id)
+        .join(RolePermission, RolePermission.permission_id == Permission.id)
+        .join(UserRole, UserRole.role_id == RolePermission.role_id)
+        .where(UserRole.user_id == user_id, Permission.name == permission_name)
+        .limit(1)
+    ) is not None
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import uuid
+
+# Compact binary form of ExamAttempt.answers. Answers are stored positionally
+# against a layout: the exam's question IDs in order, each with its option IDs
+# in order. Layouts are content-addressed, so a packed value names the exact
+# layout it was written with and stays decodable after the exam changes.
+#
+#   version    1 byte
+#   layout id  16 bytes
+#   count      varint, number of layout positions
+#   present    bitset over positions, ceil(count / 8) bytes
+#   values     one per present position:
+#                SINGLE  varint option index
+#                MULTI   bitset over the question's options
+#                TEXT    varint byte length + UTF-8
+#                NULL    nothing
+#   overflow   varint byte length + JSON object of answers that fit none of
+#              the above (unknown question or option IDs, other value types)
+#
+# Pure functions with no database or Flask dependencies, so migrations can use
+# them too. Multi-select answers come back in option order.
+FORMAT_VERSION = 1
+SINGLE, MULTI, TEXT, NULL = range(4)
+
+
+def layout_id(layout):
+    """Content-derived ID of a ``[[question_id, [option_id, ...]], ...]`` layout."""
+    digest = hashlib.sha256(json.dumps(layout, separators=(',', ':')).encode()).digest()
+    return uuid.UUID(bytes=digest[:16])
+
+
+def _varint(n):
+    out = bytearray()
+    while True:
+        byte = n & 0x7f
+        n >>= 7
+        if n:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return out
+
+
+def _read_varint(data, pos):
+    shift = result = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _encode_value(value, option_index):
+    if value is None:
+        return bytes((NULL,))
+    if option_index:
+        if isinstance(value, str) and value in option_index:
+            return bytes((SINGLE,)) + _varint(option_index[value])
+        if isinstance(value, list) and all(isinstance(v, str) and v in option_index for v in value):
+            bits = bytearray((len(option_index) + 7) // 8)
+            for v in value:
+                j = option_index[v]
+                bits[j // 8] |= 1 << (j % 8)
+            return bytes((MULTI,)) + bits
+        return None
+    if isinstance(value, str):
+        text = value.encode()
+        return bytes((TEXT,)) + _varint(len(text)) + text
+    return None
+
+
+def encode(answers, layout, layout_uuid=None):
+    """Pack an answers dict (the JSON API shape) against ``layout``."""
+    answers = answers or {}
+    count = len(layout)
+    present = bytearray((count + 7) // 8)
+    values = bytearray()
+    overflow = {}
+    seen = set()
+    for i, (question_id, option_ids) in enumerate(layout):
+        if question_id not in answers:
+            continue
+        seen.add(question_id)
+        value = answers[question_id]
+        encoded = _encode_value(value, {option_id: j for j, option_id in enumerate(option_ids)})
+        if encoded is None:
+            overflow[question_id] = value
+            continue
+        present[i // 8] |= 1 << (i % 8)
+        values += encoded
+    for question_id, value in answers.items():
+        if question_id not in seen:
+            overflow[question_id] = value
+
+    extra = json.dumps(overflow, separators=(',', ':')).encode() if overflow else b''
+    return b''.join((
+        bytes((FORMAT_VERSION,)),
+        (layout_uuid or layout_id(layout)).bytes,
+        _varint(count), present, values,
+        _varint(len(extra)), extra
+    ))
+
+
+def packed_layout_id(data):
+    """The layout ID a packed value was written against."""
+    data = memoryview(data).cast('B')
+    if data[0] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported packed answers version {data[0]}")
+    return uuid.UUID(bytes=bytes(data[1:17]))
+
+
+def iter_packed(data, layout):
+    """Yield ``(position, tag, value)`` for each packed answer, then the overflow dict.
+
+    ``value`` is an option index (SINGLE), a frozenset of option indexes
+    (MULTI), a str (TEXT) or ``None`` (NULL). The last item yielded is
+    ``(None, None, overflow)``.
+    """
+    data = memoryview(data).cast('B')
+    count, pos = _read_varint(data, 17)
+    if count != len(layout):
+        raise ValueError("Packed answers do not match the layout")
+    present = data[pos:pos + (count + 7) // 8]
+    pos += len(present)
+    for i in range(count):
+        if not present[i // 8] & (1 << (i % 8)):
+            continue
+        tag = data[pos]
+        pos += 1
+        if tag == SINGLE:
+            value, pos = _read_varint(data, pos)
+        elif tag == MULTI:
+            width = (len(layout[i][1]) + 7) // 8
+            bits = data[pos:pos + width]
+            pos += width
+            value = frozenset(j for j in range(len(layout[i][1])) if bits[j // 8] & (1 << (j % 8)))
+        elif tag == TEXT:
+            length, pos = _read_varint(data, pos)
+            value = bytes(data[pos:pos + length]).decode()
+            pos += length
+        else:
+            value = None
+        yield i, tag, value
+    length, pos = _read_varint(data, pos)
+    yield None, None, json.loads(bytes(data[pos:pos + length])) if length else {}
+
+
+def decode(data, layout):
+    """Unpack to the JSON API shape: ``{question_id: option_id | [option_id] | text}``."""
+    answers = {}
+    for i, tag, value in iter_packed(data, layout):
+        if i is None:
+            answers.update(value)
+            break
+        question_id, option_ids = layout[i]
+        if tag == SINGLE:
+            answers[question_id] = option_ids[value]
+        elif tag == MULTI:
+            answers[question_id] = [option_ids[j] for j in sorted(value)]
+        else:
+            answers[question_id] = value
+    return answers
@@ -0,0 +1,134 @@
+import uuid
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import func, literal, update
+from sqlalchemy.orm import selectinload
+from sqlalchemy.dialects.postgresql import JSONB, insert
+from app.answer_codec import decode, encode, layout_id, packed_layout_id
+from app.cache import TwoTierCache
+from app.database import db, AnswerLayout, ExamAttempt, Question
+from app.exam_versions import exam_questions
+
+# Storage of attempt answers. Ongoing attempts autosave into the JSONB
+# ``answers`` column; with ANSWER_STORAGE = 'packed' the grading job then moves
+# them into ``answers_packed`` (app/answer_codec.py), which is what finished
+# attempts - nearly all rows - keep. Read answers through attempt_answers().
+# Attempts graded before packing was turned on keep JSON until `flask answers
+# pack` converts them.
+PACK_BATCH = 1000
+
+
+def layout_from_questions(questions):
+    """Answer layout for an exam's questions (with options loaded): sorted by ID, so stable."""
+    return [
+        [str(question.id), sorted(str(option.id) for option in question.options)]
+        for question in sorted(questions, key=lambda q: str(q.id))
+    ]
+
+
+def _load_layout(layout_uuid):
+    return db.session.query(AnswerLayout.layout).filter_by(id=uuid.UUID(layout_uuid)).scalar()
+
+
+# Layouts never change once written
+layouts = TwoTierCache('answer_layout', _load_layout, ttl=24 * 3600, max_local=256)
+
+
+def get_layout(layout_uuid):
+    layout = layouts.get(layout_uuid)
+    if layout is None:
+        raise LookupError(f"Answer layout {layout_uuid} not found")
+    return layout
+
+
+def save_layout(exam_id, layout):
+    """Store ``layout`` unless it already exists; returns its ID."""
+    layout_uuid = layout_id(layout)
+    db.session.execute(
+        insert(AnswerLayout.__table__)
+        .values(id=layout_uuid, exam_id=exam_id, layout=layout)
+        .on_conflict_do_nothing()
+    )
+    layouts.prime({str(layout_uuid): layout})
+    return layout_uuid
+
+
+def attempt_answers(attempt):
+    """The attempt's answers in the JSON API shape, whichever column holds them."""
+    if attempt.answers_packed is not None:
+        data = attempt.answers_packed
+        return decode(data, get_layout(packed_layout_id(data)))
+    return attempt.answers or {}
+
+
+def autosave_statement(attempt_id, exam_id, user_id, answers):
+    """UPDATE merging ``answers`` into an ongoing attempt's saved answers.
+
+    The merge happens in Postgres (``jsonb ||``), so concurrent autosaves each
+    add their questions instead of overwriting one another. Matches no row
+    once the attempt is closed.
+    """
+    return update(ExamAttempt).where(
+        ExamAttempt.id == attempt_id,
+        ExamAttempt.exam_id == exam_id,
+        ExamAttempt.user_id == user_id,
+        ExamAttempt.end_time.is_(None)
+    ).values(
+        answers=func.coalesce(ExamAttempt.answers, literal({}, JSONB)).op('||', return_type=JSONB)(
+            literal(answers, JSONB)
+        )
+    ).execution_options(synchronize_session=False)
+
+
+def packing_enabled():
+    return current_app.config.get('ANSWER_STORAGE') == 'packed'
+
+
+def pack_answers(attempt, questions):
+    """Move the attempt's answers into ``answers_packed`` (not committed)."""
+    layout = layout_from_questions(questions)
+    layout_uuid = save_layout(attempt.exam_id, layout)
+    attempt.answers_packed = encode(attempt_answers(attempt), layout, layout_uuid)
+    attempt.answers = None
+
+
+def pack_graded_attempts(batch=PACK_BATCH):
+    """Pack the JSON answers of already graded attempts; returns how many were packed.
+
+    Only with ANSWER_STORAGE = 'packed'. Commits every ``batch`` attempts.
+    """
+    if not packing_enabled():
+        raise RuntimeError("ANSWER_STORAGE is not 'packed'")
+    pending = ExamAttempt.query.filter(
+        ExamAttempt.status == 'graded',
+        ExamAttempt.answers_packed.is_(None),
+        ExamAttempt.answers.isnot(None)
+    )
+    exam_ids = [exam_id for (exam_id,) in pending.with_entities(ExamAttempt.exam_id).distinct()]
+    packed = 0
+    for exam_id in exam_ids:
+        questions = exam_questions(exam_id).options(selectinload(Question.options)).all()
+        layout = layout_from_questions(questions)
+        layout_uuid = save_layout(exam_id, layout)
+        while True:
+            attempts = pending.filter(ExamAttempt.exam_id == exam_id).limit(batch).all()
+            if not attempts:
+                break
+            for attempt in attempts:
+                attempt.answers_packed = encode(attempt_answers(attempt), layout, layout_uuid)
+                attempt.answers = None
+            db.session.commit()
+            packed += len(attempts)
+    return packed
+
+
+answers_cli = AppGroup('answers', help='Manage stored attempt answers.')
+
+
+@answers_cli.command('pack')
+def pack_command():
+    """Pack the answers of attempts graded before ANSWER_STORAGE was 'packed'."""
+    if not packing_enabled():
+        raise click.ClickException("Set ANSWER_STORAGE=packed first")
+    click.echo(f"packed {pack_graded_attempts()} attempts")
@@ -0,0 +1,262 @@
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.redis import redis_client
+
+# Two-tier cache for reference data: a small in-process LRU in front of Redis,
+# in front of a loader (usually one query). Values cross Redis as JSON via
+# each cache's dump/load pair, so callers get plain typed values, never ORM
+# instances tied to another session.
+#
+#   cache:<name>:<key>       Redis tier (JSON; NEGATIVE marks "no such row")
+#   cache:gen:<name>:<key>   generation, INCR'd by every invalidation
+#   cache:invalidate         pub/sub channel; every process drops the local entry
+#
+# A loaded value is written only if the key's generation is still the one read
+# before loading, so an invalidation that lands mid-load is never overwritten
+# with the value it invalidated. A missed invalidation message is bounded by
+# the short local TTL.
+REDIS_KEY = 'cache:{}:{}'
+GEN_KEY = 'cache:gen:{}:{}'
+INVALIDATE_CHANNEL = 'cache:invalidate'
+NEGATIVE = '__none__'
+# Far longer than any load; an expired generation only ever skips a write
+GEN_TTL = 24 * 3600
+
+logger = logging.getLogger(__name__)
+
+caches = {}
+
+# KEYS: value, generation; ARGV: generation read before loading, value, ttl
+SET_IF_CURRENT = redis_client.register_script("""
+    if (redis.call('GET', KEYS[2]) or '') ~= ARGV[1] then
+        return 0
+    end
+    redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    return 1
+""")
+
+
+class TwoTierCache:
+    def __init__(self, name, loader, dump=None, load=None, ttl=300, local_ttl=30,
+                 negative_ttl=30, max_local=1024, jitter=0.1):
+        """``loader(key)`` returns the value or ``None``; ``dump``/``load`` convert it to and from JSON."""
+        self.name = name
+        self.loader = loader
+        self.dump = dump or (lambda value: value)
+        self.load = load or (lambda data: data)
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+        self.negative_ttl = negative_ttl
+        self.max_local = max_local
+        self.jitter = jitter
+        self.local = OrderedDict()  # key -> (expires_at, value, approximate size)
+        self.lock = threading.Lock()
+        self.counters = dict.fromkeys(('local_hits', 'redis_hits', 'misses', 'negative_hits', 'errors'), 0)
+        caches[name] = self
+
+    def _jittered(self, ttl):
+        return max(int(ttl * random.uniform(1 - self.jitter, 1 + self.jitter)), 1)
+
+    def _count(self, counter):
+        with self.lock:
+            self.counters[counter] += 1
+
+    def _get_local(self, key):
+        with self.lock:
+            entry = self.local.get(key)
+            if entry is None:
+                return False, None
+            if entry[0] < time.monotonic():
+                del self.local[key]
+                return False, None
+            self.local.move_to_end(key)
+            return True, entry[1]
+
+    def _set_local(self, key, value, size, ttl):
+        with self.lock:
+            self.local[key] = (time.monotonic() + min(ttl, self.local_ttl), value, size)
+            self.local.move_to_end(key)
+            while len(self.local) > self.max_local:
+                self.local.popitem(last=False)
+
+    def get(self, key):
+        _ensure_listener()
+        key = str(key)
+        found, value = self._get_local(key)
+        if found:
+            self._count('negative_hits' if value is None else 'local_hits')
+            return value
+
+        redis_key = REDIS_KEY.format(self.name, key)
+        generation = None
+        try:
+            raw, generation = redis_client.mget(redis_key, GEN_KEY.format(self.name, key))
+        except Exception as e:
+            logger.warning("Cache %s: Redis unavailable: %s", self.name, e)
+            self._count('errors')
+            raw = None
+        if raw is not None:
+            value = None if raw == NEGATIVE else self.load(json.loads(raw))
+            self._count('negative_hits' if value is None else 'redis_hits')
+            self._set_local(key, value, sys.getsizeof(raw), self.negative_ttl if value is None else self.ttl)
+            return value
+
+        self._count('misses')
+        value = self.loader(key)
+        raw = NEGATIVE if value is None else json.dumps(self.dump(value), default=str)
+        ttl = self.negative_ttl if value is None else self.ttl
+        try:
+            written = SET_IF_CURRENT(
+                keys=[redis_key, GEN_KEY.format(self.name, key)],
+                args=[generation or '', raw, self._jittered(ttl)]
+            )
+        except Exception:
+            self._count('errors')
+            written = False
+        if written:
+            self._set_local(key, value, sys.getsizeof(raw), ttl)
+        return value
+
+    def generations(self, *keys):
+        """``{key: generation}`` to read before loading values passed to ``prime``."""
+        keys = [str(key) for key in keys]
+        return dict(zip(keys, (g or '' for g in redis_client.mget([GEN_KEY.format(self.name, k) for k in keys]))))
+
+    def prime(self, values, generations=None):
+        """Write ``{key: value}`` to Redis (and this process) ahead of use, resetting TTLs.
+
+        With ``generations`` (from ``generations()`` before loading the values),
+        keys invalidated since are skipped. Returns how many were written.
+        """
+        pipe = redis_client.pipeline(transaction=False)
+        entries = []
+        for key, value in values.items():
+            key = str(key)
+            raw = NEGATIVE if value is None else json.dumps(self.dump(value), default=str)
+            ttl = self.negative_ttl if value is None else self.ttl
+            if generations is None:
+                pipe.set(REDIS_KEY.format(self.name, key), raw, ex=self._jittered(ttl))
+            else:
+                SET_IF_CURRENT(
+                    keys=[REDIS_KEY.format(self.name, key), GEN_KEY.format(self.name, key)],
+                    args=[generations.get(key, ''), raw, self._jittered(ttl)],
+                    client=pipe
+                )
+            entries.append((key, value, sys.getsizeof(raw), ttl))
+        written = 0
+        for (key, value, size, ttl), ok in zip(entries, pipe.execute()):
+            if ok:
+                self._set_local(key, value, size, ttl)
+                written += 1
+        return written
+
+    def refresh(self, *keys):
+        """Reload ``keys`` through the loader and prime them."""
+        generations = self.generations(*keys)
+        return self.prime({key: self.loader(key) for key in generations}, generations)
+
+    def cached(self, *keys):
+        """Which of ``keys`` currently have an entry in Redis."""
+        pipe = redis_client.pipeline(transaction=False)
+        for key in keys:
+            pipe.exists(REDIS_KEY.format(self.name, key))
+        return [key for key, exists in zip(keys, pipe.execute()) if exists]
+
+    def invalidate(self, *keys):
+        """Drop ``keys`` from Redis and from every process's local tier."""
+        keys = [str(key) for key in keys]
+        for key in keys:
+            self.drop_local(key)
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            for key in keys:
+                pipe.incr(GEN_KEY.format(self.name, key))
+                pipe.expire(GEN_KEY.format(self.name, key), GEN_TTL)
+            pipe.delete(*[REDIS_KEY.format(self.name, key) for key in keys])
+            pipe.publish(INVALIDATE_CHANNEL, json.dumps({"cache": self.name, "keys": keys}))
+            pipe.execute()
+        except Exception as e:
+            logger.warning("Cache %s: could not invalidate %s: %s", self.name, keys, e)
+
+    def drop_local(self, key):
+        with self.lock:
+            self.local.pop(key, None)
+
+    def invalidate_on_commit(self, model, key):
+        """Invalidate ``key(obj)`` whenever a ``model`` row is written and committed.
+
+        ``key`` may return several keys (e.g. old and new name) as a tuple.
+        """
+        pending = f"cache_pending_{self.name}"
+
+        @event.listens_for(Session, 'before_flush')
+        def collect(session, flush_context, instances):
+            for obj in (*session.new, *session.dirty, *session.deleted):
+                if isinstance(obj, model):
+                    keys = key(obj)
+                    session.info.setdefault(pending, set()).update(keys if isinstance(keys, tuple) else (keys,))
+
+        @event.listens_for(Session, 'after_commit')
+        def invalidate(session):
+            keys = session.info.pop(pending, None)
+            if keys:
+                self.invalidate(*keys)
+
+        @event.listens_for(Session, 'after_soft_rollback')
+        def discard(session, previous_transaction):
+            if not previous_transaction.nested:
+                session.info.pop(pending, None)
+
+    def stats(self):
+        with self.lock:
+            lookups = sum(self.counters[c] for c in ('local_hits', 'redis_hits', 'misses', 'negative_hits'))
+            return {
+                **self.counters,
+                "hit_rate": round(1 - self.counters['misses'] / lookups, 4) if lookups else None,
+                "local_entries": len(self.local),
+                "local_bytes": sum(size for _, _, size in self.local.values())
+            }
+
+
+def cache_stats():
+    """Per-cache counters and local memory for this process."""
+    return {name: cache.stats() for name, cache in caches.items()}
+
+
+_listener_pid = None
+_listener_lock = threading.Lock()
+
+
+def _listen():
+    while True:
+        try:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(INVALIDATE_CHANNEL)
+            for message in pubsub.listen():
+                data = json.loads(message['data'])
+                cache = caches.get(data.get('cache'))
+                if cache:
+                    for key in data.get('keys', ()):
+                        cache.drop_local(key)
+        except Exception as e:
+            logger.warning("Cache invalidation listener reconnecting: %s", e)
+            time.sleep(1)
+
+
+def _ensure_listener():
+    """Start this process's invalidation subscriber (again after a fork)."""
+    global _listener_pid
+    if _listener_pid == os.getpid():
+        return
+    with _listener_lock:
+        if _listener_pid != os.getpid():
+            threading.Thread(target=_listen, name='cache-invalidation', daemon=True).start()
+            _listener_pid = os.getpid()
@@ -10,7 +10,6 @@ from app.database import db, Tenant, User, APIToken, assign_user_role
 bp = Blueprint('auth', __name__)
 
 redis_client = Redis()
-logging.basicConfig(level=logging.INFO)
 
 # Placeholder for context and models
 ctx = None  # Not needed in Python, but kept for similarity
@@ -1,11 +1,18 @@
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.dialects.postgresql import UUID, JSONB
-from sqlalchemy import Boolean, Integer, Text, DateTime, ForeignKey, Numeric
+from flask.cli import with_appcontext
+from sqlalchemy.dialects.postgresql import UUID, JSONB, BYTEA, TSVECTOR, insert as pg_insert
+from sqlalchemy import Boolean, Integer, Text, DateTime, ForeignKey, Numeric, Computed, DDL, event, inspect
+from sqlalchemy.orm import deferred
 from datetime import datetime
+from typing import NamedTuple, Optional
+import click
+import os
 import uuid
 from flask_migrate import Migrate
+from app.cache import TwoTierCache
+from app.replicas import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 
 class Tenant(db.Model):
@@ -63,6 +70,10 @@ class RolePermission(db.Model):
     role_id = db.Column(UUID(as_uuid=True), db.ForeignKey('roles.id'), nullable=False)
     permission_id = db.Column(UUID(as_uuid=True), db.ForeignKey('permissions.id'), nullable=False)
 
+    __table_args__ = (
+        db.Index('ix_role_permissions_role_id', 'role_id'),
+    )
+
     role = db.relationship('Role', backref='role_permissions')
     permission = db.relationship('Permission', backref='role_permissions')
 
@@ -72,6 +83,10 @@ class UserRole(db.Model):
     user_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id'), nullable=False)
     role_id = db.Column(UUID(as_uuid=True), db.ForeignKey('roles.id'), nullable=False)
 
+    __table_args__ = (
+        db.Index('ix_user_roles_user_id_role_id', 'user_id', 'role_id'),
+    )
+
     user = db.relationship('User', backref='user_roles')
     role = db.relationship('Role', backref='user_roles')
 
@@ -82,6 +97,11 @@ class UserOrganization(db.Model):
     organization_id = db.Column(UUID(as_uuid=True), db.ForeignKey('organizations.id'), nullable=False)
     role_id = db.Column(UUID(as_uuid=True), db.ForeignKey('roles.id'), nullable=False)
 
+    __table_args__ = (
+        db.UniqueConstraint('organization_id', 'user_id', name='uq_user_organizations_org_user'),
+        db.Index('ix_user_organizations_user_id', 'user_id'),
+    )
+
     user = db.relationship('User', backref='user_organizations')
     organization = db.relationship('Organization', backref='user_organizations')
     role = db.relationship('Role', backref='user_organizations')
@@ -95,6 +115,10 @@ class APIToken(db.Model):
     revoked = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_api_tokens_user_id_active', 'user_id', postgresql_where=db.text('NOT revoked')),
+    )
+
     user = db.relationship('User', backref='api_tokens')
 
 class Exam(db.Model):
@@ -112,10 +136,22 @@ class Exam(db.Model):
     created_at = db.Column(DateTime, default=datetime.utcnow, nullable=False)
     scheduled_date = db.Column(DateTime, nullable=True)
     config = db.Column(JSONB, nullable=True)
+    # Versions of a paper point at the original; clones start a new lineage
+    parent_exam_id = db.Column(UUID(as_uuid=True), db.ForeignKey('exams.id'), nullable=True)
+    version = db.Column(Integer, default=1, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_exams_organization_id_created_at', 'organization_id', 'created_at'),
+        db.Index('ix_exams_parent_exam_id', 'parent_exam_id'),
+    )
 
     organization = db.relationship('Organization', backref=db.backref('exams', lazy=True))
     creator = db.relationship('User', backref=db.backref('created_exams', lazy=True))
 
+def _has_pg_trgm(ddl, target, bind, **kw):
+    # create_schema installs pg_trgm first where available; without it the index is skipped, as in the migration
+    return bind.execute(db.text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).scalar() is not None
+
 class Question(db.Model):
     __tablename__ = 'questions'
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -127,6 +163,20 @@ class Question(db.Model):
     order = db.Column(Integer, nullable=True)
     created_at = db.Column(DateTime, default=datetime.utcnow, nullable=False)
     diagram_url = db.Column(Text, nullable=True)
+    # The owning exam's organization, so question search filters without a join; see app/search.py
+    organization_id = db.Column(UUID(as_uuid=True), db.ForeignKey('organizations.id'), nullable=False)
+    search_vector = deferred(db.Column(TSVECTOR, Computed("to_tsvector('english', text)", persisted=True)))
+
+    __table_args__ = (
+        db.Index('ix_questions_exam_id_order', 'exam_id', 'order'),
+        db.Index('ix_questions_organization_id_type', 'organization_id', 'type'),
+        db.Index('ix_questions_search_vector', 'search_vector', postgresql_using='gin'),
+        db.Index(
+            'ix_questions_text_trgm', db.text('lower(text) gin_trgm_ops'), postgresql_using='gin'
+        ).ddl_if(callable_=_has_pg_trgm),
+    )
+    # Don't read the generated search_vector back after every insert
+    __mapper_args__ = {'eager_defaults': False}
 
     exam = db.relationship('Exam', backref=db.backref('questions', lazy=True))
 
@@ -139,8 +189,25 @@ class Option(db.Model):
     iscorrect = db.Column(Boolean, default=False, nullable=False)
     created_at = db.Column(DateTime, default=datetime.utcnow, nullable=False)
 
+    __table_args__ = (
+        db.Index('ix_options_question_id_order', 'question_id', 'order'),
+    )
+
     question = db.relationship('Question', backref=db.backref('options', lazy=True))
 
+class ExamQuestionLink(db.Model):
+    """A question an exam borrows from the exam that owns it; see app/exam_versions.py"""
+    __tablename__ = 'exam_question_links'
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    exam_id = db.Column(UUID(as_uuid=True), db.ForeignKey('exams.id'), nullable=False)
+    question_id = db.Column(UUID(as_uuid=True), db.ForeignKey('questions.id'), nullable=False)
+    order = db.Column(Integer, nullable=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('exam_id', 'question_id', name='uq_exam_question_links_exam_question'),
+        db.Index('ix_exam_question_links_question_id', 'question_id'),
+    )
+
 class ExamAttempt(db.Model):
     __tablename__ = 'exam_attempts'
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -149,16 +216,94 @@ class ExamAttempt(db.Model):
     start_time = db.Column(DateTime, nullable=True)
     end_time = db.Column(DateTime, nullable=True)
     status = db.Column(Text, nullable=True)
+    # 'submitted' or 'auto_closed'; unlike status, kept once the attempt is graded
+    close_reason = db.Column(Text, nullable=True)
     score = db.Column(Integer, nullable=True)
     percentage = db.Column(Numeric, nullable=True)
     answers = db.Column(JSONB, nullable=True)
-    organization_id = db.Column(UUID(as_uuid=True), db.ForeignKey('organizations.id'), nullable=False)
-    created_at = db.Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Compact form of answers once graded with ANSWER_STORAGE = 'packed'; see app/answers.py
+    answers_packed = db.Column(BYTEA, nullable=True)
+    # Partition keys (month, then organization hash) must be part of the primary key; see app/partitions.py.
+    # So Postgres only enforces (id, created_at, organization_id): id itself is unique by being a uuid4,
+    # and lookups by id alone scan every partition unless they also give created_at or organization_id.
+    organization_id = db.Column(UUID(as_uuid=True), db.ForeignKey('organizations.id'), primary_key=True, nullable=False)
+    created_at = db.Column(DateTime, default=datetime.utcnow, primary_key=True, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_exam_attempts_exam_id_user_id', 'exam_id', 'user_id'),
+        # start_exam looks up the caller's ongoing attempt
+        db.Index('ix_exam_attempts_ongoing', 'exam_id', 'user_id', postgresql_where=db.text('end_time IS NULL')),
+        # Closed attempts still waiting for a grade; see close_expired_attempts in app/tasks.py
+        db.Index('ix_exam_attempts_ungraded', 'end_time',
+                 postgresql_where=db.text("end_time IS NOT NULL AND status <> 'graded'")),
+        db.Index('ix_exam_attempts_user_id', 'user_id'),
+        db.Index('ix_exam_attempts_organization_id_created_at', 'organization_id', 'created_at'),
+        {'postgresql_partition_by': 'RANGE (created_at)'},
+    )
 
     exam = db.relationship('Exam', backref=db.backref('attempts', lazy=True))
     user = db.relationship('User', backref=db.backref('exam_attempts', lazy=True))
     organization = db.relationship('Organization', backref=db.backref('exam_attempts', lazy=True))
 
+# Catch-all so inserts never fail if monthly partitions fall behind; creating the month moves its rows out
+event.listen(
+    ExamAttempt.__table__,
+    'after_create',
+    DDL("CREATE TABLE IF NOT EXISTS exam_attempts_default PARTITION OF exam_attempts DEFAULT")
+)
+
+class AnswerLayout(db.Model):
+    """Question and option order that packed answers are positioned against; see app/answer_codec.py"""
+    __tablename__ = 'answer_layouts'
+    # Derived from the layout itself (answer_codec.layout_id)
+    id = db.Column(UUID(as_uuid=True), primary_key=True)
+    exam_id = db.Column(UUID(as_uuid=True), db.ForeignKey('exams.id'), nullable=False)
+    layout = db.Column(JSONB, nullable=False)
+    created_at = db.Column(DateTime, default=datetime.utcnow, nullable=False)
+
+class ProctorEventSummary(db.Model):
+    """Heartbeats and client events of one attempt over a window; see app/proctoring.py"""
+    __tablename__ = 'proctor_event_summaries'
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # exam_attempts' primary key includes its partition keys, so no foreign key here
+    attempt_id = db.Column(UUID(as_uuid=True), nullable=False)
+    exam_id = db.Column(UUID(as_uuid=True), db.ForeignKey('exams.id'), nullable=False)
+    user_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id'), nullable=False)
+    organization_id = db.Column(UUID(as_uuid=True), db.ForeignKey('organizations.id'), nullable=False)
+    window_start = db.Column(DateTime, nullable=False)
+    window_end = db.Column(DateTime, nullable=False)
+    heartbeats = db.Column(Integer, nullable=False, default=0)
+    unfocused_heartbeats = db.Column(Integer, nullable=False, default=0)
+    focus_lost = db.Column(Integer, nullable=False, default=0)
+    max_gap_seconds = db.Column(Numeric, nullable=True)
+    time_remaining = db.Column(Integer, nullable=True)
+    events = db.Column(JSONB, nullable=True)
+    created_at = db.Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_proctor_event_summaries_attempt_id_window_start', 'attempt_id', 'window_start'),
+        db.Index('ix_proctor_event_summaries_exam_id', 'exam_id'),
+    )
+
+class ResultRollup(db.Model):
+    """Graded-attempt totals of one exam, student group or organization; see app/rollups.py"""
+    __tablename__ = 'result_rollups'
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    organization_id = db.Column(UUID(as_uuid=True), db.ForeignKey('organizations.id'), nullable=False)
+    scope = db.Column(Text, nullable=False)  # "exam", "group" or "organization"
+    scope_id = db.Column(UUID(as_uuid=True), nullable=False)
+    # Exam title, group name or organization name, so the dashboard needs no joins
+    label = db.Column(Text, nullable=True)
+    graded = db.Column(Integer, nullable=False, default=0)
+    passed = db.Column(Integer, nullable=False, default=0)
+    percentage_sum = db.Column(Numeric, nullable=False, default=0)
+    updated_at = db.Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('scope', 'scope_id', name='uq_result_rollups_scope_scope_id'),
+        db.Index('ix_result_rollups_organization_id_scope', 'organization_id', 'scope'),
+    )
+
 class StudentGroup(db.Model):
     __tablename__ = 'student_groups'
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -169,6 +314,10 @@ class StudentGroup(db.Model):
     created_at = db.Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
+    __table_args__ = (
+        db.Index('ix_student_groups_organization_id', 'organization_id'),
+    )
+
     organization = db.relationship('Organization', backref=db.backref('student_groups', lazy=True))
     creator = db.relationship('User', backref=db.backref('created_groups', lazy=True))
 
@@ -181,6 +330,11 @@ class ExamAssignment(db.Model):
     due_date = db.Column(DateTime, nullable=True)
     created_at = db.Column(DateTime, default=datetime.utcnow, nullable=False)
 
+    __table_args__ = (
+        db.Index('ix_exam_assignments_assignee', 'assigned_to_type', 'assigned_to_id'),
+        db.Index('ix_exam_assignments_exam_id', 'exam_id'),
+    )
+
     exam = db.relationship('Exam', backref=db.backref('assignments', lazy=True))
 
 class StudentGroupMember(db.Model):
@@ -189,54 +343,195 @@ class StudentGroupMember(db.Model):
     group_id = db.Column(UUID(as_uuid=True), db.ForeignKey('student_groups.id'), nullable=False)
     student_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id'), nullable=False)
 
+    __table_args__ = (
+        db.UniqueConstraint('group_id', 'student_id', name='uq_student_group_members_group_student'),
+        db.Index('ix_student_group_members_student_id', 'student_id'),
+    )
+
     group = db.relationship('StudentGroup', backref=db.backref('members', lazy=True))
     student = db.relationship('User', backref=db.backref('group_memberships', lazy=True))
 
-# --- Helper functions (unchanged) ---
+# --- Helper functions ---
+
+ROLES = ['Admin', 'Viewer', 'Student', 'Member']
+PERMISSIONS = [
+    'read:users',
+    'write:users',
+    'read:reports',
+    'write:reports',
+    'read:exams',
+    'write:exams',
+    'read:groups',
+    'write:groups',
+    'read:organizations',
+    'write:organizations'
+]
+SEED_LOCK_KEY = 0x7e4a0002
+SCHEMA_LOCK_KEY = 0x7e4a0004
 
 def seed_roles_and_permissions():
-    roles = ['Admin', 'Viewer', 'Student', 'Member']
-    for role_name in roles:
-        if not Role.query.filter_by(name=role_name).first():
-            db.session.add(Role(id=uuid.uuid4(), name=role_name))
+    """Upsert roles, permissions and Admin's grants in one transaction.
+
+    Guarded by an advisory lock so workers booting together don't race.
+    """
+    db.session.execute(db.text("SELECT pg_advisory_xact_lock(:key)"), {"key": SEED_LOCK_KEY})
+    db.session.execute(
+        pg_insert(Role.__table__).values([{"id": uuid.uuid4(), "name": name} for name in ROLES])
+        .on_conflict_do_nothing(index_elements=['name'])
+    )
+    db.session.execute(
+        pg_insert(Permission.__table__).values([{"id": uuid.uuid4(), "name": name} for name in PERMISSIONS])
+        .on_conflict_do_nothing(index_elements=['name'])
+    )
+    db.session.execute(db.text("""
+        INSERT INTO role_permissions (id, role_id, permission_id)
+        SELECT gen_random_uuid(), roles.id, permissions.id
+        FROM roles CROSS JOIN permissions
+        WHERE roles.name = 'Admin'
+          AND NOT EXISTS (
+              SELECT 1 FROM role_permissions rp
+              WHERE rp.role_id = roles.id AND rp.permission_id = permissions.id
+          )
+    """))
     db.session.commit()
 
-    permissions = [
-        'read:users',
-        'write:users',
-        'read:reports',
-        'write:reports'
-    ]
-    for perm_name in permissions:
-        if not Permission.query.filter_by(name=perm_name).first():
-            db.session.add(Permission(id=uuid.uuid4(), name=perm_name))
-    db.session.commit()
-
-    admin_role = Role.query.filter_by(name='Admin').first()
-    if admin_role:
-        for perm in Permission.query.all():
-            if not RolePermission.query.filter_by(role_id=admin_role.id, permission_id=perm.id).first():
-                db.session.add(RolePermission(id=uuid.uuid4(), role_id=admin_role.id, permission_id=perm.id))
-        db.session.commit()
+# Reference data read on hot paths, cached in-process and in Redis (see app/cache.py)
+
+class TenantConfig(NamedTuple):
+    id: str
+    name: str
+    domain: str
+    provider: Optional[str]
+    client_id: Optional[str]
+    client_secret: Optional[str]
+    auth_url: Optional[str]
+    token_url: Optional[str]
+    userinfo_url: Optional[str]
+
+class ExamSummary(NamedTuple):
+    id: uuid.UUID
+    organization_id: uuid.UUID
+    title: str
+    duration: Optional[int]
+    total_marks: Optional[int]
+    is_published: bool
+    scheduled_date: Optional[datetime]
+
+def _current_and_previous(obj, attr):
+    """Keys to invalidate for ``obj``: its current value of ``attr`` and any value it replaces."""
+    history = inspect(obj).attrs[attr].history
+    return tuple(str(v) for v in (getattr(obj, attr), *history.deleted) if v is not None)
+
+def _load_role_id(name):
+    return db.session.query(Role.id).filter_by(name=name).scalar()
+
+def _load_tenant(domain):
+    tenant = Tenant.query.filter_by(domain=domain).first()
+    if not tenant:
+        return None
+    return TenantConfig(*(getattr(tenant, field) for field in TenantConfig._fields))
+
+def _load_exam(exam_id):
+    exam = db.session.get(Exam, uuid.UUID(exam_id))
+    if not exam:
+        return None
+    return ExamSummary(*(getattr(exam, field) for field in ExamSummary._fields))
+
+def _exam_from_json(data):
+    return ExamSummary(
+        **{**data,
+           "id": uuid.UUID(data["id"]),
+           "organization_id": uuid.UUID(data["organization_id"]),
+           "scheduled_date": datetime.fromisoformat(data["scheduled_date"]) if data["scheduled_date"] else None}
+    )
+
+role_ids = TwoTierCache('role_id', _load_role_id, dump=str, load=uuid.UUID, ttl=3600)
+role_ids.invalidate_on_commit(Role, lambda role: _current_and_previous(role, 'name'))
+
+tenants = TwoTierCache(
+    'tenant', _load_tenant, dump=lambda t: t._asdict(), load=lambda d: TenantConfig(**d), ttl=600
+)
+tenants.invalidate_on_commit(Tenant, lambda tenant: _current_and_previous(tenant, 'domain'))
+
+exams = TwoTierCache('exam', _load_exam, dump=lambda e: e._asdict(), load=_exam_from_json, ttl=300)
+exams.invalidate_on_commit(Exam, lambda exam: _current_and_previous(exam, 'id'))
+
+def get_role_id(role_name):
+    return role_ids.get(role_name)
+
+def get_tenant(domain):
+    """TenantConfig for ``domain``, or ``None``."""
+    return tenants.get(domain) if domain else None
+
+def get_exam(exam_id):
+    """ExamSummary for ``exam_id``, or ``None``."""
+    return exams.get(exam_id)
 
 def assign_user_role(user_id, role_name):
-    role = Role.query.filter_by(name=role_name).first()
-    if not role:
+    role_id = get_role_id(role_name)
+    if not role_id:
         return False
-    if not UserRole.query.filter_by(user_id=user_id, role_id=role.id).first():
-        db.session.add(UserRole(id=uuid.uuid4(), user_id=user_id, role_id=role.id))
+    if not UserRole.query.filter_by(user_id=user_id, role_id=role_id).first():
+        db.session.add(UserRole(id=uuid.uuid4(), user_id=user_id, role_id=role_id))
         db.session.commit()
     return True
 
+def migration_state(conn, migrations_dir):
+    """``(current revisions, head revisions)``; no current revisions means never migrated."""
+    from alembic.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+    heads = set(ScriptDirectory(migrations_dir).get_heads())
+    return set(MigrationContext.configure(conn).get_current_heads()), heads
+
+def create_schema(conn, migrations_dir):
+    """create_all an empty database and stamp it at the migrations head.
+
+    Stamped, later boots skip this and `flask db upgrade` only applies newer
+    revisions. pg_trgm is created first where available, as the migrations do.
+    """
+    from alembic.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+    if conn.execute(db.text("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")).scalar():
+        conn.execute(db.text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    db.metadata.create_all(conn)
+    MigrationContext.configure(conn).stamp(ScriptDirectory(migrations_dir), 'head')
+
 def init_db(app):
     db.init_app(app)
     migrate.init_app(app, db)
     with app.app_context():
-        db.create_all()
+        migrations_dir = os.path.join(app.root_path, migrate.directory)
+        with db.engine.begin() as conn:
+            current, heads = migration_state(conn, migrations_dir)
+            if not current:
+                # Workers booting together: the first creates, the rest find it stamped
+                conn.execute(db.text("SELECT pg_advisory_xact_lock(:key)"), {"key": SCHEMA_LOCK_KEY})
+                current, heads = migration_state(conn, migrations_dir)
+                # Only an empty database gets create_all. One built by create_all
+                # before migrations existed has tables but no alembic_version: it
+                # is left at base, where the first revision expects exactly those
+                # tables, for `flask db upgrade` to bring up to head.
+                if not current and not inspect(conn).has_table(User.__tablename__):
+                    create_schema(conn, migrations_dir)
+                    current = heads
+        if not current:
+            app.logger.warning("Database predates migrations; run `flask db upgrade`")
+        elif current != heads:
+            app.logger.warning("Database is at %s, migrations head is %s; run `flask db upgrade`",
+                               ', '.join(sorted(current)), ', '.join(sorted(heads)))
+        else:
+            # Every boot, not only the first: rows for a missing month land in the DEFAULT partition
+            from app.partitions import ensure_attempt_partitions
+            ensure_attempt_partitions()
         seed_roles_and_permissions()
-        if not User.query.filter_by(username="testuser").first():
-            db.session.add(User(id=uuid.uuid4(), username="testuser"))
-            db.session.commit()
-        if not Organization.query.filter_by(name="Default Org").first():
-            db.session.add(Organization(id=uuid.uuid4(), name="Default Org", created_at=datetime.utcnow()))
-            db.session.commit()
\ No newline at end of file
+
+@click.command('seed-dev-data')
+@with_appcontext
+def seed_dev_data_command():
+    """Create the test user and default organization for local development."""
+    if not User.query.filter_by(username="testuser").first():
+        db.session.add(User(id=uuid.uuid4(), username="testuser"))
+    if not Organization.query.filter_by(name="Default Org").first():
+        db.session.add(Organization(id=uuid.uuid4(), name="Default Org", created_at=datetime.utcnow()))
+    db.session.commit()
+    click.echo("Seeded development data")
@@ -0,0 +1,183 @@
+import uuid
+from sqlalchemy import func, or_, select, text
+from app.database import db, AnswerLayout, Exam, ExamAttempt, Question, Option, ExamQuestionLink, get_exam
+
+# Exam cloning and versioning. The question/option tree is copied inside
+# Postgres with INSERT ... SELECT, remapping ids through a CTE, so a clone is
+# one round trip whatever the size of the paper. With ``share_questions`` the
+# new exam instead links to the existing question rows (exam_question_links)
+# and only copies one when it is edited through this exam: copy-on-write.
+#
+# An exam's questions are the ones it owns (questions.exam_id) plus the ones
+# it links to; use exam_questions() rather than filtering on exam_id.
+
+_SOURCE_QUESTIONS = """
+    WITH source AS (
+        SELECT q.id, q.type, q.text, q.marks, q.correct_answer, q."order", q.diagram_url
+        FROM questions q
+        WHERE q.exam_id = :source_id
+        UNION ALL
+        SELECT q.id, q.type, q.text, q.marks, q.correct_answer, l."order", q.diagram_url
+        FROM exam_question_links l
+        JOIN questions q ON q.id = l.question_id
+        WHERE l.exam_id = :source_id
+    )
+"""
+
+COPY_QUESTIONS = text(_SOURCE_QUESTIONS + """,
+    remap AS MATERIALIZED (
+        SELECT id AS old_id, gen_random_uuid() AS new_id FROM source
+    ),
+    copied AS (
+        INSERT INTO questions
+            (id, exam_id, organization_id, type, text, marks, correct_answer, "order", created_at, diagram_url)
+        SELECT r.new_id, :exam_id, e.organization_id, s.type, s.text, s.marks, s.correct_answer, s."order",
+               now(), s.diagram_url
+        FROM source s
+        JOIN remap r ON r.old_id = s.id
+        JOIN exams e ON e.id = :exam_id
+        RETURNING 1
+    )
+    INSERT INTO options (id, question_id, text, "order", iscorrect, created_at)
+    SELECT gen_random_uuid(), r.new_id, o.text, o."order", o.iscorrect, now()
+    FROM options o
+    JOIN remap r ON r.old_id = o.question_id
+""")
+
+LINK_QUESTIONS = text(_SOURCE_QUESTIONS + """
+    INSERT INTO exam_question_links (id, exam_id, question_id, "order")
+    SELECT gen_random_uuid(), :exam_id, s.id, s."order"
+    FROM source s
+""")
+
+
+class QuestionInUse(Exception):
+    """Both the owner and a borrower of a shared question have attempts referring to it."""
+
+
+def exam_questions(exam_id):
+    """Query for every question of ``exam_id``, owned or linked."""
+    linked = select(ExamQuestionLink.question_id).where(ExamQuestionLink.exam_id == exam_id)
+    return Question.query.filter(or_(Question.exam_id == exam_id, Question.id.in_(linked)))
+
+
+def clone_exam(source, created_by, title=None, organization_id=None, as_version=False, share_questions=False):
+    """Copy ``source`` and its questions into a new unpublished exam; returns it.
+
+    ``as_version`` makes the copy the next version of the source's lineage
+    rather than an independent exam. Flushes but does not commit.
+    """
+    root_id = (source.parent_exam_id or source.id) if as_version else None
+    version = 1
+    if as_version:
+        latest = db.session.query(func.max(Exam.version)).filter(
+            or_(Exam.id == root_id, Exam.parent_exam_id == root_id)
+        ).scalar()
+        version = (latest or 1) + 1
+
+    exam = Exam(
+        id=uuid.uuid4(),
+        title=title or (source.title if as_version else f"Copy of {source.title}"),
+        description=source.description,
+        duration=source.duration,
+        instructions=source.instructions,
+        total_marks=source.total_marks,
+        passing_percentage=source.passing_percentage,
+        is_published=False,
+        organization_id=organization_id or source.organization_id,
+        created_by=created_by,
+        config=source.config,
+        parent_exam_id=root_id,
+        version=version
+    )
+    db.session.add(exam)
+    db.session.flush()
+
+    params = {"source_id": source.id, "exam_id": exam.id}
+    db.session.execute(LINK_QUESTIONS if share_questions else COPY_QUESTIONS, params)
+    return exam
+
+
+def _copy_question(question, exam_id, order):
+    copy = Question(
+        id=uuid.uuid4(),
+        exam_id=exam_id,
+        organization_id=get_exam(exam_id).organization_id,
+        type=question.type,
+        text=question.text,
+        marks=question.marks,
+        correct_answer=question.correct_answer,
+        order=order,
+        diagram_url=question.diagram_url
+    )
+    db.session.add(copy)
+    for option in question.options:
+        db.session.add(Option(
+            id=uuid.uuid4(),
+            question_id=copy.id,
+            text=option.text,
+            order=option.order,
+            iscorrect=option.iscorrect
+        ))
+    return copy
+
+
+def _referenced(exam_id, question_id):
+    """Whether attempts of ``exam_id`` refer to ``question_id`` by id.
+
+    An ongoing attempt does (its paper holds the id), as does a finished one
+    whose JSON answers or packed layout include it.
+    """
+    key = str(question_id)
+    attempts = db.session.query(ExamAttempt.id).filter(
+        ExamAttempt.exam_id == exam_id,
+        or_(ExamAttempt.end_time.is_(None), ExamAttempt.answers.has_key(key))
+    )
+    layouts = db.session.query(AnswerLayout.id).filter(
+        AnswerLayout.exam_id == exam_id, AnswerLayout.layout.contains([[key]])
+    )
+    return db.session.query(or_(attempts.exists(), layouts.exists())).scalar()
+
+
+def writable_question(exam_id, question_id):
+    """The row ``exam_id`` may edit for ``question_id``, copying it first if shared.
+
+    Returns ``None`` if the question is not part of the exam. The returned
+    question may have a new id. Raises QuestionInUse when the original row
+    cannot be handed to either side. Does not commit.
+    """
+    question = db.session.get(Question, question_id)
+    if not question:
+        return None
+
+    link = ExamQuestionLink.query.filter_by(exam_id=exam_id, question_id=question_id).first()
+    if link:
+        # Borrowed: take a private copy and stop borrowing
+        copy = _copy_question(question, exam_id, link.order)
+        db.session.delete(link)
+        return copy
+
+    if question.exam_id != exam_id:
+        return None
+    borrowers = ExamQuestionLink.query.filter_by(question_id=question_id).all()
+    if not borrowers:
+        return question
+
+    # Owned but shared. The original row, and the ids answers refer to, stays
+    # with whichever side has attempts using it; the other side gets copies.
+    heir = next((b for b in borrowers if _referenced(b.exam_id, question_id)), None)
+    if _referenced(exam_id, question_id):
+        if heir:
+            raise QuestionInUse(f"Question {question_id} is used by attempts of this exam and of exam {heir.exam_id}")
+        # The owner edits in place; borrowers keep the question as it was
+        for borrower in borrowers:
+            _copy_question(question, borrower.exam_id, borrower.order)
+            db.session.delete(borrower)
+        return question
+
+    heir = heir or borrowers[0]
+    copy = _copy_question(question, exam_id, question.order)
+    question.exam_id, question.order = heir.exam_id, heir.order
+    question.organization_id = get_exam(heir.exam_id).organization_id
+    db.session.delete(heir)
+    return copy
@@ -0,0 +1,77 @@
+from sqlalchemy.orm import selectinload
+from app.answer_codec import SINGLE, MULTI, TEXT, iter_packed, packed_layout_id
+from app.answers import get_layout, pack_answers, packing_enabled
+from app.database import Question
+from app.exam_versions import exam_questions
+from app.rollups import add_graded
+
+
+def _normalize(value):
+    return value.strip().lower() if isinstance(value, str) else value
+
+
+def score_answer(question, given):
+    """Marks earned for one answer.
+
+    Choice questions score when the chosen option IDs equal the set of correct
+    options; other questions compare against ``correct_answer``, ignoring case
+    and surrounding whitespace for text.
+    """
+    if given is None:
+        return 0
+    marks = question.marks or 0
+    if question.options:
+        correct = {str(option.id) for option in question.options if option.iscorrect}
+        chosen = {str(g) for g in given} if isinstance(given, list) else {str(given)}
+        return marks if correct and chosen == correct else 0
+    if question.correct_answer is None:
+        return 0
+    return marks if _normalize(given) == _normalize(question.correct_answer) else 0
+
+
+def score_packed(data, questions):
+    """Total marks for packed answers, compared by option position without decoding."""
+    layout = get_layout(packed_layout_id(data))
+    by_id = {str(q.id): q for q in questions}
+    score = 0
+    for i, tag, value in iter_packed(data, layout):
+        if i is None:
+            # Answers that did not fit the compact form
+            score += sum(score_answer(by_id[qid], given) for qid, given in value.items() if qid in by_id)
+            break
+        question_id, option_ids = layout[i]
+        question = by_id.get(question_id)
+        if question is None or tag not in (SINGLE, MULTI, TEXT):
+            continue
+        if tag == TEXT:
+            score += score_answer(question, value)
+            continue
+        correct = {str(option.id) for option in question.options if option.iscorrect}
+        chosen = {option_ids[value]} if tag == SINGLE else {option_ids[j] for j in value}
+        score += (question.marks or 0) if correct and chosen == correct else 0
+    return score
+
+
+def grade_attempt(attempt):
+    """Set ``score`` and ``percentage`` on a submitted attempt (not committed).
+
+    Adds it to the result rollups, and packs the answers as well when
+    ANSWER_STORAGE is ``packed``.
+    """
+    questions = exam_questions(attempt.exam_id).options(
+        selectinload(Question.options)
+    ).all()
+    if attempt.answers_packed is not None:
+        score = score_packed(attempt.answers_packed, questions)
+    else:
+        answers = attempt.answers or {}
+        score = sum(score_answer(q, answers.get(str(q.id))) for q in questions)
+    total = attempt.exam.total_marks or sum(q.marks or 0 for q in questions)
+
+    attempt.score = score
+    attempt.percentage = round(score * 100 / total, 2) if total else 0
+    attempt.status = 'graded'
+    add_graded(attempt)
+    if packing_enabled() and attempt.answers_packed is None:
+        pack_answers(attempt, questions)
+    return score, attempt.percentage
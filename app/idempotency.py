@@ -0,0 +1,165 @@
+import asyncio
+import hashlib
+import json
+import time
+import uuid
+from functools import wraps
+from flask import request, jsonify, make_response
+from app.redis import redis_client
+
+# Idempotency-Key support for mutating endpoints. The first response to a
+# (caller, path, key) is stored for KEY_TTL; retries with the same key get
+# it back without running the view or touching the database. A retry that
+# arrives while the first request is still running waits for it. Keys are
+# scoped by path so Flask and native ASGI handlers share them. Streaming
+# views can't be covered: their body is produced after the view returns.
+#
+#   idem:<user_id>:<path>:<key>       stored response and request fingerprint
+#   idem:lock:<user_id>:<path>:<key>  held while the first request runs; its value
+#                                     is the holder's token, so a request whose lock
+#                                     expired never deletes a later request's lock
+HEADER = 'Idempotency-Key'
+ENTRY_KEY = 'idem:{}:{}:{}'
+LOCK_KEY = 'idem:lock:{}:{}:{}'
+KEY_TTL = 24 * 3600
+LOCK_TTL_MS = 30000
+WAIT_SECONDS = 10.0
+POLL_SECONDS = 0.05
+MAX_KEY_LENGTH = 255
+
+# KEYS: lock; ARGV: the holder's token
+RELEASE_LOCK = """
+    if redis.call('GET', KEYS[1]) == ARGV[1] then
+        return redis.call('DEL', KEYS[1])
+    end
+    return 0
+"""
+release_lock = redis_client.register_script(RELEASE_LOCK)
+
+
+def _fingerprint(method, path, body):
+    return hashlib.sha256(method.encode() + b' ' + path.encode() + b'\n' + body).hexdigest()
+
+
+def _should_store(status):
+    # Server errors are worth retrying for real
+    return status < 500
+
+
+def _error(message, status):
+    return {"success": False, "error": message}, status
+
+
+def _check_entry(raw, fingerprint):
+    """``(stored response dict, None)``, or ``(None, error)`` if the key was reused."""
+    entry = json.loads(raw)
+    if entry["fingerprint"] != fingerprint:
+        return None, _error(f"{HEADER} was already used for a different request", 422)
+    return entry, None
+
+
+def _replay(entry):
+    response = make_response(entry["body"], entry["status"])
+    response.mimetype = entry["mimetype"]
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def idempotent(f):
+    """Honour an ``Idempotency-Key`` header; goes right after ``auth_middleware``."""
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return f(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            body, status = _error(f"{HEADER} is too long", 400)
+            return jsonify(body), status
+
+        scope = (request.user_id, request.path, key)
+        entry_key, lock_key = ENTRY_KEY.format(*scope), LOCK_KEY.format(*scope)
+        fingerprint = _fingerprint(request.method, request.path, request.get_data())
+
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + WAIT_SECONDS
+        while True:
+            raw = redis_client.get(entry_key)
+            if raw is not None:
+                entry, error = _check_entry(raw, fingerprint)
+                if error:
+                    return jsonify(error[0]), error[1]
+                return _replay(entry)
+            if redis_client.set(lock_key, token, nx=True, px=LOCK_TTL_MS):
+                break
+            if time.monotonic() >= deadline:
+                body, status = _error("A request with this Idempotency-Key is still in progress", 409)
+                return jsonify(body), status
+            time.sleep(POLL_SECONDS)
+
+        try:
+            response = make_response(f(*args, **kwargs))
+            if _should_store(response.status_code) and not response.is_streamed:
+                redis_client.set(entry_key, json.dumps({
+                    "fingerprint": fingerprint,
+                    "status": response.status_code,
+                    "mimetype": response.mimetype,
+                    "body": response.get_data(as_text=True)
+                }), ex=KEY_TTL)
+            return response
+        finally:
+            release_lock(keys=[lock_key], args=[token])
+    return wrapper
+
+
+def idempotent_async(f):
+    """``idempotent`` for the native Starlette handlers in app/routes/async_routes.py."""
+    from starlette.responses import JSONResponse, Response
+    from app import aio
+
+    @wraps(f)
+    async def wrapper(request):
+        key = request.headers.get(HEADER)
+        if not key:
+            return await f(request)
+        user_id = await aio.authenticate(request)
+        if not user_id:
+            return JSONResponse({"error": "Unauthorized"}, status_code=401)
+        if len(key) > MAX_KEY_LENGTH:
+            body, status = _error(f"{HEADER} is too long", 400)
+            return JSONResponse(body, status_code=status)
+
+        scope = (user_id, request.url.path, key)
+        entry_key, lock_key = ENTRY_KEY.format(*scope), LOCK_KEY.format(*scope)
+        fingerprint = _fingerprint(request.method, request.url.path, await request.body())
+        client = aio.redis_client
+        token = uuid.uuid4().hex
+
+        deadline = time.monotonic() + WAIT_SECONDS
+        while True:
+            raw = await client.get(entry_key)
+            if raw is not None:
+                entry, error = _check_entry(raw, fingerprint)
+                if error:
+                    return JSONResponse(error[0], status_code=error[1])
+                return Response(entry["body"], status_code=entry["status"], media_type=entry["mimetype"],
+                                headers={"Idempotent-Replayed": "true"})
+            if await client.set(lock_key, token, nx=True, px=LOCK_TTL_MS):
+                break
+            if time.monotonic() >= deadline:
+                body, status = _error("A request with this Idempotency-Key is still in progress", 409)
+                return JSONResponse(body, status_code=status)
+            await asyncio.sleep(POLL_SECONDS)
+
+        try:
+            response = await f(request)
+            if _should_store(response.status_code) and hasattr(response, 'body'):
+                await client.set(entry_key, json.dumps({
+                    "fingerprint": fingerprint,
+                    "status": response.status_code,
+                    "mimetype": response.media_type,
+                    "body": response.body.decode()
+                }), ex=KEY_TTL)
+            return response
+        finally:
+            await client.eval(RELEASE_LOCK, 1, lock_key, token)
+    return wrapper
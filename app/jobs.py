@@ -0,0 +1,258 @@
+import json
+import logging
+import os
+import random
+import signal
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime
+from functools import partial
+from app.redis import redis_client
+
+# A small Redis-backed job queue.
+#
+#   jobs:queue:<priority>  list of job IDs, one per priority, popped high first
+#   jobs:job:<id>          hash with the job's name, arguments and status
+#   jobs:delayed           zset of job IDs waiting for a retry, scored by run time
+#   jobs:running           zset of job IDs being worked on, scored by deadline;
+#                          jobs whose worker died are requeued once it passes
+#
+# A worker claims a job with one Lua script (pop, add to jobs:running, count
+# the attempt), so a worker dying at any point leaves the job on a queue or in
+# jobs:running. While the job runs, a heartbeat thread keeps pushing its
+# deadline out; a job that keeps killing its worker fails once it has used up
+# its retries.
+#
+# Handlers are registered with @job (see app/tasks.py) and run inside an app
+# context by run_worker.py; handlers queue work with ``<handler>.enqueue(...)``.
+PRIORITIES = ('high', 'default', 'low')
+QUEUE_KEY = 'jobs:queue:{}'
+JOB_KEY = 'jobs:job:{}'
+DELAYED_KEY = 'jobs:delayed'
+RUNNING_KEY = 'jobs:running'
+PERIODIC_KEY = 'jobs:periodic:{}'
+
+RESULT_TTL = 24 * 3600
+# A running job's deadline is this far ahead, renewed every HEARTBEAT_INTERVAL
+VISIBILITY_TIMEOUT = 2 * 60
+HEARTBEAT_INTERVAL = 30
+# Idle workers run requeueing and periodic scheduling at most this often
+MAINTENANCE_INTERVAL = 1
+BACKOFF_BASE = 5
+BACKOFF_MAX = 15 * 60
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+# KEYS: jobs:running, then the queues highest priority first
+# ARGV: deadline, started_at, worker, job key prefix
+CLAIM_SCRIPT = redis_client.register_script("""
+    for i = 2, #KEYS do
+        local job_id = redis.call('RPOP', KEYS[i])
+        if job_id then
+            redis.call('ZADD', KEYS[1], ARGV[1], job_id)
+            local key = ARGV[4] .. job_id
+            redis.call('HINCRBY', key, 'attempts', 1)
+            redis.call('HSET', key, 'status', 'running', 'started_at', ARGV[2], 'worker', ARGV[3])
+            return job_id
+        end
+    end
+    return false
+""")
+
+
+class Job:
+    def __init__(self, name, func, priority, max_retries, every):
+        self.name = name
+        self.func = func
+        self.priority = priority
+        self.max_retries = max_retries
+        self.every = every
+
+
+def job(name, priority='default', max_retries=3, every=None):
+    """Register a job handler; ``every`` (seconds) also schedules it periodically."""
+    def decorator(f):
+        registry[name] = Job(name, f, priority, max_retries, every)
+        f.enqueue = partial(enqueue, name)
+        return f
+    return decorator
+
+
+def enqueue(name, *args, priority=None, max_retries=None, user_id=None, **kwargs):
+    """Queue a registered job and return its ID. Arguments must be JSON-serializable."""
+    spec = registry[name]
+    priority = priority or spec.priority
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown priority {priority}")
+    job_id = str(uuid.uuid4())
+    pipe = redis_client.pipeline()
+    pipe.hset(JOB_KEY.format(job_id), mapping={
+        "id": job_id,
+        "name": name,
+        "args": json.dumps(args),
+        "kwargs": json.dumps(kwargs),
+        "priority": priority,
+        "status": "queued",
+        "attempts": 0,
+        "max_retries": spec.max_retries if max_retries is None else max_retries,
+        "user_id": str(user_id) if user_id else "",
+        "enqueued_at": datetime.utcnow().isoformat()
+    })
+    pipe.lpush(QUEUE_KEY.format(priority), job_id)
+    pipe.execute()
+    return job_id
+
+
+def get_job(job_id):
+    data = redis_client.hgetall(JOB_KEY.format(job_id))
+    if not data:
+        return None
+    return {
+        "id": data["id"],
+        "name": data["name"],
+        "status": data["status"],
+        "priority": data["priority"],
+        "attempts": int(data.get("attempts", 0)),
+        "user_id": data.get("user_id") or None,
+        "result": json.loads(data["result"]) if data.get("result") else None,
+        "error": data.get("error") or None,
+        "enqueued_at": data.get("enqueued_at"),
+        "started_at": data.get("started_at"),
+        "finished_at": data.get("finished_at")
+    }
+
+
+def _requeue_due(now):
+    """Move delayed retries and expired running jobs back onto their queues.
+
+    An expired running job whose worker died on its last allowed attempt is
+    marked failed instead.
+    """
+    for key in (DELAYED_KEY, RUNNING_KEY):
+        for job_id in redis_client.zrangebyscore(key, 0, now, start=0, num=100):
+            # Only the worker that wins the ZREM requeues it
+            if not redis_client.zrem(key, job_id):
+                continue
+            job_key = JOB_KEY.format(job_id)
+            data = redis_client.hgetall(job_key)
+            if key == RUNNING_KEY and int(data.get("attempts", 0)) > int(data.get("max_retries", 0)):
+                logger.warning("Job %s (%s) failed: worker lost on its last attempt", job_id, data.get("name"))
+                pipe = redis_client.pipeline()
+                pipe.hset(job_key, mapping={
+                    "status": "failed",
+                    "error": "Worker stopped before the job finished",
+                    "finished_at": datetime.utcnow().isoformat()
+                })
+                pipe.expire(job_key, RESULT_TTL)
+                pipe.execute()
+                continue
+            pipe = redis_client.pipeline()
+            pipe.hset(job_key, "status", "queued")
+            pipe.lpush(QUEUE_KEY.format(data.get("priority") or 'default'), job_id)
+            pipe.execute()
+
+
+def _schedule_periodic():
+    for spec in registry.values():
+        if spec.every and redis_client.set(PERIODIC_KEY.format(spec.name), 1, nx=True, ex=spec.every):
+            enqueue(spec.name)
+
+
+class Worker:
+    """Claims jobs in priority order and runs them inside ``app``'s context."""
+
+    def __init__(self, app, poll_timeout=0.25):
+        self.app = app
+        # Seconds to wait before looking again when every queue is empty
+        self.poll_timeout = poll_timeout
+        self.stopping = False
+        self.next_maintenance = 0
+
+    def stop(self, *_):
+        self.stopping = True
+
+    def claim(self):
+        """Pop the next job ID and mark it running, atomically; ``None`` when the queues are empty."""
+        return CLAIM_SCRIPT(
+            keys=[RUNNING_KEY, *(QUEUE_KEY.format(p) for p in PRIORITIES)],
+            args=[time.time() + VISIBILITY_TIMEOUT, datetime.utcnow().isoformat(), os.getpid(), JOB_KEY.format('')]
+        )
+
+    def run(self, burst=False):
+        """Work until stopped; with ``burst`` return once the queues are empty."""
+        signal.signal(signal.SIGTERM, self.stop)
+        while not self.stopping:
+            now = time.time()
+            if now >= self.next_maintenance:
+                _requeue_due(now)
+                if not burst:
+                    _schedule_periodic()
+                self.next_maintenance = now + MAINTENANCE_INTERVAL
+            job_id = self.claim()
+            if job_id:
+                self.execute(job_id)
+            elif burst and not redis_client.zcard(DELAYED_KEY):
+                return
+            else:
+                time.sleep(self.poll_timeout)
+
+    def _heartbeat(self, job_id, done):
+        """Push the running job's deadline out until ``done`` is set."""
+        while not done.wait(HEARTBEAT_INTERVAL):
+            try:
+                # XX: a job already requeued as expired stays requeued
+                redis_client.zadd(RUNNING_KEY, {job_id: time.time() + VISIBILITY_TIMEOUT}, xx=True)
+            except Exception as e:
+                logger.warning("Job %s: heartbeat failed: %s", job_id, e)
+
+    def execute(self, job_id):
+        """Run a claimed job and record its outcome."""
+        key = JOB_KEY.format(job_id)
+        data = redis_client.hgetall(key)
+        spec = registry.get(data.get("name"))
+        if not spec:
+            pipe = redis_client.pipeline()
+            pipe.zrem(RUNNING_KEY, job_id)
+            pipe.hset(key, mapping={"status": "failed", "error": "Unknown job"})
+            pipe.execute()
+            return
+        attempts = int(data.get("attempts", 0))
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job_id, done), daemon=True)
+        heartbeat.start()
+        try:
+            with self.app.app_context():
+                result = spec.func(*json.loads(data["args"]), **json.loads(data["kwargs"]))
+        except Exception as e:
+            logger.warning("Job %s (%s) failed: %s", job_id, spec.name, e)
+            pipe = redis_client.pipeline()
+            pipe.zrem(RUNNING_KEY, job_id)
+            if attempts <= int(data.get("max_retries", 0)):
+                delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX) * random.uniform(0.8, 1.2)
+                pipe.hset(key, mapping={"status": "retrying", "error": str(e)})
+                pipe.zadd(DELAYED_KEY, {job_id: time.time() + delay})
+            else:
+                pipe.hset(key, mapping={
+                    "status": "failed",
+                    "error": traceback.format_exc(limit=5),
+                    "finished_at": datetime.utcnow().isoformat()
+                })
+                pipe.expire(key, RESULT_TTL)
+            pipe.execute()
+            return
+        finally:
+            done.set()
+        pipe = redis_client.pipeline()
+        pipe.zrem(RUNNING_KEY, job_id)
+        pipe.hset(key, mapping={
+            "status": "succeeded",
+            "result": json.dumps(result, default=str),
+            "error": "",
+            "finished_at": datetime.utcnow().isoformat()
+        })
+        pipe.expire(key, RESULT_TTL)
+        pipe.execute()
@@ -0,0 +1,192 @@
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+from flask import Response, current_app, stream_with_context
+from sqlalchemy import case, func, select
+from app.database import ExamAttempt
+from app.redis import redis_client
+
+# Live monitoring feeds. Attempt events are published to one Redis channel per
+# exam and one per organization, so whichever worker holds a dashboard's SSE
+# connection receives them. Counters are kept alongside in Redis hashes and
+# pushed to subscribers every COUNTERS_INTERVAL seconds without touching
+# exam_attempts.
+#
+# A sync (WSGI) stream holds a gthread worker thread for as long as the
+# dashboard stays open, so each process serves at most SSE_MAX_STREAMS of them
+# and answers 503 beyond that; the ASGI app (run_asgi.py) has no such limit.
+CHANNEL_KEY = 'live:{}:{}'
+COUNTERS_KEY = 'live:counters:{}:{}'
+COUNTER_FIELDS = ('started', 'submitted', 'auto_closed')
+COUNTERS_TTL = 2 * 24 * 3600
+COUNTERS_INTERVAL = 5
+KEEPALIVE_INTERVAL = 15
+DEFAULT_MAX_STREAMS = 2
+STREAM_RETRY_AFTER = 30
+
+logger = logging.getLogger(__name__)
+
+_streams_lock = threading.Lock()
+_open_streams = 0
+
+
+def attempt_event(kind, attempt):
+    """Payload for ``attempt.<kind>``; kind is one of started, submitted, auto_closed."""
+    return {
+        "type": f"attempt.{kind}",
+        "attempt_id": str(attempt.id),
+        "exam_id": str(attempt.exam_id),
+        "organization_id": str(attempt.organization_id),
+        "user_id": str(attempt.user_id),
+        "at": (attempt.end_time or attempt.start_time or datetime.utcnow()).isoformat()
+    }
+
+
+def _queue_event(pipe, kind, attempt):
+    message = json.dumps(attempt_event(kind, attempt))
+    for scope, scope_id in (('exam', attempt.exam_id), ('organization', attempt.organization_id)):
+        pipe.hincrby(COUNTERS_KEY.format(scope, scope_id), kind, 1)
+        pipe.expire(COUNTERS_KEY.format(scope, scope_id), COUNTERS_TTL)
+        pipe.publish(CHANNEL_KEY.format(scope, scope_id), message)
+
+
+def publish_attempt_events(kind, attempts):
+    """Count and broadcast committed attempt changes; never fails the caller."""
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for attempt in attempts:
+            _queue_event(pipe, kind, attempt)
+        pipe.execute()
+    except Exception as e:
+        logger.warning("Could not publish attempt.%s events: %s", kind, e)
+
+
+async def publish_attempt_events_async(client, kind, attempts):
+    try:
+        pipe = client.pipeline(transaction=False)
+        for attempt in attempts:
+            _queue_event(pipe, kind, attempt)
+        await pipe.execute()
+    except Exception as e:
+        logger.warning("Could not publish attempt.%s events: %s", kind, e)
+
+
+def counters_query(scope, scope_id):
+    """``(started, auto_closed, closed)`` for an exam or organization."""
+    column = ExamAttempt.exam_id if scope == 'exam' else ExamAttempt.organization_id
+    return select(
+        func.count(),
+        # status turns 'graded' after grading; close_reason keeps how the attempt ended
+        func.count(case((ExamAttempt.close_reason == 'auto_closed', 1))),
+        func.count(ExamAttempt.end_time)
+    ).where(column == scope_id)
+
+
+def seed_counters(started, auto_closed, closed):
+    return {"started": started, "submitted": closed - auto_closed, "auto_closed": auto_closed}
+
+
+def counters_event(raw):
+    counters = {field: int(raw.get(field) or 0) for field in COUNTER_FIELDS}
+    counters["ongoing"] = max(counters["started"] - counters["submitted"] - counters["auto_closed"], 0)
+    return format_event("counters", counters)
+
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def ensure_counters(session, scope, scope_id):
+    """Rebuild a scope's counters from exam_attempts if Redis has none."""
+    key = COUNTERS_KEY.format(scope, scope_id)
+    if not redis_client.exists(key):
+        redis_client.hset(key, mapping=seed_counters(*session.execute(counters_query(scope, scope_id)).one()))
+        redis_client.expire(key, COUNTERS_TTL)
+
+
+async def ensure_counters_async(client, session, scope, scope_id):
+    key = COUNTERS_KEY.format(scope, scope_id)
+    if not await client.exists(key):
+        row = (await session.execute(counters_query(scope, scope_id))).one()
+        await client.hset(key, mapping=seed_counters(*row))
+        await client.expire(key, COUNTERS_TTL)
+
+
+def event_stream(scope, scope_id):
+    """SSE generator of attempt events and counters for one exam or organization."""
+    counters_key = COUNTERS_KEY.format(scope, scope_id)
+    pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(CHANNEL_KEY.format(scope, scope_id))
+    try:
+        yield counters_event(redis_client.hgetall(counters_key))
+        last_counters = last_write = time.monotonic()
+        while True:
+            message = pubsub.get_message(timeout=1.0)
+            now = time.monotonic()
+            if message:
+                data = json.loads(message['data'])
+                yield format_event(data['type'], data)
+                last_write = now
+            if now - last_counters >= COUNTERS_INTERVAL:
+                yield counters_event(redis_client.hgetall(counters_key))
+                last_counters = last_write = now
+            elif now - last_write >= KEEPALIVE_INTERVAL:
+                yield ": keepalive\n\n"
+                last_write = now
+    finally:
+        pubsub.close()
+
+
+def _release_stream():
+    global _open_streams
+    with _streams_lock:
+        _open_streams -= 1
+
+
+def stream_response(scope, scope_id):
+    """SSE Response of ``event_stream``, or ``None`` when this process already serves SSE_MAX_STREAMS."""
+    global _open_streams
+    with _streams_lock:
+        if _open_streams >= current_app.config.get('SSE_MAX_STREAMS', DEFAULT_MAX_STREAMS):
+            return None
+        _open_streams += 1
+    response = Response(
+        stream_with_context(event_stream(scope, scope_id)),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+    # The server closes the response even if the stream never started
+    response.call_on_close(_release_stream)
+    return response
+
+
+async def event_stream_async(client, scope, scope_id, is_disconnected):
+    """``event_stream`` for the ASGI app; ``client`` is the bytes-mode aio Redis client."""
+    counters_key = COUNTERS_KEY.format(scope, scope_id)
+    pubsub = client.pubsub(ignore_subscribe_messages=True)
+    await pubsub.subscribe(CHANNEL_KEY.format(scope, scope_id))
+
+    async def counters():
+        raw = await client.hgetall(counters_key)
+        return counters_event({k.decode(): v.decode() for k, v in raw.items()})
+
+    try:
+        yield await counters()
+        last_counters = last_write = time.monotonic()
+        while not await is_disconnected():
+            message = await pubsub.get_message(timeout=1.0)
+            now = time.monotonic()
+            if message:
+                data = json.loads(message['data'])
+                yield format_event(data['type'], data)
+                last_write = now
+            if now - last_counters >= COUNTERS_INTERVAL:
+                yield await counters()
+                last_counters = last_write = now
+            elif now - last_write >= KEEPALIVE_INTERVAL:
+                yield ": keepalive\n\n"
+                last_write = now
+    finally:
+        await pubsub.close()
@@ -0,0 +1,163 @@
+import re
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# MinHash signatures and LSH banding for near-duplicate text.
+#
+# A text is normalized (lower case, runs of non-word characters collapsed to
+# one space) and cut into overlapping SHINGLE_SIZE-byte shingles, each hashed
+# to a uint32. Its signature is the minimum of NUM_PERM hash permutations
+# (x * a + b mod 2**32, a odd) over those shingles; two signatures agree in
+# each position with probability close to the texts' Jaccard similarity. LSH
+# splits signatures into BANDS bands of ROWS rows, and texts sharing any band
+# become candidate pairs: with 32 x 4 a pair at similarity 0.7 is found with
+# probability > 0.999, one at 0.3 about a quarter of the time. Candidates are
+# then checked with exact Jaccard on their shingles.
+#
+# Shingles of a batch of texts live in one flat array with offsets, so every
+# step is a handful of numpy operations over the whole batch. Pure numpy with
+# no database or Flask dependencies, so it can run in worker processes; the
+# permutations come from a fixed seed, so signatures from different processes
+# are comparable.
+SHINGLE_SIZE = 5
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+SEED = 0x5eed
+# Shingles hashed per step: keeps the (NUM_PERM, shingles) matrix in cache (2 MB)
+BATCH_SHINGLES = 4096
+# Buckets larger than this (shared boilerplate) are checked against one member, not pairwise
+MAX_PAIRWISE_BUCKET = 50
+
+_rng = np.random.default_rng(SEED)
+_A = (_rng.integers(0, 1 << 32, NUM_PERM, dtype=np.uint64).astype(np.uint32) | np.uint32(1))[:, None]
+_B = _rng.integers(0, 1 << 32, NUM_PERM, dtype=np.uint64).astype(np.uint32)[:, None]
+_SHINGLE_POWERS = np.uint64(1099511628211) ** np.arange(SHINGLE_SIZE, dtype=np.uint64)
+_BAND_POWERS = np.uint64(0x9e3779b97f4a7c15) ** np.arange(ROWS, dtype=np.uint64)
+_NON_WORD = re.compile(r'\W+')
+
+
+def normalize(text):
+    return _NON_WORD.sub(' ', text.lower()).strip()
+
+
+def shingle_hashes(texts):
+    """Shingle hashes of every text in one uint32 array, and ``len(texts) + 1`` offsets into it.
+
+    Every text must normalize to at least SHINGLE_SIZE bytes. Hashes are not
+    deduplicated; see ``shingle_set``.
+    """
+    encoded = [normalize(text).encode() for text in texts]
+    lengths = np.array([len(data) for data in encoded], dtype=np.int64)
+    if (lengths < SHINGLE_SIZE).any():
+        raise ValueError(f"Every text needs at least {SHINGLE_SIZE} characters")
+    buffer = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    with np.errstate(over='ignore'):
+        hashes = (sliding_window_view(buffer, SHINGLE_SIZE).astype(np.uint64) @ _SHINGLE_POWERS) >> np.uint64(32)
+    # Drop the windows that run across the end of a text
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    counts = lengths - SHINGLE_SIZE + 1
+    keep = np.ones(len(hashes), dtype=bool)
+    for tail in range(1, SHINGLE_SIZE):
+        crossing = starts[1:] - tail
+        keep[crossing[crossing >= 0]] = False
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    return hashes[keep].astype(np.uint32), offsets
+
+
+def shingle_set(hashes, offsets, i):
+    return np.unique(hashes[offsets[i]:offsets[i + 1]])
+
+
+def signatures(hashes, offsets):
+    """``(len(offsets) - 1, NUM_PERM)`` uint32 MinHash signatures."""
+    count = len(offsets) - 1
+    sig = np.empty((count, NUM_PERM), dtype=np.uint32)
+    start = 0
+    while start < count:
+        # Whole texts per step, at least one
+        end = max(start + 1, int(np.searchsorted(offsets, offsets[start] + BATCH_SHINGLES, side='right')) - 1)
+        end = min(end, count)
+        permuted = _A * hashes[offsets[start]:offsets[end]]
+        permuted += _B
+        sig[start:end] = np.minimum.reduceat(permuted, offsets[start:end] - offsets[start], axis=1).T
+        start = end
+    return sig
+
+
+def sketch(texts):
+    """``(hashes, offsets, signatures)`` of ``texts``; the unit of work for a process pool."""
+    hashes, offsets = shingle_hashes(texts)
+    return hashes, offsets, signatures(hashes, offsets)
+
+
+def candidate_buckets(sig):
+    """Yield arrays of row indexes that share a band."""
+    for band in range(BANDS):
+        block = sig[:, band * ROWS:(band + 1) * ROWS].astype(np.uint64)
+        with np.errstate(over='ignore'):
+            keys = block @ _BAND_POWERS
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        # Only rows whose key repeats; nearly every bucket holds a single row
+        repeated = keys[1:] == keys[:-1]
+        shared = np.zeros(len(keys), dtype=bool)
+        shared[1:] |= repeated
+        shared[:-1] |= repeated
+        order, keys = order[shared], keys[shared]
+        yield from np.split(order, np.flatnonzero(keys[1:] != keys[:-1]) + 1) if len(order) else ()
+
+
+def jaccard(a, b):
+    if not len(a) or not len(b):
+        return 0.0
+    shared = len(np.intersect1d(a, b, assume_unique=True))
+    return shared / (len(a) + len(b) - shared)
+
+
+def clusters(hashes, offsets, sig, threshold):
+    """Groups of texts linked by pairs at or above ``threshold`` Jaccard similarity.
+
+    Returns ``[(members, pairs)]`` with sorted member indexes and the verified
+    ``(i, j, similarity)`` pairs that link them, largest clusters first.
+    """
+    parent = list(range(len(sig)))
+    sets = {}
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def shingles_of(i):
+        if i not in sets:
+            sets[i] = shingle_set(hashes, offsets, i)
+        return sets[i]
+
+    checked = set()
+    pairs = []
+    for bucket in candidate_buckets(sig):
+        bucket = sorted(bucket.tolist())
+        if len(bucket) <= MAX_PAIRWISE_BUCKET:
+            candidates = ((i, j) for n, i in enumerate(bucket) for j in bucket[n + 1:])
+        else:
+            candidates = ((bucket[0], j) for j in bucket[1:])
+        for i, j in candidates:
+            if (i, j) in checked:
+                continue
+            checked.add((i, j))
+            similarity = jaccard(shingles_of(i), shingles_of(j))
+            if similarity >= threshold:
+                pairs.append((i, j, similarity))
+                parent[find(i)] = find(j)
+
+    grouped = {}
+    for i, j, similarity in pairs:
+        members, linked = grouped.setdefault(find(i), (set(), []))
+        members.update((i, j))
+        linked.append((i, j, similarity))
+    return sorted(
+        ((sorted(members), linked) for members, linked in grouped.values()),
+        key=lambda cluster: -len(cluster[0])
+    )
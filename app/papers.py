@@ -0,0 +1,70 @@
+import uuid
+from sqlalchemy import inspect
+from sqlalchemy.orm import selectinload
+from app.cache import TwoTierCache
+from app.database import db, Exam, Question, Option, ExamQuestionLink
+from app.exam_versions import exam_questions
+
+# The paper a candidate sits: an exam's questions and options in order, with
+# everything that gives the answers away left out. Built once per change and
+# served from the two-tier cache, so a cohort starting together costs one
+# query rather than one per candidate.
+
+
+def build_paper(exam_id):
+    exam = db.session.get(Exam, exam_id)
+    if not exam:
+        return None
+    link_orders = dict(
+        db.session.query(ExamQuestionLink.question_id, ExamQuestionLink.order).filter_by(exam_id=exam_id)
+    )
+    questions = exam_questions(exam_id).options(selectinload(Question.options)).all()
+
+    def order(question):
+        position = link_orders.get(question.id, question.order)
+        return (position is None, position or 0, question.created_at)
+
+    return {
+        "exam_id": str(exam.id),
+        "title": exam.title,
+        "duration": exam.duration,
+        "instructions": exam.instructions,
+        "total_marks": exam.total_marks,
+        "questions": [{
+            "id": str(question.id),
+            "type": question.type,
+            "text": question.text,
+            "marks": question.marks,
+            "diagram_url": question.diagram_url,
+            "options": [{
+                "id": str(option.id),
+                "text": option.text
+            } for option in sorted(question.options, key=lambda o: (o.order is None, o.order or 0))]
+        } for question in sorted(questions, key=order)]
+    }
+
+
+def _question_exams(question):
+    # The owner and every exam borrowing the question
+    keys = [str(question.exam_id)]
+    if inspect(question).persistent:
+        keys += [str(exam_id) for (exam_id,) in
+                 db.session.query(ExamQuestionLink.exam_id).filter_by(question_id=question.id)]
+    return tuple(keys)
+
+
+def _option_exams(option):
+    question = db.session.get(Question, option.question_id)
+    return _question_exams(question) if question else ()
+
+
+papers = TwoTierCache('paper', lambda exam_id: build_paper(uuid.UUID(exam_id)), ttl=600, max_local=64)
+papers.invalidate_on_commit(Exam, lambda exam: str(exam.id))
+papers.invalidate_on_commit(Question, _question_exams)
+papers.invalidate_on_commit(Option, _option_exams)
+papers.invalidate_on_commit(ExamQuestionLink, lambda link: str(link.exam_id))
+
+
+def get_paper(exam_id):
+    """Candidate-facing paper for ``exam_id``, or ``None``."""
+    return papers.get(exam_id)
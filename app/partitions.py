@@ -0,0 +1,243 @@
+import csv
+import gzip
+import os
+import re
+from datetime import date, datetime
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import text
+from app.database import db
+
+# exam_attempts is range-partitioned by month on created_at; every month is
+# hash-sub-partitioned on organization_id so tenant-scoped queries prune down
+# to a single bucket. Months older than the retention window are dumped to
+# gzipped CSV files and dropped, and can be restored on demand.
+#
+# A DEFAULT partition takes rows whose month has no partition yet, so inserts
+# never fail; creating that month's partition moves them into it. Months are
+# created at boot and by the hourly maintenance job.
+PARENT = 'exam_attempts'
+DEFAULT_PARTITION = f'{PARENT}_default'
+HELD_ROWS = f'{PARENT}_held'
+PARTITION_NAME = re.compile(r'^exam_attempts_y(\d{4})m(\d{2})$')
+ADVISORY_LOCK_KEY = 0x7e4a0001
+
+DEFAULT_MONTHS_AHEAD = 3
+DEFAULT_RETENTION_MONTHS = 24
+DEFAULT_ORG_BUCKETS = 4
+DEFAULT_ARCHIVE_DIR = 'archive/exam_attempts'
+
+
+def _add_months(month, n):
+    years, month_index = divmod(month.month - 1 + n, 12)
+    return date(month.year + years, month_index + 1, 1)
+
+
+def parse_month(value):
+    """Parse ``YYYY-MM`` into the first day of that month."""
+    parsed = datetime.strptime(value, '%Y-%m')
+    return date(parsed.year, parsed.month, 1)
+
+
+def partition_name(month):
+    return f"{PARENT}_y{month.year}m{month.month:02d}"
+
+
+def archive_path(month):
+    directory = current_app.config.get('ATTEMPT_ARCHIVE_DIR', DEFAULT_ARCHIVE_DIR)
+    return os.path.join(directory, f"{partition_name(month)}.csv.gz")
+
+
+def is_partitioned():
+    return bool(db.session.execute(text("""
+        SELECT 1 FROM pg_partitioned_table pt
+        JOIN pg_class c ON c.oid = pt.partrelid
+        WHERE c.relname = :parent
+    """), {'parent': PARENT}).scalar())
+
+
+def list_attempt_partitions():
+    """Return ``{month: partition_name}`` for attached monthly partitions."""
+    names = db.session.execute(text("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = :parent
+    """), {'parent': PARENT}).scalars()
+    months = {}
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            months[date(int(match[1]), int(match[2]), 1)] = name
+    return months
+
+
+def _hold_default_rows(start, end):
+    """Move the DEFAULT partition's rows in ``[start, end)`` to a temporary table; returns their count."""
+    params = {'start': start, 'end': end}
+    if not db.session.execute(text("SELECT to_regclass(:name)"), {'name': DEFAULT_PARTITION}).scalar():
+        return 0
+    if not db.session.execute(text(
+        f"SELECT 1 FROM {DEFAULT_PARTITION} WHERE created_at >= :start AND created_at < :end LIMIT 1"
+    ), params).scalar():
+        return 0
+    db.session.execute(text(f"CREATE TEMPORARY TABLE {HELD_ROWS} (LIKE {PARENT})"))
+    return db.session.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION} WHERE created_at >= :start AND created_at < :end RETURNING *
+        )
+        INSERT INTO {HELD_ROWS} SELECT * FROM moved
+    """), params).rowcount
+
+
+def _create_partition(month, buckets):
+    name = partition_name(month)
+    start, end = month, _add_months(month, 1)
+    # The CREATE fails while DEFAULT holds rows of this month: set them aside,
+    # then put them back through the parent into the new partition
+    held = _hold_default_rows(start, end)
+    db.session.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {PARENT} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}') "
+        f"PARTITION BY HASH (organization_id)"
+    ))
+    for remainder in range(buckets):
+        db.session.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name}_h{remainder} PARTITION OF {name} "
+            f"FOR VALUES WITH (MODULUS {buckets}, REMAINDER {remainder})"
+        ))
+    if held:
+        db.session.execute(text(f"INSERT INTO {PARENT} SELECT * FROM {HELD_ROWS}"))
+        db.session.execute(text(f"DROP TABLE {HELD_ROWS}"))
+
+
+def ensure_attempt_partitions(months_ahead=None, today=None):
+    """Create monthly partitions from the current month up to ``months_ahead``."""
+    if not is_partitioned():
+        return []
+    config = current_app.config
+    months_ahead = months_ahead if months_ahead is not None else \
+        config.get('ATTEMPT_PARTITION_MONTHS_AHEAD', DEFAULT_MONTHS_AHEAD)
+    buckets = config.get('ATTEMPT_PARTITION_ORG_BUCKETS', DEFAULT_ORG_BUCKETS)
+
+    current = (today or date.today()).replace(day=1)
+    wanted = [_add_months(current, n) for n in range(months_ahead + 1)]
+    existing = list_attempt_partitions()
+    missing = [month for month in wanted if month not in existing]
+    if missing:
+        db.session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {'key': ADVISORY_LOCK_KEY})
+        for month in missing:
+            _create_partition(month, buckets)
+    db.session.commit()
+    return missing
+
+
+def archive_attempt_partition(month):
+    """Dump one monthly partition to a gzipped CSV file, then detach and drop it."""
+    name = list_attempt_partitions().get(month)
+    if not name:
+        raise ValueError(f"No attached partition for {month:%Y-%m}")
+    path = archive_path(month)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    conn = db.engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        # Block writes to this month only while it is copied out
+        cursor.execute(f"LOCK TABLE {name} IN SHARE MODE")
+        cursor.execute(f"SELECT count(*) FROM {name}")
+        rows = cursor.fetchone()[0]
+        tmp_path = path + '.tmp'
+        with gzip.open(tmp_path, 'wt', encoding='utf-8', newline='') as f:
+            cursor.copy_expert(f"COPY (SELECT * FROM {name}) TO STDOUT WITH (FORMAT csv, HEADER)", f)
+        os.replace(tmp_path, path)
+        cursor.execute(f"ALTER TABLE {PARENT} DETACH PARTITION {name}")
+        cursor.execute(f"DROP TABLE {name}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return path, rows
+
+
+def restore_attempt_partition(month):
+    """Recreate an archived month as an attached partition and reload its rows."""
+    path = archive_path(month)
+    if not os.path.exists(path):
+        raise ValueError(f"No archive for {month:%Y-%m} at {path}")
+    if month in list_attempt_partitions():
+        raise ValueError(f"Partition for {month:%Y-%m} is already attached")
+
+    buckets = current_app.config.get('ATTEMPT_PARTITION_ORG_BUCKETS', DEFAULT_ORG_BUCKETS)
+    _create_partition(month, buckets)
+    db.session.commit()
+
+    conn = db.engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        with gzip.open(path, 'rt', encoding='utf-8', newline='') as f:
+            # Columns are named from the archive header so restores survive schema additions
+            columns = ', '.join(f'"{col}"' for col in next(csv.reader([f.readline()])))
+            cursor.copy_expert(f"COPY {partition_name(month)} ({columns}) FROM STDIN WITH (FORMAT csv)", f)
+            rows = cursor.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return rows
+
+
+def maintain_attempt_partitions(today=None):
+    """Create upcoming partitions and archive months past the retention window.
+
+    Months that already have an archive file were restored on demand and are
+    left attached until archived explicitly again.
+    """
+    created = ensure_attempt_partitions(today=today)
+    retention = current_app.config.get('ATTEMPT_RETENTION_MONTHS', DEFAULT_RETENTION_MONTHS)
+    cutoff = _add_months((today or date.today()).replace(day=1), -retention)
+    archived = []
+    for month in sorted(list_attempt_partitions()):
+        if month < cutoff and not os.path.exists(archive_path(month)):
+            archive_attempt_partition(month)
+            archived.append(month)
+    return created, archived
+
+
+partitions_cli = AppGroup('partitions', help='Manage exam_attempts partitions.')
+
+
+@partitions_cli.command('maintain')
+def maintain_command():
+    """Create upcoming partitions and archive expired ones."""
+    created, archived = maintain_attempt_partitions()
+    click.echo(f"created: {', '.join(f'{m:%Y-%m}' for m in created) or '-'}")
+    click.echo(f"archived: {', '.join(f'{m:%Y-%m}' for m in archived) or '-'}")
+
+
+@partitions_cli.command('archive')
+@click.argument('month')
+def archive_command(month):
+    """Archive MONTH (YYYY-MM) to cold storage."""
+    path, rows = archive_attempt_partition(parse_month(month))
+    click.echo(f"archived {rows} rows to {path}")
+
+
+@partitions_cli.command('restore')
+@click.argument('month')
+def restore_command(month):
+    """Restore MONTH (YYYY-MM) from cold storage."""
+    rows = restore_attempt_partition(parse_month(month))
+    click.echo(f"restored {rows} rows")
+
+
+@partitions_cli.command('list')
+def list_command():
+    """List attached monthly partitions."""
+    for month, name in sorted(list_attempt_partitions().items()):
+        click.echo(f"{month:%Y-%m}  {name}")
@@ -0,0 +1,141 @@
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import and_, select, union
+from app.cache import TwoTierCache
+from app.database import db, Exam, ExamAssignment, StudentGroupMember, UserRole, exams
+from app.papers import papers
+from app.rbac import permissions_query, user_permissions
+from app.redis import redis_client
+
+# Cache warm-up ahead of scheduled exams. Within the lead window before an
+# exam's scheduled_date (and for a short tail after it, for late arrivals) the
+# prewarm job primes the exam metadata, the candidate paper, the assigned
+# roster and every assigned student's permission set in Redis, then keeps
+# re-priming them so nothing expires before the cohort arrives.
+#
+#   prewarm:exam:<exam_id>   hash: warmed_at, seconds, roster size
+STATUS_KEY = 'prewarm:exam:{}'
+STATUS_TTL = 24 * 3600
+DEFAULT_LEAD_MINUTES = 15
+TAIL = timedelta(minutes=10)
+# Well under the shortest TTL primed (permissions, 300s)
+REFRESH_SECONDS = 120
+PERMISSIONS_CHUNK = 1000
+
+logger = logging.getLogger(__name__)
+
+
+def load_roster(exam_id):
+    """IDs of students assigned to ``exam_id`` directly or through a group."""
+    direct = select(ExamAssignment.assigned_to_id).where(
+        ExamAssignment.exam_id == exam_id, ExamAssignment.assigned_to_type == 'user'
+    )
+    via_groups = select(StudentGroupMember.student_id).join(ExamAssignment, and_(
+        ExamAssignment.assigned_to_id == StudentGroupMember.group_id,
+        ExamAssignment.assigned_to_type == 'group'
+    )).where(ExamAssignment.exam_id == exam_id)
+    return sorted(str(user_id) for user_id in db.session.execute(union(direct, via_groups)).scalars())
+
+
+def _group_exams(member):
+    return tuple(
+        str(exam_id) for (exam_id,) in db.session.query(ExamAssignment.exam_id)
+        .filter_by(assigned_to_type='group', assigned_to_id=member.group_id)
+    )
+
+
+# Bulk roster imports insert without a flush, so those reach the cache via TTL
+exam_rosters = TwoTierCache('exam_roster', lambda exam_id: load_roster(uuid.UUID(exam_id)), ttl=300, max_local=64)
+exam_rosters.invalidate_on_commit(ExamAssignment, lambda assignment: str(assignment.exam_id))
+exam_rosters.invalidate_on_commit(StudentGroupMember, _group_exams)
+
+
+def get_exam_roster(exam_id):
+    return exam_rosters.get(exam_id)
+
+
+def lead_time():
+    return timedelta(minutes=current_app.config.get('EXAM_PREWARM_LEAD_MINUTES', DEFAULT_LEAD_MINUTES))
+
+
+def exams_due(now=None):
+    """Exams whose scheduled start is inside the warm-up window."""
+    now = now or datetime.utcnow()
+    return Exam.query.filter(
+        Exam.scheduled_date.between(now - TAIL, now + lead_time())
+    ).order_by(Exam.scheduled_date).all()
+
+
+def warm_exam(exam_id):
+    """Prime every cache an exam start reads; returns the roster size."""
+    started = time.monotonic()
+    key = str(exam_id)
+    exams.refresh(key)
+    papers.refresh(key)
+
+    # Generations are read before each load, so a change committed meanwhile isn't overwritten
+    generations = exam_rosters.generations(key)
+    roster = load_roster(exam_id)
+    exam_rosters.prime({key: roster}, generations)
+    for i in range(0, len(roster), PERMISSIONS_CHUNK):
+        chunk = roster[i:i + PERMISSIONS_CHUNK]
+        generations = user_permissions.generations(*chunk)
+        granted = {user_id: set() for user_id in chunk}
+        for user_id, name in permissions_query().filter(UserRole.user_id.in_(chunk)):
+            granted[str(user_id)].add(name)
+        user_permissions.prime({user_id: frozenset(names) for user_id, names in granted.items()}, generations)
+
+    redis_client.hset(STATUS_KEY.format(key), mapping={
+        "warmed_at": datetime.utcnow().isoformat(),
+        "seconds": round(time.monotonic() - started, 3),
+        "roster": len(roster)
+    })
+    redis_client.expire(STATUS_KEY.format(key), STATUS_TTL)
+    return len(roster)
+
+
+def prewarm_due_exams():
+    """Warm (or re-warm) every due exam not warmed in the last REFRESH_SECONDS."""
+    warmed = {}
+    for exam_id in [exam.id for exam in exams_due()]:
+        last = redis_client.hget(STATUS_KEY.format(exam_id), 'warmed_at')
+        if last and datetime.utcnow() - datetime.fromisoformat(last) < timedelta(seconds=REFRESH_SECONDS):
+            continue
+        try:
+            warmed[str(exam_id)] = warm_exam(exam_id)
+        except Exception as e:
+            logger.warning("Could not pre-warm exam %s: %s", exam_id, e)
+        # Each exam is its own unit of work; don't hold one snapshot across them
+        db.session.rollback()
+    return warmed
+
+
+def prewarm_status(exam):
+    """What is warm right now for ``exam``, with completeness from 0 to 1."""
+    key = str(exam.id)
+    status = redis_client.hgetall(STATUS_KEY.format(key))
+    roster = exam_rosters.get(key) if exam_rosters.cached(key) else []
+    permissions = sum(
+        len(user_permissions.cached(*roster[i:i + PERMISSIONS_CHUNK]))
+        for i in range(0, len(roster), PERMISSIONS_CHUNK)
+    )
+    parts = {
+        "metadata": bool(exams.cached(key)),
+        "paper": bool(papers.cached(key)),
+        "roster": bool(exam_rosters.cached(key))
+    }
+    permissions_ratio = permissions / len(roster) if roster else float(parts["roster"])
+    return {
+        "exam_id": key,
+        "title": exam.title,
+        "scheduled_date": exam.scheduled_date.isoformat() if exam.scheduled_date else None,
+        "warmed_at": status.get('warmed_at'),
+        "warm_seconds": float(status['seconds']) if status.get('seconds') else None,
+        **parts,
+        "roster_size": len(roster),
+        "permissions_cached": permissions,
+        "completeness": round((sum(parts.values()) + permissions_ratio) / (len(parts) + 1), 4)
+    }
@@ -0,0 +1,207 @@
+import time
+import uuid
+from datetime import datetime
+from flask import current_app
+from app.database import db, ExamAttempt, ProctorEventSummary
+from app.idempotency import release_lock
+from app.redis import redis_client
+
+# Proctoring heartbeats live in Redis and reach Postgres only as summaries.
+#
+#   proctor:attempt:<attempt_id>   hash with the attempt's owner and latest state,
+#                                  expires once heartbeats stop for STATE_TTL
+#   proctor:presence:<exam_id>     zset of attempt IDs scored by last heartbeat
+#   proctor:events:<attempt_id>    capped stream of heartbeats and client events
+#   proctor:dirty                  set of attempts with events not yet summarized
+#
+# flush_heartbeats() (a periodic job) turns new stream entries into one
+# ProctorEventSummary row per attempt.
+STATE_KEY = 'proctor:attempt:{}'
+PRESENCE_KEY = 'proctor:presence:{}'
+EVENTS_KEY = 'proctor:events:{}'
+DIRTY_KEY = 'proctor:dirty'
+FLUSHING_KEY = 'proctor:dirty:flushing'
+FLUSH_LOCK_KEY = 'proctor:flush:lock'
+
+DEFAULT_ACTIVE_SECONDS = 15
+STATE_TTL = 3600
+STREAM_MAXLEN = 1000
+FLUSH_BATCH = 500
+EVENT_TYPES = ('focus_lost', 'focus_gained', 'fullscreen_exit', 'tab_hidden', 'tab_visible', 'copy', 'paste')
+
+
+def _load_owner(exam_id, attempt_id):
+    """``(user_id, organization_id)`` of an open attempt, from Redis or the DB once."""
+    key = STATE_KEY.format(attempt_id)
+    user_id, attempt_exam_id, organization_id, closed = redis_client.hmget(
+        key, 'user_id', 'exam_id', 'organization_id', 'closed'
+    )
+    if user_id:
+        if closed or attempt_exam_id != str(exam_id):
+            return None, None
+        return user_id, organization_id
+    attempt = ExamAttempt.query.filter_by(
+        id=uuid.UUID(str(attempt_id)), exam_id=uuid.UUID(str(exam_id)), end_time=None
+    ).first()
+    if not attempt:
+        return None, None
+    redis_client.hset(key, mapping={
+        'user_id': str(attempt.user_id),
+        'exam_id': str(attempt.exam_id),
+        'organization_id': str(attempt.organization_id)
+    })
+    redis_client.expire(key, STATE_TTL)
+    return str(attempt.user_id), str(attempt.organization_id)
+
+
+def record_heartbeat(exam_id, attempt_id, user_id, focused=True, time_remaining=None, events=()):
+    """Record a heartbeat and any client events; False if the attempt isn't the caller's."""
+    owner, _ = _load_owner(exam_id, attempt_id)
+    if owner is None or owner != str(user_id):
+        return False
+
+    now = time.time()
+    stream = EVENTS_KEY.format(attempt_id)
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.hset(STATE_KEY.format(attempt_id), mapping={
+        'last_seen': now,
+        'focused': int(bool(focused)),
+        'time_remaining': '' if time_remaining is None else int(time_remaining)
+    })
+    pipe.expire(STATE_KEY.format(attempt_id), STATE_TTL)
+    pipe.zadd(PRESENCE_KEY.format(exam_id), {str(attempt_id): now})
+    pipe.xadd(stream, {
+        'type': 'heartbeat',
+        'focused': int(bool(focused)),
+        'time_remaining': '' if time_remaining is None else int(time_remaining)
+    }, maxlen=STREAM_MAXLEN, approximate=True)
+    for event in events:
+        if event.get('type') in EVENT_TYPES:
+            pipe.xadd(stream, {'type': event['type'], 'at': event.get('at') or ''},
+                      maxlen=STREAM_MAXLEN, approximate=True)
+    pipe.expire(stream, STATE_TTL)
+    pipe.sadd(DIRTY_KEY, str(attempt_id))
+    pipe.execute()
+    return True
+
+
+def end_attempt(exam_id, attempt_id):
+    """Stop tracking presence for a closed attempt; pending events are still flushed."""
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.zrem(PRESENCE_KEY.format(exam_id), str(attempt_id))
+    pipe.hset(STATE_KEY.format(attempt_id), 'closed', 1)
+    # Also creates the hash for attempts that never sent a heartbeat
+    pipe.expire(STATE_KEY.format(attempt_id), STATE_TTL)
+    pipe.execute()
+
+
+def exam_presence(exam_id, status=None):
+    """Candidates seen on an exam, marked ``active`` or ``disconnected``."""
+    active_seconds = current_app.config.get('HEARTBEAT_ACTIVE_SECONDS', DEFAULT_ACTIVE_SECONDS)
+    now = time.time()
+    seen = redis_client.zrange(PRESENCE_KEY.format(exam_id), 0, -1, withscores=True)
+    pipe = redis_client.pipeline(transaction=False)
+    for attempt_id, _ in seen:
+        pipe.hmget(STATE_KEY.format(attempt_id), 'user_id', 'focused', 'time_remaining')
+    states = pipe.execute()
+
+    candidates = []
+    expired = []
+    for (attempt_id, last_seen), (user_id, focused, time_remaining) in zip(seen, states):
+        if not user_id:
+            expired.append(attempt_id)
+            continue
+        candidate_status = 'active' if now - last_seen <= active_seconds else 'disconnected'
+        if status and status != candidate_status:
+            continue
+        candidates.append({
+            "attempt_id": attempt_id,
+            "user_id": user_id,
+            "status": candidate_status,
+            "focused": focused == '1',
+            "time_remaining": int(time_remaining) if time_remaining else None,
+            "last_seen": datetime.utcfromtimestamp(last_seen).isoformat(),
+            "seconds_since_seen": round(now - last_seen, 1)
+        })
+    if expired:
+        redis_client.zrem(PRESENCE_KEY.format(exam_id), *expired)
+    return candidates
+
+
+def _entry_time(entry_id):
+    """Server time encoded in a stream entry ID (``<ms>-<seq>``)."""
+    return datetime.utcfromtimestamp(int(entry_id.split('-')[0]) / 1000)
+
+
+def _summarize(attempt_id, state, entries):
+    heartbeats = [fields for _, fields in entries if fields.get('type') == 'heartbeat']
+    stamps = [_entry_time(entry_id) for entry_id, fields in entries if fields.get('type') == 'heartbeat']
+    gaps = [(b - a).total_seconds() for a, b in zip(stamps, stamps[1:])]
+    events = [
+        {"type": fields['type'], "at": fields.get('at') or _entry_time(entry_id).isoformat()}
+        for entry_id, fields in entries if fields.get('type') != 'heartbeat'
+    ]
+    first, last = entries[0][0], entries[-1][0]
+    time_remaining = next((h['time_remaining'] for h in reversed(heartbeats) if h.get('time_remaining')), None)
+    return {
+        "id": uuid.uuid4(),
+        "attempt_id": uuid.UUID(attempt_id),
+        "exam_id": uuid.UUID(state['exam_id']),
+        "user_id": uuid.UUID(state['user_id']),
+        "organization_id": uuid.UUID(state['organization_id']),
+        "window_start": _entry_time(first),
+        "window_end": _entry_time(last),
+        "heartbeats": len(heartbeats),
+        "unfocused_heartbeats": sum(1 for h in heartbeats if h.get('focused') == '0'),
+        "focus_lost": sum(1 for e in events if e['type'] == 'focus_lost'),
+        "max_gap_seconds": round(max(gaps), 1) if gaps else None,
+        "time_remaining": int(time_remaining) if time_remaining else None,
+        "events": events,
+        "last_event_id": last
+    }
+
+
+def flush_heartbeats():
+    """Persist one summary row per attempt with new events; returns rows written."""
+    # The lock's value is this run's token: a run that outlives the TTL must
+    # not delete a later run's lock, and stops at its next batch once it lost it
+    token = uuid.uuid4().hex
+    if not redis_client.set(FLUSH_LOCK_KEY, token, nx=True, ex=300):
+        return 0
+    try:
+        # Swap the dirty set out atomically, keeping leftovers of a failed run
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.sunionstore(FLUSHING_KEY, [FLUSHING_KEY, DIRTY_KEY])
+        pipe.delete(DIRTY_KEY)
+        pipe.execute()
+
+        written = 0
+        while True:
+            attempt_ids = redis_client.srandmember(FLUSHING_KEY, FLUSH_BATCH)
+            if not attempt_ids or redis_client.get(FLUSH_LOCK_KEY) != token:
+                return written
+            rows = []
+            for attempt_id in attempt_ids:
+                state = redis_client.hgetall(STATE_KEY.format(attempt_id))
+                if not state.get('user_id'):
+                    continue
+                # Stream IDs only grow, so the last persisted ID is the cursor
+                cursor = state.get('flushed_id')
+                entries = redis_client.xrange(EVENTS_KEY.format(attempt_id), min=cursor or '-')
+                entries = [entry for entry in entries if entry[0] != cursor]
+                if entries:
+                    rows.append(_summarize(attempt_id, state, entries))
+            if rows:
+                db.session.execute(
+                    ProctorEventSummary.__table__.insert(),
+                    [{k: v for k, v in row.items() if k != 'last_event_id'} for row in rows]
+                )
+                db.session.commit()
+            pipe = redis_client.pipeline(transaction=False)
+            for row in rows:
+                pipe.hset(STATE_KEY.format(row['attempt_id']), 'flushed_id', row['last_event_id'])
+            pipe.srem(FLUSHING_KEY, *attempt_ids)
+            pipe.execute()
+            written += len(rows)
+    finally:
+        release_lock(keys=[FLUSH_LOCK_KEY], args=[token])
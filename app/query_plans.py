@@ -0,0 +1,73 @@
+import json
+import uuid
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import text
+from app.database import db
+
+# The lookups behind our busiest endpoints. Each must be answerable from an
+# index; a sequential scan here means a missing or unusable index.
+HOT_QUERIES = {
+    'rbac.user_roles': "SELECT * FROM user_roles WHERE user_id = :id",
+    'rbac.role_permissions': "SELECT * FROM role_permissions WHERE role_id = :id",
+    'tokens.active_api_tokens': "SELECT * FROM api_tokens WHERE user_id = :id AND NOT revoked",
+    # list_exams with organization_id, first page
+    'exams.list_by_organization': (
+        "SELECT * FROM exams WHERE organization_id = :id ORDER BY created_at DESC, id LIMIT 10"
+    ),
+    'exams.questions': 'SELECT * FROM questions WHERE exam_id = :id ORDER BY "order"',
+    'exams.options': 'SELECT * FROM options WHERE question_id = :id ORDER BY "order"',
+    'exams.ongoing_attempt': (
+        "SELECT * FROM exam_attempts WHERE exam_id = :id AND user_id = :other_id AND end_time IS NULL"
+    ),
+    'exams.user_attempts': "SELECT * FROM exam_attempts WHERE exam_id = :id AND user_id = :other_id",
+    'exams.assignments_for_group': (
+        "SELECT * FROM exam_assignments WHERE assigned_to_type = 'group' AND assigned_to_id = :id"
+    ),
+    'groups.members': "SELECT * FROM student_group_members WHERE group_id = :id",
+    'groups.by_organization': "SELECT * FROM student_groups WHERE organization_id = :id",
+    'organizations.members': "SELECT * FROM user_organizations WHERE organization_id = :id",
+    'organizations.membership': (
+        "SELECT * FROM user_organizations WHERE organization_id = :id AND user_id = :other_id"
+    ),
+    'organizations.user_memberships': "SELECT * FROM user_organizations WHERE user_id = :id",
+}
+
+
+def _node_types(plan):
+    yield plan['Node Type'], plan.get('Relation Name')
+    for child in plan.get('Plans', []):
+        yield from _node_types(child)
+
+
+def find_seq_scans():
+    """EXPLAIN every hot query and return ``{name: [tables seq-scanned]}``.
+
+    Sequential scans are disabled for the check so the planner only falls
+    back to one when no index can serve the query; on tiny development
+    tables it would otherwise prefer a seq scan regardless.
+    """
+    params = {'id': uuid.uuid4(), 'other_id': uuid.uuid4()}
+    failures = {}
+    with db.engine.connect() as conn:
+        conn.execute(text("SET enable_seqscan = off"))
+        for name, sql in HOT_QUERIES.items():
+            result = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"), params).scalar()
+            plan = (json.loads(result) if isinstance(result, str) else result)[0]['Plan']
+            tables = [rel for node, rel in _node_types(plan) if node == 'Seq Scan']
+            if tables:
+                failures[name] = tables
+        conn.rollback()
+    return failures
+
+
+@click.command('check-query-plans')
+@with_appcontext
+def check_query_plans_command():
+    """Fail if any hot query plans a sequential scan."""
+    failures = find_seq_scans()
+    for name in HOT_QUERIES:
+        status = 'SEQ SCAN on ' + ', '.join(failures[name]) if name in failures else 'ok'
+        click.echo(f"{name:36} {status}")
+    if failures:
+        raise click.ClickException(f"{len(failures)} hot queries use sequential scans")
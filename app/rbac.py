@@ -1,6 +1,42 @@
 from functools import wraps
-from flask import request, jsonify
-from app.database import UserRole, Role, Permission, User
+from flask import g, request, jsonify
+from app.cache import TwoTierCache
+from app.database import db, UserRole, RolePermission, Permission
+
+def permissions_query():
+    """``(user_id, permission name)`` rows for every grant through a role."""
+    return db.session.query(UserRole.user_id, Permission.name) \
+        .join(RolePermission, RolePermission.role_id == UserRole.role_id) \
+        .join(Permission, Permission.id == RolePermission.permission_id) \
+        .distinct()
+
+def _load_permissions(user_id):
+    return frozenset(name for _, name in permissions_query().filter(UserRole.user_id == user_id))
+
+def _role_members(role_permission):
+    # A grant or revocation changes the permissions of everyone holding the role
+    return tuple(
+        str(user_id) for (user_id,) in
+        db.session.query(UserRole.user_id).filter_by(role_id=role_permission.role_id)
+    )
+
+user_permissions = TwoTierCache(
+    'user_permissions', _load_permissions, dump=sorted, load=frozenset, ttl=300, max_local=4096
+)
+user_permissions.invalidate_on_commit(UserRole, lambda user_role: str(user_role.user_id))
+user_permissions.invalidate_on_commit(RolePermission, _role_members)
+
+def get_user_permissions(user_id):
+    """Names of every permission granted to ``user_id`` through its roles.
+
+    Cached across requests (see ``user_permissions``) and memoized for the
+    rest of the request.
+    """
+    cache = g.setdefault('_user_permissions', {})
+    key = str(user_id)
+    if key not in cache:
+        cache[key] = user_permissions.get(key)
+    return cache[key]
 
 def authorize(permission_name):
     def decorator(f):
@@ -11,13 +47,8 @@ def authorize(permission_name):
                 return jsonify({"error": "Unauthorized"}), 401
 
             # Check if user has the required permission
-            user_roles = UserRole.query.filter_by(user_id=user_id).all()
-            role_ids = [ur.role_id for ur in user_roles]
-            roles = Role.query.filter(Role.id.in_(role_ids)).all()
-            for role in roles:
-                perms = [rp.permission_id for rp in role.role_permissions]
-                if Permission.query.filter(Permission.id.in_(perms), Permission.name == permission_name).first():
-                    return f(*args, **kwargs)
+            if permission_name in get_user_permissions(user_id):
+                return f(*args, **kwargs)
             return jsonify({"error": "Forbidden"}), 403
         return wrapper
-    return decorator
\ No newline at end of file
+    return decorator
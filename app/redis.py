@@ -1,3 +1,13 @@
+import os
 import redis
 
-redis_client = redis.Redis(host='localhost', port=6379, db=0, decode_responses=True)
\ No newline at end of file
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+
+redis_client = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+# Bytes-returning client used by the auth routes
+raw_redis_client = redis.Redis.from_url(REDIS_URL)
+
+def reset_connection_pools():
+    """Drop connections inherited from a parent process; call after fork."""
+    for client in (redis_client, raw_redis_client):
+        client.connection_pool.reset()
@@ -0,0 +1,151 @@
+import random
+import time
+from contextlib import contextmanager
+from functools import wraps
+from flask import g, has_app_context, has_request_context, request, current_app
+from flask_sqlalchemy.session import Session
+from sqlalchemy import text
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.elements import TextClause
+from app.redis import redis_client
+
+# Read-replica routing. Replicas are configured as SQLALCHEMY_BINDS whose key
+# starts with "replica"; GET/HEAD handlers (and code wrapped in read_only())
+# read from a healthy replica, everything else goes to the primary. After a
+# request writes, the caller is pinned to the primary for a few seconds so
+# they read their own writes.
+REPLICA_BIND_PREFIX = 'replica'
+READ_METHODS = ('GET', 'HEAD')
+
+DEFAULT_MAX_LAG_SECONDS = 5.0
+DEFAULT_LAG_CHECK_INTERVAL = 2.0
+DEFAULT_STICKY_SECONDS = 5
+
+LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+_lag_cache = {}  # engine url -> (checked_at, lag seconds or None when unreachable)
+
+
+def replica_lag(engine):
+    """Replication lag of ``engine`` in seconds, cached briefly; ``None`` if unreachable."""
+    interval = current_app.config.get('REPLICA_LAG_CHECK_INTERVAL', DEFAULT_LAG_CHECK_INTERVAL)
+    checked_at, lag = _lag_cache.get(engine.url, (0, None))
+    now = time.monotonic()
+    if now - checked_at > interval:
+        try:
+            with engine.connect() as conn:
+                lag = float(conn.execute(LAG_QUERY).scalar())
+        except Exception:
+            lag = None
+        _lag_cache[engine.url] = (now, lag)
+    return lag
+
+
+def healthy_replicas(engines):
+    max_lag = current_app.config.get('REPLICA_MAX_LAG_SECONDS', DEFAULT_MAX_LAG_SECONDS)
+    replicas = []
+    for key, engine in engines.items():
+        if key and key.startswith(REPLICA_BIND_PREFIX):
+            lag = replica_lag(engine)
+            if lag is not None and lag <= max_lag:
+                replicas.append(engine)
+    return replicas
+
+
+def _sticky_key(user_id):
+    return f"db:sticky:{user_id}"
+
+
+def _is_sticky():
+    """Whether the caller wrote recently and must read from the primary."""
+    user_id = g.get('user_id')
+    if not user_id:
+        return False
+    if '_db_sticky' not in g:
+        try:
+            g._db_sticky = bool(redis_client.exists(_sticky_key(user_id)))
+        except Exception:
+            g._db_sticky = True
+    return g._db_sticky
+
+
+def _wants_replica():
+    if not has_app_context() or g.get('_db_wrote') or g.get('_db_primary'):
+        return False
+    if g.get('_db_read_only'):
+        return True
+    return has_request_context() and request.method in READ_METHODS and not _is_sticky()
+
+
+def _is_write(clause):
+    if isinstance(clause, UpdateBase):
+        return True
+    # Raw SQL can't be inspected; anything but a plain SELECT counts as a write
+    return isinstance(clause, TextClause) and not clause.text.lstrip().upper().startswith('SELECT')
+
+
+class RoutingSession(Session):
+    """Session that sends reads to a replica when the current request allows it"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if self._flushing or _is_write(clause):
+            if has_app_context():
+                g._db_wrote = True
+        elif bind is None and not isinstance(clause, TextClause) and _wants_replica():
+            # Raw SQL always runs on the primary (advisory locks, DML inside WITH)
+            replicas = healthy_replicas(self._db.engines)
+            if replicas:
+                return random.choice(replicas)
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@contextmanager
+def read_only():
+    """Route reads to replicas outside GET handlers, e.g. for reports and exports."""
+    previous = g.get('_db_read_only', False)
+    g._db_read_only = True
+    try:
+        yield
+    finally:
+        g._db_read_only = previous
+
+
+@contextmanager
+def primary_reads():
+    """Read from the primary, e.g. while computing a value other callers will be served."""
+    previous = g.get('_db_primary', False)
+    g._db_primary = True
+    try:
+        yield
+    finally:
+        g._db_primary = previous
+
+
+def replica_reads(f):
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        with read_only():
+            return f(*args, **kwargs)
+    return wrapper
+
+
+def init_replica_routing(app):
+    @app.after_request
+    def pin_writer_to_primary(response):
+        user_id = g.get('user_id')
+        if g.get('_db_wrote') and user_id:
+            try:
+                redis_client.setex(
+                    _sticky_key(user_id),
+                    app.config.get('REPLICA_STICKY_SECONDS', DEFAULT_STICKY_SECONDS),
+                    1
+                )
+            except Exception:
+                app.logger.warning("Could not pin user %s to the primary", user_id)
+        return response
@@ -0,0 +1,204 @@
+import hashlib
+import json
+import logging
+import time
+from functools import wraps
+from flask import request, make_response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.redis import redis_client
+from app.replicas import primary_reads
+
+# Response cache for read endpoints. Entries are keyed by endpoint, URL
+# arguments, the caller's scope and the current version of every tag (table)
+# the endpoint reads; committing a change to a tagged table bumps its version,
+# so stale entries are never read again and simply expire.
+#
+#   rc:tag:<table>              version counter, INCR'd after commit
+#   rc:entry:<endpoint>:<hash>  cached status and body
+#   rc:lock:<endpoint>:<hash>   single-flight lock while one worker recomputes
+#   rc:stats:<endpoint>         hit / miss / wait counters
+TAG_KEY = 'rc:tag:{}'
+ENTRY_KEY = 'rc:entry:{}:{}'
+LOCK_KEY = 'rc:lock:{}:{}'
+STATS_KEY = 'rc:stats:{}'
+STATS_PATTERN = 'rc:stats:*'
+
+DEFAULT_TTL = 60
+LOCK_TTL_MS = 5000
+LOCK_WAIT_SECONDS = 2.0
+LOCK_POLL_SECONDS = 0.05
+
+logger = logging.getLogger(__name__)
+
+
+def _caller_scope(scope):
+    if scope == 'permissions':
+        # Same permissions, same page: the listings don't filter by caller
+        from app.rbac import get_user_permissions
+        return ','.join(sorted(get_user_permissions(request.user_id)))
+    if scope == 'user':
+        return str(request.user_id)
+    if scope == 'organization':
+        return request.args.get('organization_id', '')
+    return ''
+
+
+def _cache_key(endpoint, tags, scope):
+    versions = redis_client.mget([TAG_KEY.format(tag) for tag in tags])
+    raw = json.dumps([
+        sorted(request.view_args.items()),
+        sorted(request.args.items(multi=True)),
+        _caller_scope(scope),
+        [v or '0' for v in versions]
+    ], default=str)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _cached(endpoint, digest):
+    entry = redis_client.get(ENTRY_KEY.format(endpoint, digest))
+    if entry is None:
+        return None
+    entry = json.loads(entry)
+    response = make_response(entry["body"], entry["status"])
+    response.mimetype = entry["mimetype"]
+    response.headers["X-Cache"] = "HIT"
+    return response
+
+
+def _count(endpoint, counter):
+    try:
+        redis_client.hincrby(STATS_KEY.format(endpoint), counter, 1)
+    except Exception as e:
+        logger.debug("Could not count %s for %s: %s", counter, endpoint, e)
+
+
+def _store(endpoint, digest, response, ttl):
+    try:
+        redis_client.set(ENTRY_KEY.format(endpoint, digest), json.dumps({
+            "status": response.status_code,
+            "mimetype": response.mimetype,
+            "body": response.get_data(as_text=True)
+        }), ex=ttl)
+    except Exception as e:
+        logger.warning("Could not store cached response for %s: %s", endpoint, e)
+
+
+def _release(lock_key):
+    try:
+        redis_client.delete(lock_key)
+    except Exception as e:
+        logger.warning("Could not release %s: %s", lock_key, e)
+
+
+def cached_response(tags, ttl=DEFAULT_TTL, scope='permissions'):
+    """Cache a GET view's 200 responses until one of ``tags`` (table names) changes.
+
+    Goes below ``authorize`` so only permitted callers reach the cache.
+    ``scope`` separates callers who may see different data: ``permissions``
+    (the caller's permission set), ``user``, ``organization`` (the
+    ``organization_id`` argument) or ``None``.
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            endpoint = request.endpoint
+            acquired = False
+            try:
+                digest = _cache_key(endpoint, tags, scope)
+                response = _cached(endpoint, digest)
+                if response is not None:
+                    _count(endpoint, 'hits')
+                    return response
+
+                # Single flight: one caller recomputes, the others wait for its entry
+                lock_key = LOCK_KEY.format(endpoint, digest)
+                acquired = redis_client.set(lock_key, 1, nx=True, px=LOCK_TTL_MS)
+                if not acquired:
+                    deadline = time.monotonic() + LOCK_WAIT_SECONDS
+                    while time.monotonic() < deadline:
+                        time.sleep(LOCK_POLL_SECONDS)
+                        response = _cached(endpoint, digest)
+                        if response is not None:
+                            _count(endpoint, 'waits')
+                            return response
+                        if not redis_client.exists(lock_key):
+                            break
+            except Exception as e:
+                logger.warning("Response cache unavailable for %s: %s", endpoint, e)
+                return f(*args, **kwargs)
+
+            _count(endpoint, 'misses')
+            try:
+                # A replica may not have the commit that bumped the tag yet; an
+                # entry filled from it would serve the old data under the new version
+                with primary_reads():
+                    response = make_response(f(*args, **kwargs))
+                if response.status_code == 200:
+                    _store(endpoint, digest, response, ttl)
+            finally:
+                if acquired:
+                    _release(lock_key)
+            response.headers["X-Cache"] = "MISS"
+            return response
+        return wrapper
+    return decorator
+
+
+def cache_stats():
+    """Per-endpoint hits, misses, single-flight waits and hit rate."""
+    stats = {}
+    for key in redis_client.scan_iter(STATS_PATTERN):
+        counters = {k: int(v) for k, v in redis_client.hgetall(key).items()}
+        hits = counters.get('hits', 0) + counters.get('waits', 0)
+        total = hits + counters.get('misses', 0)
+        stats[key.split(':', 2)[2]] = {
+            "hits": counters.get('hits', 0),
+            "waits": counters.get('waits', 0),
+            "misses": counters.get('misses', 0),
+            "hit_rate": round(hits / total, 4) if total else None
+        }
+    return stats
+
+
+# Invalidation: collect the tables a transaction writes, bump their tags once it commits.
+
+def _touched(session):
+    return session.info.setdefault('rc_touched_tables', set())
+
+
+@event.listens_for(Session, 'before_flush')
+def _track_flush(session, flush_context, instances):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        table = getattr(obj, '__table__', None)
+        if table is not None:
+            _touched(session).add(table.name)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_statement(orm_execute_state):
+    # Bulk inserts/updates issued with session.execute() bypass flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None:
+            _touched(orm_execute_state.session).add(table.name)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate(session):
+    tables = session.info.pop('rc_touched_tables', None)
+    if not tables:
+        return
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for table in tables:
+            pipe.incr(TAG_KEY.format(table))
+        pipe.execute()
+    except Exception as e:
+        logger.warning("Could not invalidate cached responses for %s: %s", ', '.join(sorted(tables)), e)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard(session, previous_transaction):
+    if not previous_transaction.nested:
+        session.info.pop('rc_touched_tables', None)
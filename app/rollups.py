@@ -0,0 +1,168 @@
+import uuid
+from datetime import datetime
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from app.database import db, Organization, ResultRollup, StudentGroup, StudentGroupMember
+
+# Result totals per exam, per student group and per organization, kept in
+# result_rollups so a dashboard is one indexed read. Grading adds each attempt
+# to its rows in the same transaction that marks it graded; the reconciliation
+# job recomputes an organization's rows from exam_attempts to correct drift
+# (group membership changes, edited pass marks, renamed exams).
+#
+# Grading holds a shared advisory lock on the organization and reconciliation
+# an exclusive one, so a recount never overwrites an increment it did not see.
+# Passing means percentage >= the exam's passing_percentage; exams without one
+# count towards averages but never as passed.
+LOCK_NAMESPACE = 0x7e4a0003
+
+# One organization's rows rebuilt from its graded attempts. Returns how many
+# rows were corrected and how many were removed.
+RECONCILE = text("""
+    WITH graded AS MATERIALIZED (
+        SELECT a.exam_id, a.user_id, a.percentage,
+               (e.passing_percentage IS NOT NULL AND a.percentage >= e.passing_percentage) AS passed
+        FROM exam_attempts a
+        JOIN exams e ON e.id = a.exam_id
+        WHERE a.organization_id = :org AND a.status = 'graded' AND a.percentage IS NOT NULL
+    ),
+    totals AS (
+        SELECT 'exam' AS scope, g.exam_id AS scope_id, min(e.title) AS label,
+               count(*) AS graded, count(*) FILTER (WHERE g.passed) AS passed,
+               sum(g.percentage) AS percentage_sum
+        FROM graded g JOIN exams e ON e.id = g.exam_id
+        GROUP BY g.exam_id
+        UNION ALL
+        SELECT 'group', sg.id, min(sg.name), count(*), count(*) FILTER (WHERE g.passed), sum(g.percentage)
+        FROM graded g
+        JOIN student_group_members m ON m.student_id = g.user_id
+        JOIN student_groups sg ON sg.id = m.group_id AND sg.organization_id = :org
+        GROUP BY sg.id
+        UNION ALL
+        SELECT 'organization', o.id, min(o.name), count(*), count(*) FILTER (WHERE g.passed), sum(g.percentage)
+        FROM graded g JOIN organizations o ON o.id = :org
+        GROUP BY o.id
+    ),
+    upserted AS (
+        INSERT INTO result_rollups
+            (id, organization_id, scope, scope_id, label, graded, passed, percentage_sum, updated_at)
+        SELECT gen_random_uuid(), :org, scope, scope_id, label, graded, passed, percentage_sum, :now
+        FROM totals
+        ON CONFLICT (scope, scope_id) DO UPDATE SET
+            label = excluded.label,
+            graded = excluded.graded,
+            passed = excluded.passed,
+            percentage_sum = excluded.percentage_sum,
+            updated_at = excluded.updated_at
+        WHERE (result_rollups.label, result_rollups.graded, result_rollups.passed, result_rollups.percentage_sum)
+              IS DISTINCT FROM (excluded.label, excluded.graded, excluded.passed, excluded.percentage_sum)
+        RETURNING 1
+    ),
+    removed AS (
+        DELETE FROM result_rollups r
+        WHERE r.organization_id = :org
+          AND NOT EXISTS (SELECT 1 FROM totals t WHERE t.scope = r.scope AND t.scope_id = r.scope_id)
+        RETURNING 1
+    )
+    SELECT (SELECT count(*) FROM upserted), (SELECT count(*) FROM removed)
+""")
+
+
+def _lock(organization_id, shared):
+    function = 'pg_advisory_xact_lock_shared' if shared else 'pg_advisory_xact_lock'
+    db.session.execute(
+        text(f"SELECT {function}(:ns, hashtext(:org))"),
+        {"ns": LOCK_NAMESPACE, "org": str(organization_id)}
+    )
+
+
+def add_graded(attempt):
+    """Add a just-graded attempt to its exam, group and organization rollups (not committed)."""
+    if attempt.percentage is None:
+        return
+    exam = attempt.exam
+    passed = int(exam.passing_percentage is not None and attempt.percentage >= exam.passing_percentage)
+    groups = db.session.query(StudentGroup.id, StudentGroup.name).join(
+        StudentGroupMember, StudentGroupMember.group_id == StudentGroup.id
+    ).filter(
+        StudentGroupMember.student_id == attempt.user_id,
+        StudentGroup.organization_id == attempt.organization_id
+    ).all()
+    organization_name = db.session.query(Organization.name).filter_by(id=attempt.organization_id).scalar()
+
+    now = datetime.utcnow()
+    rows = [('exam', exam.id, exam.title), ('organization', attempt.organization_id, organization_name)]
+    rows += [('group', group_id, name) for group_id, name in groups]
+    # A fixed order, so concurrent gradings lock shared rows the same way round
+    rows.sort(key=lambda row: (row[0], str(row[1])))
+
+    _lock(attempt.organization_id, shared=True)
+    statement = insert(ResultRollup.__table__).values([{
+        "id": uuid.uuid4(),
+        "organization_id": attempt.organization_id,
+        "scope": scope,
+        "scope_id": scope_id,
+        "label": label,
+        "graded": 1,
+        "passed": passed,
+        "percentage_sum": attempt.percentage,
+        "updated_at": now
+    } for scope, scope_id, label in rows])
+    columns = ResultRollup.__table__.c
+    db.session.execute(statement.on_conflict_do_update(
+        constraint='uq_result_rollups_scope_scope_id',
+        set_={
+            "label": statement.excluded.label,
+            "graded": columns.graded + statement.excluded.graded,
+            "passed": columns.passed + statement.excluded.passed,
+            "percentage_sum": columns.percentage_sum + statement.excluded.percentage_sum,
+            "updated_at": statement.excluded.updated_at
+        }
+    ))
+
+
+def reconcile_organization(organization_id):
+    """Recompute one organization's rollups; returns ``(corrected, removed)`` row counts."""
+    _lock(organization_id, shared=False)
+    corrected, removed = db.session.execute(
+        RECONCILE, {"org": organization_id, "now": datetime.utcnow()}
+    ).one()
+    db.session.commit()
+    return corrected, removed
+
+
+def reconcile_rollups():
+    """Reconcile every organization, each in its own transaction."""
+    corrected = removed = 0
+    for organization_id in [org_id for (org_id,) in db.session.query(Organization.id)]:
+        fixed, dropped = reconcile_organization(organization_id)
+        corrected += fixed
+        removed += dropped
+    db.session.rollback()
+    return corrected, removed
+
+
+def rollup_summary(rollup):
+    return {
+        "graded": rollup.graded,
+        "passed": rollup.passed,
+        "pass_rate": round(rollup.passed / rollup.graded, 4) if rollup.graded else None,
+        "average_percentage": round(float(rollup.percentage_sum) / rollup.graded, 2) if rollup.graded else None
+    }
+
+
+def organization_dashboard(organization_id):
+    """Exam, group and organization results from one indexed read of result_rollups."""
+    rollups = ResultRollup.query.filter_by(organization_id=organization_id).all()
+    dashboard = {
+        "organization": {"graded": 0, "passed": 0, "pass_rate": None, "average_percentage": None},
+        "exams": [],
+        "groups": []
+    }
+    for rollup in sorted(rollups, key=lambda r: (r.label or '', str(r.scope_id))):
+        summary = rollup_summary(rollup)
+        if rollup.scope == 'organization':
+            dashboard["organization"] = {**summary, "updated_at": rollup.updated_at.isoformat()}
+        else:
+            dashboard[rollup.scope + "s"].append({"id": str(rollup.scope_id), "name": rollup.label, **summary})
+    return dashboard
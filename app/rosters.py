@@ -0,0 +1,118 @@
+import csv
+import io
+import uuid
+from sqlalchemy import or_
+from sqlalchemy.dialects.postgresql import insert
+from app.database import db, StudentGroupMember, User
+
+ROSTER_FIELDS = ('user_id', 'email')
+BULK_INSERT_CHUNK = 1000
+
+
+def read_roster(req, key='members'):
+    """Read a roster from a JSON body or an uploaded/posted CSV.
+
+    JSON bodies carry a list under ``key`` whose entries are either plain
+    strings (a user ID or an email) or objects with the same columns as the
+    CSV. CSV input may come as a multipart ``file`` field or as a raw
+    ``text/csv`` body; a header row is used when present, otherwise the first
+    column is taken as the identifier. Always returns a list of dicts.
+    """
+    upload = req.files.get('file')
+    if upload is not None:
+        return _read_csv(upload.read().decode('utf-8-sig'))
+    if req.mimetype == 'text/csv':
+        return _read_csv(req.get_data(as_text=True))
+
+    data = req.get_json(silent=True) or {}
+    entries = data.get(key) if isinstance(data, dict) else data
+    if not isinstance(entries, list):
+        raise ValueError(f"'{key}' must be a list")
+
+    rows = []
+    for entry in entries:
+        if isinstance(entry, dict):
+            rows.append({k: (str(v).strip() if v is not None else None) for k, v in entry.items()})
+        elif entry is not None:
+            rows.append({'identifier': str(entry).strip()})
+    return rows
+
+
+def _read_csv(text):
+    sample = text.lstrip().splitlines()[:1]
+    has_header = bool(sample) and any(
+        col.strip().lower() in ROSTER_FIELDS + ('identifier', 'role_name', 'name', 'username')
+        for col in next(csv.reader(sample))
+    )
+    if has_header:
+        reader = csv.DictReader(io.StringIO(text))
+        return [
+            {k.strip().lower(): (v.strip() if v else None) for k, v in row.items() if k}
+            for row in reader
+        ]
+    return [
+        {'identifier': row[0].strip()}
+        for row in csv.reader(io.StringIO(text))
+        if row and row[0].strip()
+    ]
+
+
+def split_identifier(row):
+    """Return ``(user_id, email)`` for a roster row; either may be ``None``."""
+    user_id = row.get('user_id')
+    email = row.get('email')
+    identifier = row.get('identifier')
+    if identifier:
+        if '@' in identifier:
+            email = email or identifier
+        else:
+            user_id = user_id or identifier
+    if user_id:
+        try:
+            user_id = uuid.UUID(user_id)
+        except ValueError:
+            user_id = None
+    return user_id, email
+
+
+def add_group_members(group_id, roster):
+    """Add roster rows to a group and commit; returns ``(added, skipped, unknown)``."""
+    entries = []
+    for row in roster:
+        user_id, email = split_identifier(row)
+        entries.append((row, user_id, email))
+
+    # Resolve every ID and email in a single query
+    ids = {user_id for _, user_id, _ in entries if user_id}
+    emails = {email for _, _, email in entries if email}
+    users = db.session.query(User.id, User.email).filter(
+        or_(User.id.in_(ids), User.email.in_(emails))
+    ).all() if ids or emails else []
+    known_ids = {u.id for u in users}
+    by_email = {u.email: u.id for u in users if u.email}
+
+    student_ids = []
+    seen = set()
+    unknown = []
+    for row, user_id, email in entries:
+        student_id = user_id if user_id in known_ids else by_email.get(email)
+        if not student_id:
+            unknown.append(row.get('identifier') or row.get('user_id') or row.get('email'))
+        elif student_id not in seen:
+            seen.add(student_id)
+            student_ids.append(student_id)
+
+    # Multi-row inserts in one transaction; the unique constraint skips existing members
+    added = 0
+    for start in range(0, len(student_ids), BULK_INSERT_CHUNK):
+        chunk = student_ids[start:start + BULK_INSERT_CHUNK]
+        stmt = insert(StudentGroupMember.__table__).values([
+            {"id": uuid.uuid4(), "group_id": group_id, "student_id": student_id}
+            for student_id in chunk
+        ]).on_conflict_do_nothing(
+            constraint='uq_student_group_members_group_student'
+        ).returning(StudentGroupMember.__table__.c.student_id)
+        added += len(db.session.execute(stmt).all())
+    db.session.commit()
+
+    return added, len(roster) - added - len(unknown), unknown
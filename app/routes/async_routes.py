@@ -0,0 +1,287 @@
+import logging
+import math
+import uuid
+from datetime import datetime
+from authlib.integrations.httpx_client import AsyncOAuth2Client
+from sqlalchemy import func, select
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+from app import aio
+from app.answers import autosave_statement
+from app.database import Exam, ExamAttempt, Role, Tenant, User, UserRole
+from app.idempotency import idempotent_async
+from app.live import ensure_counters_async, event_stream_async, publish_attempt_events_async
+from app.routes.auth_routes import DefaultConfigTenant
+from app.tokens import generate_access_token, generate_refresh_token
+
+# Async versions of the I/O-heavy endpoints, served natively by run_asgi.py in
+# front of the Flask app. Paths and response shapes match the blueprints.
+
+
+def _error(message, status):
+    return JSONResponse({"success": False, "error": message}, status_code=status)
+
+
+async def _authorized(request, session, permission_name):
+    """Return ``(user_id, None)`` or ``(None, error_response)``."""
+    user_id = await aio.authenticate(request)
+    if not user_id:
+        return None, JSONResponse({"error": "Unauthorized"}, status_code=401)
+    if permission_name and not await aio.has_permission(session, user_id, permission_name):
+        return None, JSONResponse({"error": "Forbidden"}, status_code=403)
+    return user_id, None
+
+
+def _page_args(request):
+    try:
+        page = int(request.query_params.get('page', 1))
+        per_page = int(request.query_params.get('per_page', 10))
+    except ValueError:
+        page, per_page = 1, 10
+    return max(page, 1), max(per_page, 1)
+
+
+async def callback(request):
+    """OAuth2 callback handler"""
+    domain = request.query_params.get('domain')
+    code = request.query_params.get('code')
+
+    # Separate sessions before and after the token exchange, so no pooled
+    # connection is held across the identity provider's round trips
+    async with aio.async_session() as session:
+        tenant = await session.scalar(select(Tenant).where(Tenant.domain == domain))
+        if not tenant:
+            tenant = DefaultConfigTenant
+
+    try:
+        async with AsyncOAuth2Client(
+            client_id=tenant.client_id,
+            client_secret=tenant.client_secret,
+            redirect_uri=f"http://localhost:8080/auth/callback?domain={tenant.domain}",
+            scope="openid profile email"
+        ) as client:
+            await client.fetch_token(tenant.token_url, code=code)
+            resp = await client.get(tenant.userinfo_url)
+            user_info = resp.json()
+
+        async with aio.async_session() as session:
+            user = await session.scalar(select(User).where(User.email == user_info.get("email")))
+            if not user:
+                user = User(
+                    id=uuid.uuid4(),
+                    username=user_info.get("email"),
+                    email=user_info.get("email"),
+                    name=user_info.get("name"),
+                    picture=user_info.get("picture", "")
+                )
+                session.add(user)
+                member_role_id = await session.scalar(select(Role.id).where(Role.name == "Member"))
+                if member_role_id:
+                    session.add(UserRole(id=uuid.uuid4(), user_id=user.id, role_id=member_role_id))
+                await session.commit()
+
+        access_token = generate_access_token(user.id, user.email)
+        refresh_token = generate_refresh_token()
+        await aio.redis_client.setex(
+            f"refresh:{refresh_token}", 30 * 24 * 3600, f"{user.id}:{user.email}"
+        )
+
+        return JSONResponse({
+            "user": user.to_dict(),
+            "access_token": access_token,
+            "refresh_token": refresh_token,
+            "expires_in": 3600
+        })
+
+    except Exception as e:
+        logging.error(f"OAuth error: {str(e)}")
+        return JSONResponse({"error": "Authentication failed"}, status_code=401)
+
+
+async def list_exams(request):
+    """List all exams with pagination"""
+    async with aio.async_session() as session:
+        user_id, error = await _authorized(request, session, 'read:exams')
+        if error:
+            return error
+        try:
+            page, per_page = _page_args(request)
+            query = select(Exam)
+            org_id = request.query_params.get('organization_id')
+            if org_id:
+                query = query.where(Exam.organization_id == uuid.UUID(org_id))
+
+            total = await session.scalar(select(func.count()).select_from(query.subquery()))
+            exams = (await session.scalars(
+                query.order_by(Exam.created_at.desc(), Exam.id).limit(per_page).offset((page - 1) * per_page)
+            )).all()
+
+            return JSONResponse({
+                "success": True,
+                "exams": [{
+                    "id": str(exam.id),
+                    "title": exam.title,
+                    "description": exam.description,
+                    "duration": exam.duration,
+                    "total_marks": exam.total_marks,
+                    "is_published": exam.is_published,
+                    "scheduled_date": exam.scheduled_date.isoformat() if exam.scheduled_date else None,
+                    "parent_exam_id": str(exam.parent_exam_id) if exam.parent_exam_id else None,
+                    "version": exam.version,
+                    "created_at": exam.created_at.isoformat()
+                } for exam in exams],
+                "total": total,
+                "pages": math.ceil(total / per_page),
+                "current_page": page
+            })
+        except Exception as e:
+            return _error(str(e), 500)
+
+
+async def list_users(request):
+    """Get all users with pagination and filtering"""
+    async with aio.async_session() as session:
+        user_id, error = await _authorized(request, session, 'read:users')
+        if error:
+            return error
+        try:
+            page, per_page = _page_args(request)
+            query = select(User)
+            role = request.query_params.get('role')
+            if role:
+                query = query.join(UserRole).join(Role).where(Role.name == role)
+
+            total = await session.scalar(select(func.count()).select_from(query.subquery()))
+            users = (await session.scalars(
+                query.limit(per_page).offset((page - 1) * per_page)
+            )).all()
+
+            return JSONResponse({
+                "success": True,
+                "users": [user.to_dict() for user in users],
+                "total": total,
+                "pages": math.ceil(total / per_page),
+                "current_page": page
+            })
+        except Exception as e:
+            return _error(str(e), 500)
+
+
+@idempotent_async
+async def start_exam(request):
+    """Start an exam attempt"""
+    async with aio.async_session() as session:
+        user_id, error = await _authorized(request, session, None)
+        if error:
+            return error
+        try:
+            exam = await session.get(Exam, uuid.UUID(request.path_params['exam_id']))
+            if not exam:
+                return _error("Exam not found", 404)
+
+            existing_attempt = await session.scalar(
+                select(ExamAttempt.id).where(
+                    ExamAttempt.exam_id == exam.id,
+                    ExamAttempt.user_id == user_id,
+                    ExamAttempt.end_time.is_(None)
+                ).limit(1)
+            )
+            if existing_attempt:
+                return _error("You already have an ongoing attempt", 400)
+
+            attempt = ExamAttempt(
+                id=uuid.uuid4(),
+                exam_id=exam.id,
+                user_id=user_id,
+                organization_id=exam.organization_id,
+                start_time=datetime.utcnow(),
+                status="ongoing"
+            )
+            session.add(attempt)
+            await session.commit()
+            await publish_attempt_events_async(aio.redis_client, 'started', [attempt])
+
+            return JSONResponse({
+                "success": True,
+                "attempt_id": str(attempt.id),
+                "start_time": attempt.start_time.isoformat()
+            }, status_code=201)
+
+        except Exception as e:
+            await session.rollback()
+            return _error(str(e), 500)
+
+
+async def save_answers(request):
+    """Autosave answers for an ongoing attempt"""
+    async with aio.async_session() as session:
+        user_id, error = await _authorized(request, session, None)
+        if error:
+            return error
+        try:
+            data = await request.json()
+            if not data or not isinstance(data.get('answers'), dict):
+                return _error("Answers are required", 400)
+
+            attempt_id = uuid.UUID(request.path_params['attempt_id'])
+            exam_id = uuid.UUID(request.path_params['exam_id'])
+            result = await session.execute(autosave_statement(attempt_id, exam_id, user_id, data['answers']))
+            if not result.rowcount:
+                found = await session.scalar(
+                    select(ExamAttempt.id).where(
+                        ExamAttempt.id == attempt_id,
+                        ExamAttempt.exam_id == exam_id,
+                        ExamAttempt.user_id == user_id
+                    )
+                )
+                await session.rollback()
+                if not found:
+                    return _error("Attempt not found", 404)
+                return _error("Attempt is already closed", 400)
+            await session.commit()
+
+            return JSONResponse({"success": True, "saved": len(data['answers'])})
+
+        except ValueError:
+            return _error("Invalid ID", 400)
+        except Exception as e:
+            await session.rollback()
+            return _error(str(e), 500)
+
+
+def _events(scope, path_param, permission_name):
+    async def handler(request):
+        async with aio.async_session() as session:
+            user_id, error = await _authorized(request, session, permission_name)
+            if error:
+                return error
+            try:
+                scope_id = uuid.UUID(request.path_params[path_param])
+                await ensure_counters_async(aio.redis_client, session, scope, scope_id)
+            except ValueError:
+                return _error("Invalid ID", 400)
+            except Exception as e:
+                return _error(str(e), 500)
+
+        return StreamingResponse(
+            event_stream_async(aio.redis_client, scope, scope_id, request.is_disconnected),
+            media_type='text/event-stream',
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    handler.__doc__ = f"Server-sent events for one {scope}"
+    return handler
+
+
+exam_events = _events('exam', 'exam_id', 'read:exams')
+organization_events = _events('organization', 'org_id', 'read:organizations')
+
+
+routes = [
+    Route('/auth/callback', callback, methods=['GET']),
+    Route('/api/v1/exams/', list_exams, methods=['GET']),
+    Route('/api/v1/users', list_users, methods=['GET']),
+    Route('/api/v1/exams/{exam_id}/start', start_exam, methods=['POST']),
+    Route('/api/v1/exams/{exam_id}/attempts/{attempt_id}/answers', save_answers, methods=['PUT']),
+    Route('/api/v1/exams/{exam_id}/events', exam_events, methods=['GET']),
+    Route('/api/v1/organizations/{org_id}/events', organization_events, methods=['GET']),
+]
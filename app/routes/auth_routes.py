@@ -1,10 +1,11 @@
 from flask import Blueprint, request, jsonify, redirect
-from redis import Redis
 from requests_oauthlib import OAuth2Session
 import logging
 from datetime import datetime, timedelta
 import uuid
-from app.database import db, Tenant, User, APIToken, assign_user_role
+from app.database import db, User, APIToken, assign_user_role, get_tenant
+from app.redis import raw_redis_client as redis_client
+from app.replicas import primary_reads
 from app.tokens import (
     generate_access_token, 
     generate_refresh_token, 
@@ -14,8 +15,7 @@ from app.tokens import (
 
 bp = Blueprint('auth', __name__, url_prefix='/auth')
 
-redis_client = Redis()
-logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 ctx = None  # Not needed in Python, but kept for similarity
 DefaultConfigTenant = None
@@ -27,13 +27,12 @@ def login():
     if not domain:
         return jsonify({"error": "Domain is required"}), 400
 
-    tenant = Tenant.query.filter_by(domain=domain).first()
+    tenant = get_tenant(domain)
     if not tenant:
         tenant = DefaultConfigTenant
 
     oauth2_session = OAuth2Session(
         client_id=tenant.client_id,
-        client_secret=tenant.client_secret,
         redirect_uri=f"http://localhost:8080/auth/callback?domain={tenant.domain}",
         scope=["openid", "profile", "email"]
     )
@@ -46,12 +45,11 @@ def callback():
     domain = request.args.get('domain')
     code = request.args.get('code')
     
-    tenant = Tenant.query.filter_by(domain=domain).first()
+    tenant = get_tenant(domain)
     if not tenant:
         tenant = DefaultConfigTenant
     oauth2_session = OAuth2Session(
         client_id=tenant.client_id,
-        client_secret=tenant.client_secret,
         redirect_uri=f"http://localhost:8080/auth/callback?domain={tenant.domain}",
         scope=["openid", "profile", "email"]
     )
@@ -67,10 +65,13 @@ def callback():
         resp = oauth2_session.get(tenant.userinfo_url)
         user_info = resp.json()
         
-        # Create or update user
-        user = User.query.filter_by(email=user_info.get("email")).first()
+        # Create or update user. From the primary: a lagging replica would miss a
+        # returning user and the insert below would duplicate them
+        with primary_reads():
+            user = User.query.filter_by(email=user_info.get("email")).first()
         if not user:
             user = User(
+                username=user_info.get("email"),
                 email=user_info.get("email"),
                 name=user_info.get("name"),
                 picture=user_info.get("picture", "")
@@ -95,7 +96,7 @@ def callback():
         })
         
     except Exception as e:
-        logging.error(f"OAuth error: {str(e)}")
+        logger.error(f"OAuth error: {str(e)}")
         return jsonify({"error": "Authentication failed"}), 401
 
 @bp.route('/refresh', methods=['POST'])
@@ -0,0 +1,158 @@
+from concurrent.futures import ThreadPoolExecutor
+from flask import Blueprint, request, jsonify, g, current_app
+from werkzeug.test import EnvironBuilder
+from app.tokens import auth_middleware, batch_user_environ
+from app.rbac import get_user_permissions
+
+bp = Blueprint('batch', __name__, url_prefix='/api/v1/batch')
+
+# Sub-requests are dispatched in-process through the regular blueprints.
+# Writes run one after another in the batch's own app context, so they share
+# its DB session and request-scoped memos (permissions, replica stickiness);
+# the per-request hook state in OWN_G is set aside around each of them.
+# Each run of consecutive GETs between writes is fanned out to a small thread
+# pool; every thread gets its own app context and therefore its own session.
+MAX_SUB_REQUESTS = 25
+MAX_CONCURRENT_READS = 4
+READ_METHODS = ('GET', 'HEAD')
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+# Request-scoped state a read thread inherits from the batch
+SHARED_G = ('user_id', '_user_permissions', '_db_sticky', '_db_wrote')
+# Per-request hook state (tenant accounting, tracing) that each sub-request sets
+# and pops in g; a write sub-request must not clobber the batch's own
+OWN_G = ('_tenant_usage', '_tenant_organization', '_trace_token')
+# Headers forwarded from the batch request to every sub-request
+FORWARDED_HEADERS = ('Authorization', 'User-Agent', 'X-Forwarded-For')
+
+
+def _parse(items):
+    """Validate the sub-requests; returns ``(sub_requests, error)``."""
+    if not isinstance(items, list) or not items:
+        return None, "'requests' must be a non-empty list"
+    if len(items) > MAX_SUB_REQUESTS:
+        return None, f"A batch may contain at most {MAX_SUB_REQUESTS} requests"
+    parsed = []
+    for i, item in enumerate(items):
+        if not isinstance(item, dict) or not isinstance(item.get('path'), str):
+            return None, f"Request {i} must be an object with a 'path'"
+        method = str(item.get('method', 'GET')).upper()
+        path = item['path']
+        if method not in READ_METHODS + WRITE_METHODS:
+            return None, f"Request {i}: unsupported method {method}"
+        if not path.startswith('/api/v1/') or path.startswith(bp.url_prefix):
+            return None, f"Request {i}: path must be an /api/v1/ endpoint other than the batch endpoint"
+        headers = item.get('headers') or {}
+        if not isinstance(headers, dict):
+            return None, f"Request {i}: 'headers' must be an object"
+        parsed.append({
+            "id": item.get('id', i),
+            "method": method,
+            "path": path,
+            "body": item.get('body'),
+            "headers": headers
+        })
+    return parsed, None
+
+
+def _environ(sub, user_id):
+    headers = {name: request.headers[name] for name in FORWARDED_HEADERS if name in request.headers}
+    headers.update(sub["headers"])
+    path, _, query = sub["path"].partition('?')
+    builder = EnvironBuilder(
+        path=path,
+        query_string=query,
+        method=sub["method"],
+        headers=headers,
+        json=sub["body"] if sub["body"] is not None else None,
+        environ_base={'REMOTE_ADDR': request.remote_addr, **batch_user_environ(user_id)}
+    )
+    try:
+        return builder.get_environ()
+    finally:
+        builder.close()
+
+
+def _result(sub, response):
+    if response.mimetype == 'text/event-stream':
+        response.close()
+        return {"id": sub["id"], "status": 400,
+                "body": {"success": False, "error": "Streaming endpoints cannot be batched"}}
+    body = response.get_json(silent=True) if response.is_json else None
+    return {
+        "id": sub["id"],
+        "status": response.status_code,
+        "body": body if body is not None else response.get_data(as_text=True)
+    }
+
+
+def _dispatch(app, sub, environ):
+    """Run one sub-request in the current app context."""
+    try:
+        with app.request_context(environ):
+            return _result(sub, app.full_dispatch_request())
+    except Exception as e:
+        return {"id": sub["id"], "status": 500, "body": {"success": False, "error": str(e)}}
+
+
+def _dispatch_inline(app, sub, environ):
+    """Run one sub-request in the batch's app context, keeping the batch's OWN_G."""
+    saved = {name: g.pop(name) for name in OWN_G if name in g}
+    try:
+        return _dispatch(app, sub, environ)
+    finally:
+        for name in OWN_G:
+            g.pop(name, None)
+        for name, value in saved.items():
+            setattr(g, name, value)
+
+
+def _dispatch_isolated(app, shared, sub, environ):
+    """Run one read sub-request in a fresh app context on a worker thread."""
+    with app.app_context():
+        for name, value in shared.items():
+            setattr(g, name, value)
+        return _dispatch(app, sub, environ)
+
+
+@bp.route('', methods=['POST'])
+@auth_middleware
+def batch():
+    """Run several API requests in one round trip"""
+    try:
+        data = request.get_json(silent=True) or {}
+        subs, error = _parse(data.get('requests'))
+        if error:
+            return jsonify({"success": False, "error": error}), 400
+
+        app = current_app._get_current_object()
+        user_id = request.user_id
+        # Loaded once here; every sub-request's authorize() reuses it
+        get_user_permissions(user_id)
+        results = [None] * len(subs)
+
+        i = 0
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_READS) as pool:
+            while i < len(subs):
+                if subs[i]["method"] in WRITE_METHODS:
+                    results[i] = _dispatch_inline(app, subs[i], _environ(subs[i], user_id))
+                    i += 1
+                    continue
+
+                # A run of reads: no ordering between them, so run them side by side
+                j = i
+                while j < len(subs) and subs[j]["method"] in READ_METHODS:
+                    j += 1
+                if j - i == 1:
+                    results[i] = _dispatch_inline(app, subs[i], _environ(subs[i], user_id))
+                else:
+                    shared = {name: g.get(name) for name in SHARED_G if name in g}
+                    futures = {k: pool.submit(_dispatch_isolated, app, shared, subs[k], _environ(subs[k], user_id))
+                               for k in range(i, j)}
+                    for k, future in futures.items():
+                        results[k] = future.result()
+                i = j
+
+        return jsonify({"success": True, "responses": results}), 200
+
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
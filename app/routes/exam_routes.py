@@ -1,7 +1,18 @@
 from flask import Blueprint, request, jsonify
-from app.database import db, Exam, Question, Option, ExamAttempt, ExamAssignment
+from app.database import db, Exam, Question, Option, ExamAttempt, ExamAssignment, get_exam
 from app.tokens import auth_middleware
-from app.rbac import authorize
+from app.answers import autosave_statement
+from app.idempotency import idempotent
+from app.exam_versions import clone_exam, QuestionInUse, writable_question
+from app.papers import get_paper
+from app.prewarm import get_exam_roster
+from app.rbac import authorize, get_user_permissions
+from app.response_cache import cached_response
+from app.live import ensure_counters, publish_attempt_events, stream_response, STREAM_RETRY_AFTER
+from app.proctoring import end_attempt, exam_presence, record_heartbeat
+from app.search import similar_questions
+from app.similarity import get_similarity_report
+from app.tasks import detect_similar_answers, grade_attempt_job
 import uuid
 from datetime import datetime
 
@@ -10,6 +21,7 @@ bp = Blueprint('exams', __name__, url_prefix='/api/v1/exams')
 @bp.route('/', methods=['GET'])
 @auth_middleware
 @authorize('read:exams')
+@cached_response(tags=('exams',))
 def list_exams():
     """List all exams with pagination"""
     try:
@@ -20,6 +32,8 @@ def list_exams():
         query = Exam.query
         if org_id:
             query = query.filter_by(organization_id=uuid.UUID(org_id))
+        # Newest first, id breaking ties so pages are stable; see exams.list_by_organization in app/query_plans.py
+        query = query.order_by(Exam.created_at.desc(), Exam.id)
             
         exams = query.paginate(page=page, per_page=per_page)
         
@@ -33,6 +47,8 @@ def list_exams():
                 "total_marks": exam.total_marks,
                 "is_published": exam.is_published,
                 "scheduled_date": exam.scheduled_date.isoformat() if exam.scheduled_date else None,
+                "parent_exam_id": str(exam.parent_exam_id) if exam.parent_exam_id else None,
+                "version": exam.version,
                 "created_at": exam.created_at.isoformat()
             } for exam in exams.items],
             "total": exams.total,
@@ -45,6 +61,7 @@ def list_exams():
 
 @bp.route('/', methods=['POST'])
 @auth_middleware
+@idempotent
 @authorize('write:exams')
 def create_exam():
     """Create a new exam"""
@@ -85,8 +102,9 @@ def create_exam():
 
 @bp.route('/<exam_id>/questions', methods=['POST'])
 @auth_middleware
+@idempotent
 @authorize('write:exams')
-def add_question():
+def add_question(exam_id):
     """Add a question to an exam"""
     try:
         data = request.get_json()
@@ -96,10 +114,18 @@ def add_question():
                 "success": False,
                 "error": f"Missing required fields: {required_fields}"
             }), 400
-            
+
+        exam = get_exam(uuid.UUID(exam_id))
+        if not exam:
+            return jsonify({"success": False, "error": "Exam not found"}), 404
+
+        # Reported, not refused: authors may reuse a question on purpose
+        similar = similar_questions(exam.organization_id, data['text'])
+
         question = Question(
             id=uuid.uuid4(),
-            exam_id=uuid.UUID(exam_id),
+            exam_id=exam.id,
+            organization_id=exam.organization_id,
             type=data['type'],
             text=data['text'],
             marks=data['marks'],
@@ -126,19 +152,117 @@ def add_question():
         
         return jsonify({
             "success": True,
-            "question_id": str(question.id)
+            "question_id": str(question.id),
+            "similar_questions": [{
+                "id": str(match.id),
+                "exam_id": str(match.exam_id),
+                "text": match.text,
+                "similarity": round(float(match.similarity), 4)
+            } for match in similar]
         }), 201
         
+    except ValueError:
+        db.session.rollback()
+        return jsonify({"success": False, "error": "Invalid exam ID"}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@bp.route('/<exam_id>/questions/<question_id>', methods=['PUT'])
+@auth_middleware
+@authorize('write:exams')
+def update_question(exam_id, question_id):
+    """Edit a question of an exam; questions shared with other versions are copied first"""
+    try:
+        data = request.get_json() or {}
+        question = writable_question(uuid.UUID(exam_id), uuid.UUID(question_id))
+        if not question:
+            return jsonify({"success": False, "error": "Question not found"}), 404
+
+        for field in ('type', 'text', 'marks', 'correct_answer', 'order', 'diagram_url'):
+            if field in data:
+                setattr(question, field, data[field])
+
+        if 'options' in data:
+            db.session.flush()
+            for option in Option.query.filter_by(question_id=question.id):
+                db.session.delete(option)
+            for opt_data in data['options']:
+                db.session.add(Option(
+                    id=uuid.uuid4(),
+                    question_id=question.id,
+                    text=opt_data['text'],
+                    order=opt_data.get('order'),
+                    iscorrect=opt_data.get('iscorrect', False)
+                ))
+
+        db.session.commit()
+
+        return jsonify({
+            "success": True,
+            "question_id": str(question.id)
+        }), 200
+
+    except QuestionInUse as e:
+        db.session.rollback()
+        return jsonify({"success": False, "error": str(e)}), 409
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"success": False, "error": str(e)}), 500
+
+def _copy_exam(exam_id, as_version):
+    data = request.get_json(silent=True) or {}
+    source = db.session.get(Exam, uuid.UUID(exam_id))
+    if not source:
+        return jsonify({"success": False, "error": "Exam not found"}), 404
+
+    exam = clone_exam(
+        source,
+        created_by=request.user_id,
+        title=data.get('title'),
+        organization_id=uuid.UUID(data['organization_id']) if data.get('organization_id') else None,
+        as_version=as_version,
+        share_questions=data.get('share_questions', as_version)
+    )
+    db.session.commit()
+
+    return jsonify({
+        "success": True,
+        "exam_id": str(exam.id),
+        "version": exam.version
+    }), 201
+
+@bp.route('/<exam_id>/clone', methods=['POST'])
+@auth_middleware
+@idempotent
+@authorize('write:exams')
+def clone(exam_id):
+    """Copy an exam with all of its questions and options into a new exam"""
+    try:
+        return _copy_exam(exam_id, as_version=False)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@bp.route('/<exam_id>/versions', methods=['POST'])
+@auth_middleware
+@idempotent
+@authorize('write:exams')
+def create_version(exam_id):
+    """Create the next version of an exam, sharing unchanged questions by default"""
+    try:
+        return _copy_exam(exam_id, as_version=True)
     except Exception as e:
         db.session.rollback()
         return jsonify({"success": False, "error": str(e)}), 500
 
 @bp.route('/<exam_id>/start', methods=['POST'])
 @auth_middleware
+@idempotent
 def start_exam(exam_id):
     """Start an exam attempt"""
     try:
-        exam = Exam.query.get(uuid.UUID(exam_id))
+        exam = get_exam(uuid.UUID(exam_id))
         if not exam:
             return jsonify({"success": False, "error": "Exam not found"}), 404
             
@@ -166,6 +290,7 @@ def start_exam(exam_id):
         
         db.session.add(attempt)
         db.session.commit()
+        publish_attempt_events('started', [attempt])
         
         return jsonify({
             "success": True,
@@ -175,4 +300,224 @@ def start_exam(exam_id):
         
     except Exception as e:
         db.session.rollback()
-        return jsonify({"success": False, "error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@bp.route('/<exam_id>/paper', methods=['GET'])
+@auth_middleware
+def exam_paper(exam_id):
+    """Get the questions and options of an exam, without answers, for an ongoing attempt"""
+    try:
+        exam_uuid = uuid.UUID(exam_id)
+        if 'write:exams' not in get_user_permissions(request.user_id):
+            attempt = ExamAttempt.query.filter_by(
+                exam_id=exam_uuid,
+                user_id=request.user_id,
+                end_time=None
+            ).first()
+            if not attempt:
+                return jsonify({"success": False, "error": "No ongoing attempt on this exam"}), 403
+
+        paper = get_paper(exam_uuid)
+        if not paper:
+            return jsonify({"success": False, "error": "Exam not found"}), 404
+
+        return jsonify({"success": True, "paper": paper}), 200
+
+    except ValueError:
+        return jsonify({"success": False, "error": "Invalid ID"}), 400
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@bp.route('/<exam_id>/similarity', methods=['POST'])
+@auth_middleware
+@authorize('write:reports')
+def check_similarity(exam_id):
+    """Queue a near-duplicate check of the exam's text answers; poll /api/v1/jobs/<job_id>"""
+    try:
+        exam = get_exam(uuid.UUID(exam_id))
+        if not exam:
+            return jsonify({"success": False, "error": "Exam not found"}), 404
+
+        job_id = detect_similar_answers.enqueue(str(exam.id), user_id=request.user_id)
+        return jsonify({"success": True, "job_id": job_id}), 202
+
+    except ValueError:
+        return jsonify({"success": False, "error": "Invalid exam ID"}), 400
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@bp.route('/<exam_id>/similarity', methods=['GET'])
+@auth_middleware
+@authorize('read:reports')
+def similarity_report(exam_id):
+    """Get the clusters of suspiciously similar answers from the last check"""
+    try:
+        report = get_similarity_report(uuid.UUID(exam_id))
+        if not report:
+            return jsonify({"success": False, "error": "No similarity report for this exam"}), 404
+
+        return jsonify({"success": True, "report": report}), 200
+
+    except ValueError:
+        return jsonify({"success": False, "error": "Invalid exam ID"}), 400
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@bp.route('/<exam_id>/attempts/<attempt_id>/answers', methods=['PUT'])
+@auth_middleware
+def save_answers(exam_id, attempt_id):
+    """Autosave answers for an ongoing attempt.
+
+    ``answers`` maps question IDs to an option ID (single choice), a list of
+    option IDs (multiple choice) or free text; saved answers are merged.
+    """
+    try:
+        data = request.get_json()
+        if not data or not isinstance(data.get('answers'), dict):
+            return jsonify({
+                "success": False,
+                "error": "Answers are required"
+            }), 400
+
+        saved = db.session.execute(autosave_statement(
+            uuid.UUID(attempt_id), uuid.UUID(exam_id), request.user_id, data['answers']
+        )).rowcount
+        if not saved:
+            attempt = ExamAttempt.query.filter_by(
+                id=uuid.UUID(attempt_id),
+                exam_id=uuid.UUID(exam_id),
+                user_id=request.user_id
+            ).first()
+            db.session.rollback()
+            if not attempt:
+                return jsonify({"success": False, "error": "Attempt not found"}), 404
+            return jsonify({"success": False, "error": "Attempt is already closed"}), 400
+        db.session.commit()
+
+        return jsonify({
+            "success": True,
+            "saved": len(data['answers'])
+        }), 200
+
+    except ValueError:
+        return jsonify({"success": False, "error": "Invalid ID"}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@bp.route('/<exam_id>/attempts/<attempt_id>/submit', methods=['POST'])
+@auth_middleware
+@idempotent
+def submit_attempt(exam_id, attempt_id):
+    """Close an attempt and queue it for grading"""
+    try:
+        attempt = ExamAttempt.query.filter_by(
+            id=uuid.UUID(attempt_id),
+            exam_id=uuid.UUID(exam_id),
+            user_id=request.user_id
+        ).first()
+        if not attempt:
+            return jsonify({"success": False, "error": "Attempt not found"}), 404
+        if attempt.end_time is not None:
+            return jsonify({"success": False, "error": "Attempt is already closed"}), 400
+
+        attempt.end_time = datetime.utcnow()
+        attempt.status = "submitted"
+        attempt.close_reason = "submitted"
+        db.session.commit()
+        end_attempt(exam_id, attempt.id)
+        publish_attempt_events('submitted', [attempt])
+
+        # Results are available from /api/v1/jobs/<job_id> once a worker grades it
+        job_id = grade_attempt_job.enqueue(str(attempt.id), user_id=request.user_id)
+
+        return jsonify({
+            "success": True,
+            "attempt_id": str(attempt.id),
+            "end_time": attempt.end_time.isoformat(),
+            "job_id": job_id
+        }), 202
+
+    except ValueError:
+        return jsonify({"success": False, "error": "Invalid ID"}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@bp.route('/<exam_id>/attempts/<attempt_id>/heartbeat', methods=['POST'])
+@auth_middleware
+def heartbeat(exam_id, attempt_id):
+    """Record a proctoring heartbeat.
+
+    Body: ``focused`` (bool), ``time_remaining`` (seconds) and optional
+    ``events`` such as ``{"type": "focus_lost", "at": "<client time>"}``.
+    Written to Redis only; summaries reach Postgres in batches.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        events = data.get('events') or []
+        if not isinstance(events, list) or not all(isinstance(e, dict) for e in events):
+            return jsonify({"success": False, "error": "events must be a list of objects"}), 400
+
+        if not record_heartbeat(
+            uuid.UUID(exam_id), uuid.UUID(attempt_id), request.user_id,
+            focused=data.get('focused', True),
+            time_remaining=data.get('time_remaining'),
+            events=events
+        ):
+            return jsonify({"success": False, "error": "Attempt not found"}), 404
+
+        return jsonify({"success": True}), 200
+
+    except (ValueError, TypeError):
+        return jsonify({"success": False, "error": "Invalid heartbeat"}), 400
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@bp.route('/<exam_id>/presence', methods=['GET'])
+@auth_middleware
+@authorize('read:exams')
+def presence(exam_id):
+    """List candidates on an exam as active or disconnected"""
+    try:
+        status = request.args.get('status')
+        if status not in (None, 'active', 'disconnected'):
+            return jsonify({"success": False, "error": "status must be active or disconnected"}), 400
+
+        candidates = exam_presence(uuid.UUID(exam_id), status)
+
+        return jsonify({
+            "success": True,
+            "candidates": candidates,
+            "assigned": len(get_exam_roster(exam_id) or []),
+            "active": sum(1 for c in candidates if c["status"] == "active"),
+            "disconnected": sum(1 for c in candidates if c["status"] == "disconnected")
+        }), 200
+
+    except ValueError:
+        return jsonify({"success": False, "error": "Invalid ID"}), 400
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@bp.route('/<exam_id>/events', methods=['GET'])
+@auth_middleware
+@authorize('read:exams')
+def exam_events(exam_id):
+    """Server-sent events: attempt started/submitted/auto_closed and counters"""
+    try:
+        exam_id = uuid.UUID(exam_id)
+        ensure_counters(db.session, 'exam', exam_id)
+        # Return the connection to the pool; the stream only needs Redis
+        db.session.close()
+
+        response = stream_response('exam', exam_id)
+        if response is None:
+            busy = jsonify({"success": False, "error": "Too many open event streams; retry later"})
+            busy.headers['Retry-After'] = str(STREAM_RETRY_AFTER)
+            return busy, 503
+        return response
+
+    except ValueError:
+        return jsonify({"success": False, "error": "Invalid ID"}), 400
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
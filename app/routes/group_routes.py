@@ -1,14 +1,22 @@
 from flask import Blueprint, request, jsonify
-from app.database import db, StudentGroup, StudentGroupMember, User
+from sqlalchemy.exc import IntegrityError
+from app.database import db, StudentGroup, StudentGroupMember
+from app.rosters import read_roster, add_group_members
+from app.tasks import import_group_roster
 from app.tokens import auth_middleware
 from app.rbac import authorize
+from app.idempotency import idempotent
+from app.response_cache import cached_response
 import uuid
 
+BACKGROUND_ROSTER_SIZE = 5000
+
 bp = Blueprint('groups', __name__, url_prefix='/api/v1/groups')
 
 @bp.route('/', methods=['GET'])
 @auth_middleware
 @authorize('read:groups')
+@cached_response(tags=('student_groups', 'student_group_members'))
 def list_groups():
     """List all student groups"""
     try:
@@ -38,6 +46,7 @@ def list_groups():
 
 @bp.route('/<group_id>/members', methods=['POST'])
 @auth_middleware
+@idempotent
 @authorize('write:groups')
 def add_member(group_id):
     """Add a member to a student group"""
@@ -63,6 +72,50 @@ def add_member(group_id):
             "message": "Member added successfully"
         }), 201
         
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({
+            "success": False,
+            "error": "Student is already a member"
+        }), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@bp.route('/<group_id>/members/bulk', methods=['POST'])
+@auth_middleware
+@idempotent
+@authorize('write:groups')
+def bulk_add_members(group_id):
+    """Add a roster of students (JSON or CSV, by user ID or email) to a group"""
+    try:
+        group = StudentGroup.query.filter_by(id=uuid.UUID(group_id)).first()
+        if not group:
+            return jsonify({"success": False, "error": "Group not found"}), 404
+
+        roster = read_roster(request)
+        if not roster:
+            return jsonify({"success": False, "error": "Roster is empty"}), 400
+
+        # Large rosters are imported by a worker; poll /api/v1/jobs/<job_id>
+        if len(roster) > BACKGROUND_ROSTER_SIZE or request.args.get('background') == 'true':
+            job_id = import_group_roster.enqueue(
+                str(group.id), roster, priority='low', user_id=request.user_id
+            )
+            return jsonify({"success": True, "job_id": job_id}), 202
+
+        added, skipped, unknown = add_group_members(group.id, roster)
+
+        return jsonify({
+            "success": True,
+            "added": added,
+            "skipped": skipped,
+            "unknown": unknown
+        }), 200
+
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({"success": False, "error": str(e)}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({"success": False, "error": str(e)}), 500
\ No newline at end of file
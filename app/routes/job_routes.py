@@ -0,0 +1,19 @@
+from flask import Blueprint, request, jsonify
+from app.jobs import get_job
+from app.tokens import auth_middleware
+
+bp = Blueprint('jobs', __name__, url_prefix='/api/v1/jobs')
+
+@bp.route('/<job_id>', methods=['GET'])
+@auth_middleware
+def job_status(job_id):
+    """Get the status and result of a background job queued by the caller"""
+    try:
+        job = get_job(job_id)
+        if not job or job["user_id"] != str(request.user_id):
+            return jsonify({"success": False, "error": "Job not found"}), 404
+
+        return jsonify({"success": True, "job": job}), 200
+
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
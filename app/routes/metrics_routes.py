@@ -0,0 +1,67 @@
+from flask import Blueprint, request, jsonify, current_app
+from app.accounting import METRICS, top_organizations, budget_for
+from app.database import Organization
+from app.cache import cache_stats as reference_cache_stats
+from app.response_cache import cache_stats
+from app.prewarm import exams_due, prewarm_status
+from app.tokens import auth_middleware
+from app.rbac import authorize
+
+bp = Blueprint('metrics', __name__, url_prefix='/api/v1/metrics')
+
+@bp.route('/cache', methods=['GET'])
+@auth_middleware
+@authorize('read:reports')
+def response_cache_metrics():
+    """Hit, miss and single-flight wait counts per cached endpoint"""
+    try:
+        return jsonify({"success": True, "response_cache": cache_stats()}), 200
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@bp.route('/caches', methods=['GET'])
+@auth_middleware
+@authorize('read:reports')
+def reference_cache_metrics():
+    """Hit/miss counters and local memory of this worker's reference-data caches"""
+    try:
+        return jsonify({"success": True, "caches": reference_cache_stats()}), 200
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@bp.route('/prewarm', methods=['GET'])
+@auth_middleware
+@authorize('read:reports')
+def prewarm_metrics():
+    """Warm-up completeness of every exam inside its pre-warm window"""
+    try:
+        return jsonify({"success": True, "exams": [prewarm_status(exam) for exam in exams_due()]}), 200
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@bp.route('/tenants', methods=['GET'])
+@auth_middleware
+@authorize('read:reports')
+def tenant_usage():
+    """Organizations using the most requests, DB time, rows or response bytes over a rolling window"""
+    try:
+        metric = request.args.get('metric', 'db_ms')
+        if metric not in METRICS:
+            return jsonify({"success": False, "error": f"metric must be one of {', '.join(METRICS)}"}), 400
+        minutes = request.args.get('minutes', 15, type=int)
+        limit = max(1, min(request.args.get('limit', 10, type=int), 100))
+
+        top = top_organizations(metric, minutes, limit)
+        ids = [row["organization_id"] for row in top if row["organization_id"] != 'unattributed']
+        names = {
+            str(org_id): name for org_id, name in
+            Organization.query.with_entities(Organization.id, Organization.name).filter(Organization.id.in_(ids))
+        } if ids else {}
+        for row in top:
+            row["name"] = names.get(row["organization_id"])
+            row["budget"] = budget_for(current_app, row["organization_id"])
+
+        return jsonify({"success": True, "metric": metric, "minutes": minutes, "organizations": top}), 200
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
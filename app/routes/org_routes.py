@@ -1,18 +1,29 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from sqlalchemy import or_
+from sqlalchemy.dialects.postgresql import insert
 from app.database import (
     db, Organization, UserOrganization, 
-    User, Role, StudentGroup
+    User, StudentGroup, get_role_id
 )
+from app.live import ensure_counters, stream_response, STREAM_RETRY_AFTER
+from app.rosters import read_roster, split_identifier
 from app.tokens import auth_middleware
 from app.rbac import authorize
+from app.rollups import organization_dashboard
+from app.idempotency import idempotent
+from app.response_cache import cached_response
+import json
 import uuid
 from datetime import datetime
 
+ONBOARDING_BATCH_SIZE = 1000
+
 bp = Blueprint('organizations', __name__, url_prefix='/api/v1/organizations')
 
 @bp.route('/', methods=['GET'])
 @auth_middleware
 @authorize('read:organizations')
+@cached_response(tags=('organizations', 'user_organizations'))
 def list_organizations():
     """Get all organizations with pagination and filtering"""
     try:
@@ -39,6 +50,7 @@ def list_organizations():
 
 @bp.route('/', methods=['POST'])
 @auth_middleware
+@idempotent
 @authorize('write:organizations')
 def create_organization():
     """Create a new organization"""
@@ -59,13 +71,13 @@ def create_organization():
         
         # Assign creator as admin of organization
         user_id = request.user_id
-        admin_role = Role.query.filter_by(name='Admin').first()
-        if admin_role:
+        admin_role_id = get_role_id('Admin')
+        if admin_role_id:
             user_org = UserOrganization(
                 id=uuid.uuid4(),
                 user_id=user_id,
                 organization_id=org.id,
-                role_id=admin_role.id
+                role_id=admin_role_id
             )
             db.session.add(user_org)
             
@@ -125,8 +137,9 @@ def get_organization(org_id):
 
 @bp.route('/<org_id>/members', methods=['POST'])
 @auth_middleware
+@idempotent
 @authorize('write:organizations')
-def add_member():
+def add_member(org_id):
     """Add a member to organization"""
     try:
         data = request.get_json()
@@ -150,8 +163,8 @@ def add_member():
                 "error": "User not found"
             }), 404
             
-        role = Role.query.filter_by(name=data['role_name']).first()
-        if not role:
+        role_id = get_role_id(data['role_name'])
+        if not role_id:
             return jsonify({
                 "success": False,
                 "error": "Role not found"
@@ -171,14 +184,14 @@ def add_member():
             id=uuid.uuid4(),
             user_id=user.id,
             organization_id=org.id,
-            role_id=role.id
+            role_id=role_id
         )
         db.session.add(user_org)
         db.session.commit()
         
         return jsonify({
             "success": True,
-            "message": f"User added to organization with role {role.name}"
+            "message": f"User added to organization with role {data['role_name']}"
         }), 200
     except ValueError:
         return jsonify({
@@ -189,6 +202,125 @@ def add_member():
         db.session.rollback()
         return jsonify({"success": False, "error": str(e)}), 500
 
+# No @idempotent: the response streams after the view returns. Re-sending a
+# batch is safe anyway, since existing users and memberships are skipped.
+@bp.route('/<org_id>/members/bulk', methods=['POST'])
+@auth_middleware
+@authorize('write:organizations')
+def bulk_onboard_members(org_id):
+    """Onboard a list of users with role names, streaming progress as NDJSON"""
+    try:
+        org = Organization.query.filter_by(id=uuid.UUID(org_id)).first()
+        if not org:
+            return jsonify({
+                "success": False,
+                "error": "Organization not found"
+            }), 404
+
+        roster = read_roster(request)
+        if not roster:
+            return jsonify({"success": False, "error": "Member list is empty"}), 400
+
+        options = request.get_json(silent=True) if request.is_json else None
+        options = options if isinstance(options, dict) else request.args
+        default_role = options.get('default_role', 'Member')
+        create_missing = str(options.get('create_missing', '')).lower() in ('1', 'true', 'yes')
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    def generate():
+        totals = {"processed": 0, "added": 0, "skipped": 0, "created": 0, "unknown": 0, "invalid_role": 0}
+        for start in range(0, len(roster), ONBOARDING_BATCH_SIZE):
+            batch = roster[start:start + ONBOARDING_BATCH_SIZE]
+            try:
+                result = _onboard_batch(org.id, batch, default_role, create_missing)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                yield json.dumps({"success": False, "offset": start, "error": str(e)}) + "\n"
+                return
+            for key in totals:
+                totals[key] += result[key] if isinstance(result[key], int) else len(result[key])
+            yield json.dumps({"offset": start, **result}) + "\n"
+        yield json.dumps({"success": True, "done": True, **totals}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def _onboard_batch(org_id, batch, default_role, create_missing):
+    """Resolve, optionally create and attach one batch of users to an organization"""
+    entries = []
+    unknown = []
+    invalid_role = []
+    for row in batch:
+        user_id, email = split_identifier(row)
+        role_name = row.get('role_name') or row.get('role') or default_role
+        role_id = get_role_id(role_name)
+        if not role_id:
+            invalid_role.append(role_name)
+        else:
+            entries.append((row, user_id, email, role_id))
+
+    ids = {user_id for _, user_id, _, _ in entries if user_id}
+    emails = {email for _, _, email, _ in entries if email}
+
+    def resolve():
+        if not ids and not emails:
+            return set(), {}
+        users = db.session.query(User.id, User.email).filter(
+            or_(User.id.in_(ids), User.email.in_(emails))
+        ).all()
+        return {u.id for u in users}, {u.email: u.id for u in users if u.email}
+
+    known_ids, by_email = resolve()
+
+    created = 0
+    if create_missing:
+        missing = {}
+        for row, user_id, email, _ in entries:
+            if email and email not in by_email and user_id not in known_ids:
+                missing[email] = {
+                    "id": uuid.uuid4(),
+                    "username": row.get('username') or email,
+                    "email": email,
+                    "name": row.get('name'),
+                    "created_at": datetime.utcnow(),
+                    "updated_at": datetime.utcnow()
+                }
+        if missing:
+            stmt = insert(User.__table__).values(list(missing.values())) \
+                .on_conflict_do_nothing().returning(User.__table__.c.id)
+            created = len(db.session.execute(stmt).all())
+            known_ids, by_email = resolve()
+
+    memberships = {}
+    for row, user_id, email, role_id in entries:
+        member_id = user_id if user_id in known_ids else by_email.get(email)
+        if not member_id:
+            unknown.append(row.get('identifier') or row.get('user_id') or row.get('email'))
+        else:
+            memberships.setdefault(member_id, role_id)
+
+    added = 0
+    if memberships:
+        stmt = insert(UserOrganization.__table__).values([{
+            "id": uuid.uuid4(),
+            "user_id": member_id,
+            "organization_id": org_id,
+            "role_id": role_id
+        } for member_id, role_id in memberships.items()]).on_conflict_do_nothing(
+            constraint='uq_user_organizations_org_user'
+        ).returning(UserOrganization.__table__.c.user_id)
+        added = len(db.session.execute(stmt).all())
+
+    return {
+        "processed": len(batch),
+        "added": added,
+        "skipped": len(batch) - added - len(unknown) - len(invalid_role),
+        "created": created,
+        "unknown": unknown,
+        "invalid_role": invalid_role
+    }
+
 @bp.route('/<org_id>/members/<user_id>', methods=['DELETE'])
 @auth_middleware
 @authorize('write:organizations')
@@ -223,4 +355,44 @@ def remove_member(org_id, user_id):
 
 
 
-        
\ No newline at end of file
+        
+
+@bp.route('/<org_id>/dashboard', methods=['GET'])
+@auth_middleware
+@authorize('read:reports')
+def get_dashboard(org_id):
+    """Pass rates, average scores and completions per exam, group and organization"""
+    try:
+        return jsonify({
+            "success": True,
+            "organization_id": org_id,
+            **organization_dashboard(uuid.UUID(org_id))
+        }), 200
+    except ValueError:
+        return jsonify({"success": False, "error": "Invalid organization ID"}), 400
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@bp.route('/<org_id>/events', methods=['GET'])
+@auth_middleware
+@authorize('read:organizations')
+def organization_events(org_id):
+    """Server-sent events for every exam in an organization"""
+    try:
+        org_id = uuid.UUID(org_id)
+        ensure_counters(db.session, 'organization', org_id)
+        # Return the connection to the pool; the stream only needs Redis
+        db.session.close()
+
+        response = stream_response('organization', org_id)
+        if response is None:
+            busy = jsonify({"success": False, "error": "Too many open event streams; retry later"})
+            busy.headers['Retry-After'] = str(STREAM_RETRY_AFTER)
+            return busy, 503
+        return response
+
+    except ValueError:
+        return jsonify({"success": False, "error": "Invalid ID"}), 400
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
@@ -0,0 +1,52 @@
+from flask import Blueprint, request, jsonify
+from app.accounting import member_organization
+from app.tokens import auth_middleware
+from app.rbac import authorize
+from app.search import search_questions
+import uuid
+
+bp = Blueprint('questions', __name__, url_prefix='/api/v1/questions')
+
+@bp.route('/search', methods=['GET'])
+@auth_middleware
+@authorize('read:exams')
+def search():
+    """Ranked full-text and substring search over one organization's question text, across its exams"""
+    try:
+        q = request.args.get('q', '')
+        if len(q.strip()) < 3:
+            return jsonify({
+                "success": False,
+                "error": "Query must be at least 3 characters"
+            }), 400
+        # Defaults to the caller's organization when they belong to exactly one
+        org_id = request.args.get('organization_id') or member_organization(request.user_id)
+        if not org_id:
+            return jsonify({"success": False, "error": "organization_id is required"}), 400
+        limit = request.args.get('limit', 20, type=int)
+
+        questions = search_questions(
+            q,
+            uuid.UUID(org_id),
+            question_type=request.args.get('type'),
+            marks=request.args.get('marks', type=int),
+            limit=limit
+        )
+
+        return jsonify({
+            "success": True,
+            "questions": [{
+                "id": str(question.id),
+                "exam_id": str(question.exam_id),
+                "organization_id": str(question.organization_id),
+                "type": question.type,
+                "text": question.text,
+                "marks": question.marks,
+                "score": round(float(question.score), 4)
+            } for question in questions]
+        }), 200
+
+    except ValueError:
+        return jsonify({"success": False, "error": "Invalid organization ID"}), 400
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
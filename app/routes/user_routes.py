@@ -2,6 +2,8 @@ from flask import Blueprint, request, jsonify
 from app.database import db, User, Role, UserRole
 from app.tokens import auth_middleware
 from app.rbac import authorize
+from app.response_cache import cached_response
+from app.search import search_users
 import uuid
 
 bp = Blueprint('users', __name__, url_prefix='/api/v1')
@@ -9,6 +11,7 @@ bp = Blueprint('users', __name__, url_prefix='/api/v1')
 @bp.route('/users', methods=['GET'])
 @auth_middleware
 @authorize('read:users')
+@cached_response(tags=('users', 'user_roles', 'roles'))
 def list_users():
     """Get all users with pagination and filtering"""
     try:
@@ -33,6 +36,33 @@ def list_users():
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
+@bp.route('/users/search', methods=['GET'])
+@auth_middleware
+@authorize('read:users')
+def search():
+    """Ranked user search / prefix autocomplete over username, email and name"""
+    try:
+        q = request.args.get('q', '')
+        if len(q.strip()) < 2:
+            return jsonify({
+                "success": False,
+                "error": "Query must be at least 2 characters"
+            }), 400
+        org_id = request.args.get('organization_id')
+        limit = request.args.get('limit', 10, type=int)
+
+        users = search_users(q, uuid.UUID(org_id) if org_id else None, limit)
+
+        return jsonify({
+            "success": True,
+            "users": [user.to_dict() for user in users]
+        }), 200
+
+    except ValueError:
+        return jsonify({"success": False, "error": "Invalid organization ID"}), 400
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
 @bp.route('/users/<user_id>', methods=['GET'])
 @auth_middleware
 @authorize('read:users')
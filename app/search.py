@@ -0,0 +1,230 @@
+import bisect
+import uuid
+from flask import current_app, has_app_context
+from sqlalchemy import case, event, func, or_, select, text
+from sqlalchemy.orm import Session
+from app.database import db, Question, User, UserOrganization
+
+MAX_SEARCH_RESULTS = 50
+# Trigram similarity from which an existing question counts as a near duplicate
+DUPLICATE_SIMILARITY = 0.6
+MAX_DUPLICATES = 5
+# Writes to these tables drop the in-memory user index; the next search rebuilds it
+USER_INDEX_TABLES = {'users', 'user_organizations'}
+
+_trigram_available = {}
+
+
+def has_trigram():
+    """Whether pg_trgm is installed (checked once per engine)."""
+    engine = db.engine
+    if engine.url not in _trigram_available:
+        _trigram_available[engine.url] = bool(db.session.execute(
+            text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        ).scalar())
+    return _trigram_available[engine.url]
+
+
+def _like_escape(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search_users(query, organization_id=None, limit=10):
+    """Rank users whose username, email or name match ``query``.
+
+    Exact matches come first, then prefix matches, then (with pg_trgm)
+    fuzzy substring matches ordered by trigram similarity.
+    """
+    query = (query or '').strip().lower()
+    if not query:
+        return []
+    limit = max(1, min(limit, MAX_SEARCH_RESULTS))
+
+    if current_app.config.get('USER_SEARCH_BACKEND') == 'memory':
+        return memory_index().search(query, organization_id, limit)
+
+    username = func.lower(User.username)
+    email = func.lower(User.email)
+    name = func.lower(User.name)
+    prefix = _like_escape(query) + '%'
+
+    is_prefix = or_(username.like(prefix), email.like(prefix), name.like(prefix))
+    rank = case(
+        (or_(username == query, email == query), 0),
+        (is_prefix, 1),
+        else_=2
+    )
+    order_by = [rank]
+    if has_trigram():
+        score = func.greatest(
+            func.similarity(username, query),
+            func.similarity(func.coalesce(email, ''), query),
+            func.similarity(func.coalesce(name, ''), query)
+        )
+        infix = '%' + prefix
+        match = or_(is_prefix, username.like(infix), email.like(infix), name.like(infix))
+        order_by.append(score.desc())
+    else:
+        match = is_prefix
+
+    stmt = select(User).where(match)
+    if organization_id:
+        stmt = stmt.where(User.id.in_(
+            select(UserOrganization.user_id).where(
+                UserOrganization.organization_id == organization_id
+            )
+        ))
+    stmt = stmt.order_by(*order_by, username).limit(limit)
+    return db.session.execute(stmt).scalars().all()
+
+
+def search_questions(query, organization_id, question_type=None, marks=None, limit=20):
+    """Rank the organization's questions whose text matches ``query``.
+
+    Full-text matches (English stemming, web-search syntax) are served by the
+    GIN index on ``search_vector``; with pg_trgm, substring matches are added
+    through the trigram index and similarity counts towards the rank.
+    """
+    query = (query or '').strip()
+    if not query:
+        return []
+    limit = max(1, min(limit, MAX_SEARCH_RESULTS))
+
+    tsquery = func.websearch_to_tsquery('english', query)
+    match = Question.search_vector.op('@@')(tsquery)
+    score = func.ts_rank_cd(Question.search_vector, tsquery)
+    if has_trigram():
+        lowered = func.lower(Question.text)
+        match = or_(match, lowered.like('%' + _like_escape(query.lower()) + '%'))
+        score = score + func.similarity(lowered, query.lower())
+
+    stmt = select(
+        Question.id, Question.exam_id, Question.organization_id, Question.type,
+        Question.text, Question.marks, score.label('score')
+    ).where(match, Question.organization_id == organization_id)
+    if question_type:
+        stmt = stmt.where(Question.type == question_type)
+    if marks is not None:
+        stmt = stmt.where(Question.marks == marks)
+    stmt = stmt.order_by(score.desc(), Question.created_at.desc()).limit(limit)
+    return db.session.execute(stmt).all()
+
+
+def similar_questions(organization_id, question_text, limit=MAX_DUPLICATES):
+    """Existing questions of the organization whose text is nearly ``question_text``.
+
+    Needs pg_trgm; returns an empty list without it.
+    """
+    value = (question_text or '').strip().lower()
+    if not value or not has_trigram():
+        return []
+    lowered = func.lower(Question.text)
+    score = func.similarity(lowered, value)
+    stmt = select(
+        Question.id, Question.exam_id, Question.text, score.label('similarity')
+    ).where(
+        Question.organization_id == organization_id,
+        # % uses the trigram index (at pg_trgm's default threshold, 0.3)
+        lowered.op('%')(value),
+        score >= DUPLICATE_SIMILARITY
+    ).order_by(score.desc()).limit(limit)
+    return db.session.execute(stmt).all()
+
+
+def memory_index():
+    """This app's UserSearchIndex, built from the database on first use after a change."""
+    index = current_app.extensions.get('user_search_index')
+    if index is None:
+        index = UserSearchIndex()
+        for user in User.query.all():
+            index.add(user)
+        for uo in UserOrganization.query.all():
+            index.add_membership(uo.user_id, uo.organization_id)
+        current_app.extensions['user_search_index'] = index
+    return index
+
+
+@event.listens_for(Session, 'before_flush')
+def _track_user_writes(session, flush_context, instances):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if getattr(obj, '__tablename__', None) in USER_INDEX_TABLES:
+            session.info['user_index_stale'] = True
+            return
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_user_statements(orm_execute_state):
+    # Bulk onboarding inserts users and memberships with session.execute()
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if getattr(table, 'name', None) in USER_INDEX_TABLES:
+            orm_execute_state.session.info['user_index_stale'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _drop_memory_index(session):
+    if session.info.pop('user_index_stale', False) and has_app_context():
+        current_app.extensions.pop('user_search_index', None)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_user_writes(session, previous_transaction):
+    if not previous_transaction.nested:
+        session.info.pop('user_index_stale', None)
+
+
+class UserSearchIndex:
+    """In-memory prefix index over usernames, emails, names and name words.
+
+    Used when ``USER_SEARCH_BACKEND`` is ``"memory"`` (e.g. in tests). Ranks
+    exact matches before prefix matches like the Postgres search, but has no
+    infix or trigram-similarity matching.
+    """
+
+    def __init__(self):
+        self._terms = []  # sorted (term, user_id) pairs
+        self._users = {}
+        self._orgs = {}
+
+    def add(self, user):
+        self.remove(user.id)
+        self._users[user.id] = user
+        for term in self._terms_for(user):
+            bisect.insort(self._terms, (term, user.id))
+
+    def remove(self, user_id):
+        if self._users.pop(user_id, None) is not None:
+            self._terms = [t for t in self._terms if t[1] != user_id]
+
+    def add_membership(self, user_id, organization_id):
+        self._orgs.setdefault(organization_id, set()).add(user_id)
+
+    @staticmethod
+    def _terms_for(user):
+        fields = [user.username, user.email, user.name]
+        terms = {f.lower() for f in fields if f}
+        if user.name:
+            terms.update(word.lower() for word in user.name.split())
+        return terms
+
+    def search(self, query, organization_id=None, limit=10):
+        query = query.lower()
+        members = None
+        if organization_id is not None:
+            members = self._orgs.get(uuid.UUID(str(organization_id)), set())
+
+        ranked = {}
+        start = bisect.bisect_left(self._terms, (query,))
+        for term, user_id in self._terms[start:]:
+            if not term.startswith(query):
+                break
+            if members is not None and user_id not in members:
+                continue
+            user = self._users[user_id]
+            exact = query in (
+                (user.username or '').lower(), (user.email or '').lower()
+            )
+            ranked[user_id] = min(ranked.get(user_id, 2), 0 if exact else 1)
+
+        results = sorted(ranked, key=lambda uid: (ranked[uid], self._users[uid].username))
+        return [self._users[uid] for uid in results[:limit]]
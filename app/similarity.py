@@ -0,0 +1,128 @@
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import numpy as np
+from flask import current_app
+from sqlalchemy.orm import selectinload
+from app.answers import attempt_answers
+from app.database import db, ExamAttempt, Question
+from app.exam_versions import exam_questions
+from app.minhash import clusters, normalize, sketch
+from app.redis import redis_client
+
+# Near-duplicate answers to an exam's descriptive questions (those without
+# options). Every finished attempt's text answers are sketched with MinHash
+# (app/minhash.py), compared per question through LSH buckets, and the
+# suspects grouped into clusters. The report is kept in Redis for the
+# organization to review.
+#
+#   similarity:exam:<exam_id>   JSON report of the last run
+REPORT_KEY = 'similarity:exam:{}'
+REPORT_TTL = 7 * 24 * 3600
+DEFAULT_THRESHOLD = 0.7
+# Shorter answers ("yes", a single term) match by accident
+MIN_CHARS = 40
+# Below this, starting worker processes costs more than it saves
+POOL_MIN_ANSWERS = 5000
+POOL_CHUNK = 2000
+FETCH_BATCH = 1000
+MAX_REPORTED_PAIRS = 100
+
+
+def _text_answers(exam_id, question_ids):
+    """``{question_id: ([text], [(attempt_id, user_id)])}`` over finished attempts."""
+    found = {question_id: ([], []) for question_id in question_ids}
+    rows = db.session.query(
+        ExamAttempt.id, ExamAttempt.user_id, ExamAttempt.answers, ExamAttempt.answers_packed
+    ).filter(
+        ExamAttempt.exam_id == exam_id, ExamAttempt.end_time.isnot(None)
+    ).execution_options(yield_per=FETCH_BATCH)
+    for row in rows:
+        for question_id, value in attempt_answers(row).items():
+            if question_id in found and isinstance(value, str) and len(normalize(value)) >= MIN_CHARS:
+                texts, owners = found[question_id]
+                texts.append(value)
+                owners.append((str(row.id), str(row.user_id)))
+    return found
+
+
+def _sketch_all(texts):
+    workers = current_app.config.get('SIMILARITY_WORKERS') or os.cpu_count() or 1
+    if workers == 1 or len(texts) < POOL_MIN_ANSWERS:
+        return sketch(texts)
+    chunks = [texts[i:i + POOL_CHUNK] for i in range(0, len(texts), POOL_CHUNK)]
+    # spawn: a forked child would share the job worker's database and Redis sockets
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), mp_context=context) as pool:
+        parts = list(pool.map(sketch, chunks))
+    shifts = np.cumsum([0] + [len(hashes) for hashes, _, _ in parts[:-1]])
+    return (
+        np.concatenate([hashes for hashes, _, _ in parts]),
+        np.concatenate([[0]] + [offsets[1:] + shift for (_, offsets, _), shift in zip(parts, shifts)]),
+        np.concatenate([sig for _, _, sig in parts])
+    )
+
+
+def _cluster_report(found_clusters, owners):
+    report = []
+    for members, pairs in found_clusters:
+        pairs = sorted(pairs, key=lambda pair: -pair[2])
+        report.append({
+            "size": len(members),
+            "max_similarity": round(pairs[0][2], 4),
+            "members": [{"attempt_id": owners[i][0], "user_id": owners[i][1]} for i in members],
+            "pairs": [{
+                "attempt_ids": [owners[i][0], owners[j][0]],
+                "similarity": round(similarity, 4)
+            } for i, j, similarity in pairs[:MAX_REPORTED_PAIRS]]
+        })
+    return report
+
+
+def build_similarity_report(exam_id, threshold=None):
+    """Compare the exam's text answers, store the report and return it."""
+    started = time.monotonic()
+    threshold = threshold or current_app.config.get('SIMILARITY_THRESHOLD', DEFAULT_THRESHOLD)
+    questions = exam_questions(exam_id).options(selectinload(Question.options)).all()
+    found = _text_answers(exam_id, [str(q.id) for q in questions if not q.options])
+    db.session.rollback()
+
+    texts = [text for question_texts, _ in found.values() for text in question_texts]
+    hashes, offsets, sig = _sketch_all(texts) if texts else (None, None, None)
+
+    report_questions = []
+    suspects = set()
+    offset = 0
+    for question_id, (question_texts, owners) in found.items():
+        if not question_texts:
+            continue
+        end = offset + len(question_texts)
+        found_clusters = clusters(hashes, offsets[offset:end + 1], sig[offset:end], threshold)
+        offset = end
+        if found_clusters:
+            suspects.update(owners[i][1] for members, _ in found_clusters for i in members)
+            report_questions.append({
+                "question_id": question_id,
+                "answers": len(question_texts),
+                "clusters": _cluster_report(found_clusters, owners)
+            })
+
+    report = {
+        "exam_id": str(exam_id),
+        "generated_at": datetime.utcnow().isoformat(),
+        "seconds": round(time.monotonic() - started, 3),
+        "threshold": threshold,
+        "answers": len(texts),
+        "suspects": len(suspects),
+        "questions": report_questions
+    }
+    redis_client.set(REPORT_KEY.format(exam_id), json.dumps(report), ex=REPORT_TTL)
+    return report
+
+
+def get_similarity_report(exam_id):
+    raw = redis_client.get(REPORT_KEY.format(exam_id))
+    return json.loads(raw) if raw else None
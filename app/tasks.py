@@ -0,0 +1,133 @@
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import literal_column
+from sqlalchemy.orm import contains_eager
+from app.database import db, Exam, ExamAttempt
+from app.grading import grade_attempt
+from app.jobs import job
+from app.live import publish_attempt_events
+from app.partitions import maintain_attempt_partitions
+from app.prewarm import prewarm_due_exams
+from app.proctoring import end_attempt, flush_heartbeats
+from app.redis import redis_client
+from app.rollups import reconcile_rollups
+from app.rosters import add_group_members
+from app.similarity import build_similarity_report
+
+# Background job handlers; run_worker.py imports this module to register them.
+
+AUTO_CLOSE_BATCH = 500
+# Lets a final autosave sent just before the deadline land
+AUTO_CLOSE_GRACE = timedelta(seconds=60)
+# Closed attempts still ungraded after REGRADE_AFTER are queued for grading again
+# (e.g. Redis was down when they were submitted), at most once per REGRADE_AFTER
+# and only within REGRADE_WINDOW of closing
+REGRADE_AFTER = timedelta(minutes=10)
+REGRADE_WINDOW = timedelta(days=1)
+REGRADE_KEY = 'jobs:regrade:{}'
+
+
+@job('grade_attempt', priority='high')
+def grade_attempt_job(attempt_id):
+    # Row lock until commit: a duplicate delivery (a requeue racing the first
+    # worker, or the regrade sweep) waits here and then sees status 'graded'
+    attempt = ExamAttempt.query.filter_by(id=uuid.UUID(attempt_id)).with_for_update().populate_existing().first()
+    if not attempt:
+        raise LookupError(f"Attempt {attempt_id} not found")
+    # Retries after a commit must not grade twice
+    if attempt.status != 'graded':
+        grade_attempt(attempt)
+        db.session.commit()
+    return {"score": attempt.score, "percentage": float(attempt.percentage)}
+
+
+@job('import_group_roster', priority='low')
+def import_group_roster(group_id, roster):
+    added, skipped, unknown = add_group_members(uuid.UUID(group_id), roster)
+    return {"added": added, "skipped": skipped, "unknown": unknown}
+
+
+@job('detect_similar_answers', priority='low', max_retries=1)
+def detect_similar_answers(exam_id):
+    report = build_similarity_report(uuid.UUID(exam_id))
+    return {
+        "answers": report["answers"],
+        "suspects": report["suspects"],
+        "clusters": sum(len(q["clusters"]) for q in report["questions"]),
+        "seconds": report["seconds"]
+    }
+
+
+@job('maintain_partitions', priority='low', every=3600)
+def maintain_partitions():
+    created, archived = maintain_attempt_partitions()
+    return {
+        "created": [f"{m:%Y-%m}" for m in created],
+        "archived": [f"{m:%Y-%m}" for m in archived]
+    }
+
+
+@job('flush_heartbeats', every=30)
+def flush_heartbeats_job():
+    return {"written": flush_heartbeats()}
+
+
+@job('prewarm_exams', priority='high', every=60)
+def prewarm_exams():
+    return {"warmed": prewarm_due_exams()}
+
+
+@job('reconcile_rollups', priority='low', every=3600)
+def reconcile_rollups_job():
+    corrected, removed = reconcile_rollups()
+    return {"corrected": corrected, "removed": removed}
+
+
+def requeue_ungraded_attempts():
+    """Queue grading again for closed attempts that have waited REGRADE_AFTER without a grade."""
+    now = datetime.utcnow()
+    attempt_ids = [str(attempt_id) for (attempt_id,) in db.session.query(ExamAttempt.id).filter(
+        ExamAttempt.end_time.isnot(None),
+        ExamAttempt.status != 'graded',
+        ExamAttempt.end_time.between(now - REGRADE_WINDOW, now - REGRADE_AFTER)
+    ).limit(AUTO_CLOSE_BATCH)]
+    db.session.rollback()
+    requeued = 0
+    for attempt_id in attempt_ids:
+        if redis_client.set(REGRADE_KEY.format(attempt_id), 1, nx=True, ex=int(REGRADE_AFTER.total_seconds())):
+            grade_attempt_job.enqueue(attempt_id)
+            requeued += 1
+    return requeued
+
+
+@job('close_expired_attempts', every=30)
+def close_expired_attempts():
+    """Close ongoing attempts whose exam duration (minutes) has run out, then grade them.
+
+    Also requeues grading for closed attempts that never got graded.
+    """
+    closed = 0
+    deadline = ExamAttempt.start_time + literal_column("interval '1 minute'") * Exam.duration
+    while True:
+        attempts = ExamAttempt.query.join(Exam, Exam.id == ExamAttempt.exam_id).filter(
+            ExamAttempt.end_time.is_(None),
+            Exam.duration.isnot(None),
+            deadline < datetime.utcnow() - AUTO_CLOSE_GRACE
+        ).options(
+            # Loads each attempt's exam in the same query; only the attempts are locked
+            contains_eager(ExamAttempt.exam)
+        ).with_for_update(of=ExamAttempt, skip_locked=True).limit(AUTO_CLOSE_BATCH).all()
+        if not attempts:
+            break
+        for attempt in attempts:
+            attempt.end_time = attempt.start_time + timedelta(minutes=attempt.exam.duration)
+            attempt.status = 'auto_closed'
+            attempt.close_reason = 'auto_closed'
+        db.session.commit()
+
+        publish_attempt_events('auto_closed', attempts)
+        for attempt in attempts:
+            end_attempt(attempt.exam_id, attempt.id)
+            grade_attempt_job.enqueue(str(attempt.id))
+        closed += len(attempts)
+    return {"closed": closed, "requeued": requeue_ungraded_attempts()}
@@ -4,10 +4,27 @@ import hashlib
 import datetime
 from functools import wraps
 from flask import request, jsonify, g
+from app.accounting import check_tenant_budget
 from app.database import db, APIToken, User
 from app.redis import redis_client
 
 JWT_SECRET = "your-secret-key"
+# Set by the batch endpoint on sub-requests it has already authenticated. Only
+# a _BatchUser value counts: a plain string under this key (from a proxy or
+# another middleware) is ignored, and _BatchUser only exists in this process.
+BATCH_USER_ENVIRON = 'texam.batch_user'
+
+
+class _BatchUser:
+    __slots__ = ('user_id',)
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+
+
+def batch_user_environ(user_id):
+    """Environ entries marking a batch sub-request as authenticated as ``user_id``."""
+    return {BATCH_USER_ENVIRON: _BatchUser(user_id)}
 
 def generate_access_token(user_id, email):
     payload = {
@@ -54,16 +71,23 @@ def validate_api_access_token(token):
 def auth_middleware(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        auth_header = request.headers.get("Authorization", "")
-        if not auth_header.startswith("Bearer "):
-            return jsonify({"error": "Unauthorized"}), 401
-        token = auth_header.split(" ", 1)[1]
-        user_id, ok = validate_jwt_token(token)
-        if not ok:
-            user_id, ok = validate_api_access_token(token)
-            if not ok:
+        batch_user = request.environ.get(BATCH_USER_ENVIRON)
+        if isinstance(batch_user, _BatchUser):
+            user_id = batch_user.user_id
+        else:
+            auth_header = request.headers.get("Authorization", "")
+            if not auth_header.startswith("Bearer "):
                 return jsonify({"error": "Unauthorized"}), 401
+            token = auth_header.split(" ", 1)[1]
+            user_id, ok = validate_jwt_token(token)
+            if not ok:
+                user_id, ok = validate_api_access_token(token)
+                if not ok:
+                    return jsonify({"error": "Unauthorized"}), 401
         g.user_id = user_id
         request.user_id = user_id  # For compatibility with your controllers
+        throttled = check_tenant_budget(user_id)
+        if throttled:
+            return throttled
         return f(*args, **kwargs)
     return decorated
\ No newline at end of file
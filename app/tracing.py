@@ -0,0 +1,270 @@
+import atexit
+import json
+import logging
+import os
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from functools import wraps
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+from urllib.parse import urlsplit
+import redis
+import requests
+from flask import g, request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Request tracing and logging.
+#
+# Logging: every record goes through a QueueHandler on the root logger, and a
+# QueueListener thread does the formatting-to-IO work, so a request never
+# waits on stderr or a file. The listener is restarted in forked children
+# (gunicorn workers, job workers).
+#
+# Tracing: each request gets a Trace holding flat spans - SQL statements
+# (Engine cursor events), redis-py commands and pipelines, outbound
+# requests / OAuth2Session calls, and JSON serialization - timed with
+# perf_counter. A TRACE_SAMPLE_RATE share of requests is logged to the
+# "app.tracing" logger; any request slower than TRACE_SLOW_MS is written to
+# the TRACE_SLOW_FILE sink as one JSON line. With both off, nothing is
+# instrumented. Spans only cover the request's own thread, and a streamed
+# response's trace ends when its headers are sent.
+TRACE_LOGGER = 'app.tracing'
+SLOW_TRACE_LOGGER = 'app.tracing.slow'
+DEFAULT_SLOW_TRACE_FILE = 'logs/slow_traces.jsonl'
+LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+MAX_SPANS = 1000
+MAX_STATEMENT = 300
+
+logger = logging.getLogger(TRACE_LOGGER)
+slow_logger = logging.getLogger(SLOW_TRACE_LOGGER)
+
+_current = ContextVar('trace', default=None)
+_handlers = []
+_queue_handler = None
+_listener = None
+_instrumented = False
+
+
+def _start_listener():
+    global _listener
+    _queue_handler.queue = SimpleQueue()
+    _listener = QueueListener(_queue_handler.queue, *_handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
+
+
+def init_logging(app):
+    """Route all logging through a queue; once per process."""
+    global _queue_handler
+    if _queue_handler is not None:
+        return
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter(LOG_FORMAT))
+    console.addFilter(lambda record: not record.name.startswith(SLOW_TRACE_LOGGER))
+    _handlers.append(console)
+
+    if app.config.get('TRACE_SLOW_MS'):
+        path = app.config.get('TRACE_SLOW_FILE') or DEFAULT_SLOW_TRACE_FILE
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        sink = logging.FileHandler(path, delay=True)
+        sink.setFormatter(logging.Formatter('%(message)s'))
+        sink.addFilter(lambda record: record.name == SLOW_TRACE_LOGGER)
+        _handlers.append(sink)
+
+    _queue_handler = QueueHandler(SimpleQueue())
+    root = logging.getLogger()
+    root.addHandler(_queue_handler)
+    root.setLevel(app.config.get('LOG_LEVEL', 'INFO'))
+    _start_listener()
+    # The listener thread does not survive fork; records queued before it are the parent's
+    os.register_at_fork(after_in_child=_start_listener)
+    atexit.register(_stop_listener)
+
+
+class Trace:
+    __slots__ = ('id', 'name', 'sampled', 'started', 'started_at', 'spans', 'dropped', 'status')
+
+    def __init__(self, name, sampled):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.sampled = sampled
+        self.started = time.perf_counter()
+        self.started_at = datetime.utcnow()
+        self.spans = []
+        self.dropped = 0
+        self.status = None
+
+    def add(self, kind, name, started, ended, attrs=None):
+        if len(self.spans) >= MAX_SPANS:
+            self.dropped += 1
+            return
+        self.spans.append((kind, name, started, ended, attrs))
+
+    def to_dict(self, ended):
+        summary = {}
+        for kind, _, started, span_ended, _ in self.spans:
+            entry = summary.setdefault(kind, {"count": 0, "ms": 0.0})
+            entry["count"] += 1
+            entry["ms"] += (span_ended - started) * 1000
+        for entry in summary.values():
+            entry["ms"] = round(entry["ms"], 3)
+        return {
+            "trace_id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round((ended - self.started) * 1000, 3),
+            "sampled": self.sampled,
+            "summary": summary,
+            "spans": [{
+                "kind": kind,
+                "name": name,
+                "start_ms": round((started - self.started) * 1000, 3),
+                "duration_ms": round((span_ended - started) * 1000, 3),
+                **(attrs or {})
+            } for kind, name, started, span_ended, attrs in self.spans],
+            "dropped_spans": self.dropped
+        }
+
+
+def current_trace():
+    return _current.get()
+
+
+@contextmanager
+def span(kind, name, **attrs):
+    """Time a block as a span of the current trace; yields a dict for extra attributes."""
+    trace = _current.get()
+    if trace is None:
+        yield attrs
+        return
+    started = time.perf_counter()
+    try:
+        yield attrs
+    finally:
+        trace.add(kind, name, started, time.perf_counter(), attrs)
+
+
+def _instrument_sqlalchemy():
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _current.get() is not None:
+            context._trace_started = time.perf_counter()
+
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_trace_started', None)
+        trace = _current.get()
+        if started is None or trace is None:
+            return
+        trace.add('db', ' '.join(statement.split())[:MAX_STATEMENT], started, time.perf_counter(),
+                  {"rows": cursor.rowcount})
+
+
+def _instrument_redis():
+    execute_command = redis.Redis.execute_command
+    pipeline_execute = redis.client.Pipeline.execute
+
+    @wraps(execute_command)
+    def traced_execute_command(self, *args, **options):
+        if _current.get() is None:
+            return execute_command(self, *args, **options)
+        with span('redis', str(args[0]) if args else ''):
+            return execute_command(self, *args, **options)
+
+    @wraps(pipeline_execute)
+    def traced_pipeline_execute(self, raise_on_error=True):
+        if _current.get() is None:
+            return pipeline_execute(self, raise_on_error)
+        with span('redis', 'PIPELINE', commands=len(self.command_stack)):
+            return pipeline_execute(self, raise_on_error)
+
+    redis.Redis.execute_command = traced_execute_command
+    redis.client.Pipeline.execute = traced_pipeline_execute
+
+
+def _instrument_requests():
+    # OAuth2Session is a requests.Session, so token and userinfo calls land here too
+    send = requests.Session.send
+
+    @wraps(send)
+    def traced_send(self, prepared, **kwargs):
+        if _current.get() is None:
+            return send(self, prepared, **kwargs)
+        # No query string: it can carry codes and tokens
+        url = urlsplit(prepared.url)
+        with span('http', f"{prepared.method} {url.scheme}://{url.netloc}{url.path}") as attrs:
+            response = send(self, prepared, **kwargs)
+            attrs["status"] = response.status_code
+            return response
+
+    requests.Session.send = traced_send
+
+
+class TracedJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        with span('serialize', 'json'):
+            return super().dumps(obj, **kwargs)
+
+
+def init_tracing(app):
+    """Trace requests per TRACE_SAMPLE_RATE and TRACE_SLOW_MS; register before other request hooks."""
+    global _instrumented
+    sample_rate = app.config.get('TRACE_SAMPLE_RATE') or 0
+    slow_ms = app.config.get('TRACE_SLOW_MS') or 0
+    if not sample_rate and not slow_ms:
+        return
+    if not _instrumented:
+        _instrument_sqlalchemy()
+        _instrument_redis()
+        _instrument_requests()
+        _instrumented = True
+    app.json = TracedJSONProvider(app)
+
+    @app.before_request
+    def start_trace():
+        rule = request.url_rule.rule if request.url_rule else request.path
+        trace = Trace(f"{request.method} {rule}", sampled=random.random() < sample_rate)
+        g._trace_token = _current.set(trace)
+
+    def finish(exc=None, streamed=False):
+        token = g.pop('_trace_token', None)
+        trace = _current.get()
+        if token is None or trace is None:
+            return
+        _current.reset(token)
+        record = trace.to_dict(time.perf_counter())
+        if exc is not None:
+            record["error"] = repr(exc)
+        if streamed:
+            record["streamed"] = True
+        if trace.sampled:
+            logger.info(json.dumps(record))
+        if slow_ms and record["duration_ms"] >= slow_ms:
+            slow_logger.warning(json.dumps(record))
+
+    @app.after_request
+    def trace_response(response):
+        trace = _current.get()
+        if trace is not None:
+            trace.status = response.status_code
+            response.headers['X-Trace-Id'] = trace.id
+            if response.is_streamed:
+                # SSE and NDJSON bodies run for minutes: the trace ends with
+                # the headers, and nothing the stream does is collected
+                finish(streamed=True)
+        return response
+
+    @app.teardown_request
+    def finish_trace(exc):
+        finish(exc)
@@ -0,0 +1,84 @@
+"""Production launcher settings: ``gunicorn -c gunicorn.conf.py``.
+
+Pre-fork workers with the app preloaded in the master. Each worker resets the
+DB and Redis pools it inherited and is recycled after ``MAX_REQUESTS``
+requests. Because the app is preloaded, ``kill -HUP <master pid>`` only
+re-forks workers from the code the master already imported. To deploy new
+code, ``kill -USR2 <master pid>`` re-executes a new master (which imports the
+new code) alongside the old one; once its workers are up, ``kill -QUIT <old
+master pid>`` drains and stops the old one. Workers and pool sizes are derived
+from the CPU count and the Postgres connection budget:
+
+    workers * (pool_size + max_overflow) <= DB_MAX_CONNECTIONS - DB_RESERVED_CONNECTIONS
+
+Set ``SERVER_MODE=asgi`` to serve run_asgi:app with uvicorn workers.
+"""
+import multiprocessing
+import os
+
+cpu_count = multiprocessing.cpu_count()
+server_mode = os.getenv('SERVER_MODE', 'wsgi')
+
+# Connections left for migrations, job workers, psql sessions and replicas' lag checks
+db_max_connections = int(os.getenv('DB_MAX_CONNECTIONS', 100))
+db_reserved_connections = int(os.getenv('DB_RESERVED_CONNECTIONS', 20))
+db_budget = max(db_max_connections - db_reserved_connections, 1)
+
+if server_mode == 'asgi':
+    wsgi_app = 'run_asgi:app'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+    threads = 1
+    # One event loop per core; each loop multiplexes many sessions over its pool
+    workers = int(os.getenv('WEB_CONCURRENCY', cpu_count))
+    # The async engine and the sync engine behind the mounted Flask app split the share
+    per_engine = max(db_budget // workers // 2, 1)
+    pool_size = max(per_engine // 2, 1)
+else:
+    wsgi_app = 'run_app:app'
+    worker_class = 'gthread'
+    threads = int(os.getenv('WEB_THREADS', 4))
+    workers = int(os.getenv('WEB_CONCURRENCY', 2 * cpu_count + 1))
+    # Never start more workers than the connection budget can hold at one connection per thread
+    workers = max(min(workers, db_budget // threads), 1)
+    per_engine = max(db_budget // workers, 1)
+    pool_size = min(threads, per_engine)
+
+max_overflow = max(min(per_engine - pool_size, pool_size), 0)
+os.environ.setdefault('DB_POOL_SIZE', str(pool_size))
+os.environ.setdefault('DB_MAX_OVERFLOW', str(max_overflow))
+
+bind = os.getenv('BIND', '0.0.0.0:8080')
+preload_app = True
+max_requests = int(os.getenv('MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.getenv('MAX_REQUESTS_JITTER', 200))
+timeout = int(os.getenv('WORKER_TIMEOUT', 60))
+graceful_timeout = int(os.getenv('GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+
+def post_fork(server, worker):
+    """Drop DB and Redis connections inherited from the preloading master."""
+    from run_app import app
+    from app.database import db
+    from app.redis import reset_connection_pools
+
+    with app.app_context():
+        for engine in db.engines.values():
+            # close=False: leave the parent's sockets alone, just forget them here
+            engine.dispose(close=False)
+    reset_connection_pools()
+
+
+def when_ready(server):
+    """Close the master's own connections (opened by init_db) before forking."""
+    from run_app import app
+    from app.database import db
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+    server.log.info(
+        "Serving %s with %d %s workers x %d threads, DB pool %s+%s per worker",
+        wsgi_app, workers, worker_class, threads,
+        os.environ['DB_POOL_SIZE'], os.environ['DB_MAX_OVERFLOW']
+    )
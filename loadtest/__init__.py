@@ -0,0 +1 @@
+"""Exam-day load testing: ``python -m loadtest --help``."""
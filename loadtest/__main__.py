@@ -0,0 +1,81 @@
+"""Rehearse exam day against a running instance.
+
+    python -m loadtest stub --port 9000
+    python -m loadtest prepare --users 500 --start-in 120 --stub-url http://localhost:9000
+    python -m loadtest run --base-url http://localhost:8080 --arrival poisson --window 60
+
+``prepare`` needs the app's DB settings; the app must run with
+``OAUTHLIB_INSECURE_TRANSPORT=1`` to talk to the plain-HTTP stub.
+"""
+import argparse
+import json
+import sys
+from loadtest.report import format_table, summarize
+from loadtest.scenario import ARRIVAL_CURVES, run_scenario
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m loadtest', description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    stub = commands.add_parser('stub', help='serve the stub OAuth provider')
+    stub.add_argument('--port', type=int, default=9000)
+
+    prepare = commands.add_parser('prepare', help='create the tenant, cohort and exam')
+    prepare.add_argument('--users', type=int, default=100)
+    prepare.add_argument('--questions', type=int, default=20)
+    prepare.add_argument('--start-in', type=int, default=60, help='seconds until scheduled_date')
+    prepare.add_argument('--domain', default='loadtest.local')
+    prepare.add_argument('--stub-url', default='http://localhost:9000')
+    prepare.add_argument('--plan', default='loadtest-plan.json')
+
+    run = commands.add_parser('run', help='run the exam-day scenario')
+    run.add_argument('--base-url', default='http://localhost:8080')
+    run.add_argument('--plan', default='loadtest-plan.json')
+    run.add_argument('--users', type=int, help='cap the cohort size from the plan')
+    run.add_argument('--concurrency', type=int, help='max active students (default: all)')
+    run.add_argument('--arrival', choices=ARRIVAL_CURVES, default='ramp')
+    run.add_argument('--window', type=float, default=30, help='seconds over which students start')
+    run.add_argument('--login-window', type=float, default=30, help='seconds before start students log in')
+    run.add_argument('--autosaves', type=int, default=5)
+    run.add_argument('--think-time', type=float, default=2, help='mean seconds between autosaves')
+    run.add_argument('--timeout', type=float, default=30)
+    run.add_argument('--seed', type=int)
+    run.add_argument('--json', dest='json_out', help='also write the summary to this file')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'stub':
+        from loadtest.oauth_stub import stub as stub_app
+        stub_app.run(port=args.port, threaded=True)
+    elif args.command == 'prepare':
+        from loadtest.prepare import prepare as prepare_plan
+        plan = prepare_plan(args.users, args.questions, args.start_in, args.domain, args.stub_url, args.plan)
+        print(f"exam {plan['exam_id']} for {plan['users']} students at {plan['scheduled_date']}Z -> {args.plan}")
+    else:
+        with open(args.plan) as f:
+            plan = json.load(f)
+        if args.users:
+            plan["users"] = min(args.users, plan["users"])
+        stats = run_scenario(
+            args.base_url, plan,
+            concurrency=args.concurrency or plan["users"],
+            curve=args.arrival,
+            window=args.window,
+            login_window=args.login_window,
+            autosaves=args.autosaves,
+            think_time=args.think_time,
+            timeout=args.timeout,
+            seed=args.seed
+        )
+        summary = summarize(stats)
+        print(format_table(summary))
+        if args.json_out:
+            with open(args.json_out, 'w') as f:
+                json.dump(summary, f, indent=2)
+        failed = summary["crashed_students"] or summary["endpoints"].get("total", {}).get("error_rate")
+        return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,41 @@
+"""Stand-in OAuth2 provider for load tests.
+
+The authorization code is the user's email: ``/token`` hands it back as the
+access token and ``/userinfo`` resolves it to a profile, so the app's real
+callback runs end to end without an external identity provider. Run it
+with ``python -m loadtest stub`` (or ``gunicorn loadtest.oauth_stub:stub``
+for heavy runs) and start the app with ``OAUTHLIB_INSECURE_TRANSPORT=1`` so
+it accepts a plain-HTTP token URL.
+"""
+from urllib.parse import urlencode
+from flask import Flask, request, jsonify, redirect
+
+stub = Flask(__name__)
+
+
+@stub.route('/authorize', methods=['GET'])
+def authorize():
+    """Approve immediately; ``login_hint`` becomes the code"""
+    params = {"code": request.args.get('login_hint', 'student-0@loadtest.local')}
+    if request.args.get('state'):
+        params["state"] = request.args['state']
+    return redirect(f"{request.args['redirect_uri']}&{urlencode(params)}")
+
+
+@stub.route('/token', methods=['POST'])
+def token():
+    """Exchange a code for an access token"""
+    code = request.form.get('code')
+    if not code:
+        return jsonify({"error": "invalid_request"}), 400
+    return jsonify({"access_token": code, "token_type": "Bearer", "expires_in": 3600})
+
+
+@stub.route('/userinfo', methods=['GET'])
+def userinfo():
+    """Profile of the token's user"""
+    auth_header = request.headers.get('Authorization', '')
+    if not auth_header.startswith('Bearer '):
+        return jsonify({"error": "invalid_token"}), 401
+    email = auth_header.split(' ', 1)[1]
+    return jsonify({"email": email, "name": email.split('@')[0], "picture": ""})
@@ -0,0 +1,108 @@
+import json
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy.dialects.postgresql import insert
+
+LOAD_TEST_ROLE = 'Load Test Student'
+OPTIONS_PER_QUESTION = 4
+
+
+def student_email(index, domain):
+    return f"student-{index}@{domain}"
+
+
+def prepare(users, questions, start_in, domain, stub_url, out):
+    """Create the tenant, cohort and exam a scenario runs against; write the plan to ``out``.
+
+    Students are created up front (the callback then finds them) and given a
+    role with ``read:exams`` so the scenario can list exams.
+    """
+    from run_app import app
+    from app.database import (
+        db, Exam, ExamAssignment, Option, Organization, Permission, Question, Role, RolePermission,
+        Tenant, User, UserRole
+    )
+
+    with app.app_context():
+        tenant = Tenant.query.filter_by(domain=domain).first() or Tenant(name=f"Load Test {domain}", domain=domain)
+        tenant.provider = 'loadtest'
+        tenant.client_id = tenant.client_secret = 'loadtest'
+        tenant.auth_url = f"{stub_url}/authorize"
+        tenant.token_url = f"{stub_url}/token"
+        tenant.userinfo_url = f"{stub_url}/userinfo"
+        db.session.add(tenant)
+
+        role = Role.query.filter_by(name=LOAD_TEST_ROLE).first()
+        if not role:
+            role = Role(id=uuid.uuid4(), name=LOAD_TEST_ROLE)
+            db.session.add(role)
+            permission = Permission.query.filter_by(name='read:exams').one()
+            db.session.add(RolePermission(id=uuid.uuid4(), role_id=role.id, permission_id=permission.id))
+
+        emails = [student_email(i, domain) for i in range(users)]
+        admin_email = f"admin@{domain}"
+        db.session.execute(
+            insert(User.__table__).values([
+                {"id": uuid.uuid4(), "username": email, "email": email, "name": email.split('@')[0]}
+                for email in emails + [admin_email]
+            ]).on_conflict_do_nothing()
+        )
+        user_ids = dict(db.session.query(User.email, User.id).filter(User.email.in_(emails + [admin_email])))
+        granted = {
+            user_id for (user_id,) in db.session.query(UserRole.user_id).filter(
+                UserRole.role_id == role.id, UserRole.user_id.in_(user_ids.values())
+            )
+        }
+        missing = [
+            {"id": uuid.uuid4(), "user_id": user_id, "role_id": role.id}
+            for email, user_id in user_ids.items() if email != admin_email and user_id not in granted
+        ]
+        if missing:
+            db.session.execute(insert(UserRole.__table__).values(missing))
+
+        org = Organization(id=uuid.uuid4(), name=f"Load Test {datetime.utcnow():%Y-%m-%d %H:%M}")
+        db.session.add(org)
+        exam = Exam(
+            id=uuid.uuid4(),
+            title="Load test exam",
+            duration=60,
+            total_marks=questions,
+            is_published=True,
+            organization_id=org.id,
+            created_by=user_ids[admin_email],
+            scheduled_date=datetime.utcnow() + timedelta(seconds=start_in)
+        )
+        db.session.add(exam)
+        db.session.flush()
+        # Assigned so the pre-warm job primes the cohort's permissions
+        db.session.execute(insert(ExamAssignment.__table__).values([
+            {"id": uuid.uuid4(), "exam_id": exam.id, "assigned_to_type": "user", "assigned_to_id": user_id}
+            for email, user_id in user_ids.items() if email != admin_email
+        ]))
+
+        paper = {}
+        for order in range(questions):
+            question = Question(
+                id=uuid.uuid4(), exam_id=exam.id, organization_id=exam.organization_id, type='mcq',
+                text=f"Question {order + 1}", marks=1, order=order
+            )
+            db.session.add(question)
+            options = [
+                Option(id=uuid.uuid4(), question_id=question.id, text=f"Option {n + 1}", order=n, iscorrect=n == 0)
+                for n in range(OPTIONS_PER_QUESTION)
+            ]
+            db.session.add_all(options)
+            paper[str(question.id)] = [str(option.id) for option in options]
+        db.session.commit()
+
+        plan = {
+            "domain": domain,
+            "users": users,
+            "organization_id": str(org.id),
+            "exam_id": str(exam.id),
+            "scheduled_date": exam.scheduled_date.isoformat(),
+            "paper": paper
+        }
+    with open(out, 'w') as f:
+        json.dump(plan, f, indent=2)
+    return plan
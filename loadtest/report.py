@@ -0,0 +1,59 @@
+import math
+from collections import Counter
+
+ENDPOINT_ORDER = ('login', 'callback', 'refresh', 'list_exams', 'start_exam', 'load_paper', 'save_answers', 'submit')
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(stats):
+    """Per-endpoint throughput, latency percentiles (ms) and error rate"""
+    duration = max((stats.finished or 0) - stats.started, 1e-9)
+    endpoints = sorted(stats.samples, key=lambda e: ENDPOINT_ORDER.index(e) if e in ENDPOINT_ORDER else len(ENDPOINT_ORDER))
+    summary = {
+        "duration_seconds": round(duration, 2),
+        "aborted_students": stats.aborted,
+        "crashed_students": len(stats.crashes),
+        "crash_errors": dict(Counter(stats.crashes).most_common(5)),
+        "endpoints": {}
+    }
+    for endpoint in endpoints + ['total']:
+        samples = (
+            [s for e in endpoints for s in stats.samples[e]] if endpoint == 'total'
+            else stats.samples[endpoint]
+        )
+        latencies = sorted(latency * 1000 for latency, _ in samples)
+        errors = sum(1 for _, ok in samples if not ok)
+        summary["endpoints"][endpoint] = {
+            "requests": len(samples),
+            "throughput_rps": round(len(samples) / duration, 2),
+            "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+            "p50_ms": round(percentile(latencies, 50), 1),
+            "p95_ms": round(percentile(latencies, 95), 1),
+            "p99_ms": round(percentile(latencies, 99), 1),
+            "max_ms": round(latencies[-1], 1) if latencies else 0.0
+        }
+    return summary
+
+
+def format_table(summary):
+    header = f"{'endpoint':<14}{'requests':>10}{'req/s':>10}{'errors':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    lines = [header, '-' * len(header)]
+    for endpoint, row in summary["endpoints"].items():
+        lines.append(
+            f"{endpoint:<14}{row['requests']:>10}{row['throughput_rps']:>10}{row['error_rate']:>9.2%}"
+            f"{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}{row['max_ms']:>10}"
+        )
+    lines.append(
+        f"duration {summary['duration_seconds']}s, aborted students: {summary['aborted_students']}, "
+        f"crashed students: {summary['crashed_students']}"
+    )
+    for error, count in summary["crash_errors"].items():
+        lines.append(f"  {count} x {error}")
+    return '\n'.join(lines)
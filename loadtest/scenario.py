@@ -0,0 +1,144 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import requests
+from loadtest.prepare import student_email
+
+ARRIVAL_CURVES = ('burst', 'ramp', 'poisson')
+
+
+class Stats:
+    """Thread-safe per-endpoint latency and status recorder"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}  # endpoint -> list of (latency seconds, ok)
+        self.aborted = 0
+        self.crashes = []  # "ExceptionType: message" per student whose run raised
+        self.started = time.monotonic()
+        self.finished = None
+
+    def record(self, endpoint, latency, ok):
+        with self.lock:
+            self.samples.setdefault(endpoint, []).append((latency, ok))
+
+    def abort(self):
+        with self.lock:
+            self.aborted += 1
+
+    def crash(self, error):
+        with self.lock:
+            self.crashes.append(f"{type(error).__name__}: {error}")
+
+
+def arrival_offsets(users, curve, window, seed=None):
+    """Seconds after the scheduled start at which each user starts the exam.
+
+    ``burst`` starts everyone at once, ``ramp`` spreads them evenly over
+    ``window`` and ``poisson`` draws exponential gaps averaging ``window / users``.
+    """
+    rng = random.Random(seed)
+    if curve == 'burst' or window <= 0:
+        return [0.0] * users
+    if curve == 'ramp':
+        return [window * i / users for i in range(users)]
+    offsets, t = [], 0.0
+    for _ in range(users):
+        t += rng.expovariate(users / window)
+        offsets.append(t)
+    return offsets
+
+
+def _sleep_until(deadline):
+    delay = deadline - time.monotonic()
+    if delay > 0:
+        time.sleep(delay)
+
+
+class VirtualStudent:
+    """One student's exam day: log in, refresh, list exams, start, autosave, submit."""
+
+    def __init__(self, base_url, plan, index, stats, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.plan = plan
+        self.email = student_email(index, plan["domain"])
+        self.stats = stats
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.rng = random.Random(index)
+
+    def call(self, endpoint, method, path, expect=(200,), **kwargs):
+        started = time.monotonic()
+        try:
+            response = self.session.request(method, self.base_url + path, timeout=self.timeout, **kwargs)
+        except requests.RequestException:
+            self.stats.record(endpoint, time.monotonic() - started, False)
+            return None
+        ok = response.status_code in expect
+        self.stats.record(endpoint, time.monotonic() - started, ok)
+        return response if ok else None
+
+    def run(self, login_at, start_at, autosaves, think_time):
+        domain = self.plan["domain"]
+        exam_id = self.plan["exam_id"]
+
+        _sleep_until(login_at)
+        self.call('login', 'GET', '/auth/login', expect=(302,), params={"domain": domain}, allow_redirects=False)
+        response = self.call('callback', 'GET', '/auth/callback', params={"domain": domain, "code": self.email})
+        if not response:
+            return self.stats.abort()
+        tokens = response.json()
+        self.session.headers["Authorization"] = f"Bearer {tokens['access_token']}"
+        response = self.call('refresh', 'POST', '/auth/refresh', json={"refresh_token": tokens["refresh_token"]})
+        if response:
+            self.session.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+        self.call('list_exams', 'GET', '/api/v1/exams/', params={"organization_id": self.plan["organization_id"]})
+
+        _sleep_until(start_at)
+        response = self.call('start_exam', 'POST', f"/api/v1/exams/{exam_id}/start", expect=(201,))
+        if not response:
+            return self.stats.abort()
+        attempt_path = f"/api/v1/exams/{exam_id}/attempts/{response.json()['attempt_id']}"
+        self.call('load_paper', 'GET', f"/api/v1/exams/{exam_id}/paper", expect=(200,))
+
+        paper = self.plan["paper"]
+        questions = list(paper)
+        for _ in range(autosaves):
+            time.sleep(think_time * self.rng.uniform(0.5, 1.5))
+            answers = {
+                question_id: self.rng.choice(paper[question_id])
+                for question_id in self.rng.sample(questions, min(len(questions), 3))
+            }
+            self.call('save_answers', 'PUT', f"{attempt_path}/answers", json={"answers": answers})
+        self.call('submit', 'POST', f"{attempt_path}/submit", expect=(200, 202))
+
+
+def run_scenario(base_url, plan, concurrency, curve, window, login_window,
+                 autosaves, think_time, timeout=30, seed=None):
+    """Drive ``plan["users"]`` students against ``base_url`` and return their Stats.
+
+    Students log in spread over ``login_window`` seconds before the exam's
+    ``scheduled_date`` and start it following the arrival curve. At most
+    ``concurrency`` students are active at once.
+    """
+    users = plan["users"]
+    stats = Stats()
+    now = time.monotonic()
+    until_start = (datetime.fromisoformat(plan["scheduled_date"]) - datetime.utcnow()).total_seconds()
+    start_at = now + max(until_start, login_window)
+    login_rng = random.Random(seed)
+
+    futures = []
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for index, offset in enumerate(arrival_offsets(users, curve, window, seed)):
+            student = VirtualStudent(base_url, plan, index, stats, timeout)
+            login_at = start_at - login_rng.uniform(0, login_window)
+            futures.append(pool.submit(student.run, login_at, start_at + offset, autosaves, think_time))
+    stats.finished = time.monotonic()
+    # A student whose run raised (bad response body, bug in the harness) is reported, not lost
+    for future in futures:
+        if future.exception() is not None:
+            stats.crash(future.exception())
+    return stats
@@ -0,0 +1,40 @@
+"""unique student group membership
+
+Revision ID: 3f1a9c2e7b40
+Revises:
+Create Date: 2026-10-19 09:12:41.503118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1a9c2e7b40'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Drop duplicate memberships left behind by the old add_member endpoint
+    op.execute("""
+        DELETE FROM student_group_members a
+        USING student_group_members b
+        WHERE a.group_id = b.group_id
+          AND a.student_id = b.student_id
+          AND a.ctid > b.ctid
+    """)
+    op.create_unique_constraint(
+        'uq_student_group_members_group_student',
+        'student_group_members',
+        ['group_id', 'student_id']
+    )
+
+
+def downgrade():
+    op.drop_constraint(
+        'uq_student_group_members_group_student',
+        'student_group_members',
+        type_='unique'
+    )
@@ -0,0 +1,58 @@
+"""indexes for hot foreign-key lookups
+
+Revision ID: 5e9b8a3c0d27
+Revises: c47e0b5d2a18
+Create Date: 2026-10-19 13:05:38.271904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e9b8a3c0d27'
+down_revision = 'c47e0b5d2a18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_role_permissions_role_id', 'role_permissions', ['role_id'])
+    op.create_index('ix_user_roles_user_id_role_id', 'user_roles', ['user_id', 'role_id'])
+    # (organization_id, user_id) is covered by uq_user_organizations_org_user
+    op.create_index('ix_user_organizations_user_id', 'user_organizations', ['user_id'])
+    op.create_index(
+        'ix_api_tokens_user_id_active', 'api_tokens', ['user_id'],
+        postgresql_where=sa.text('NOT revoked')
+    )
+    op.create_index('ix_exams_organization_id_created_at', 'exams', ['organization_id', 'created_at'])
+    op.create_index('ix_questions_exam_id_order', 'questions', ['exam_id', 'order'])
+    op.create_index('ix_options_question_id_order', 'options', ['question_id', 'order'])
+    op.create_index('ix_exam_attempts_exam_id_user_id', 'exam_attempts', ['exam_id', 'user_id'])
+    op.create_index(
+        'ix_exam_attempts_ongoing', 'exam_attempts', ['exam_id', 'user_id'],
+        postgresql_where=sa.text('end_time IS NULL')
+    )
+    op.create_index('ix_exam_attempts_user_id', 'exam_attempts', ['user_id'])
+    op.create_index('ix_student_groups_organization_id', 'student_groups', ['organization_id'])
+    op.create_index('ix_exam_assignments_assignee', 'exam_assignments', ['assigned_to_type', 'assigned_to_id'])
+    op.create_index('ix_exam_assignments_exam_id', 'exam_assignments', ['exam_id'])
+    # group_id lookups are covered by uq_student_group_members_group_student
+    op.create_index('ix_student_group_members_student_id', 'student_group_members', ['student_id'])
+
+
+def downgrade():
+    op.drop_index('ix_student_group_members_student_id', table_name='student_group_members')
+    op.drop_index('ix_exam_assignments_exam_id', table_name='exam_assignments')
+    op.drop_index('ix_exam_assignments_assignee', table_name='exam_assignments')
+    op.drop_index('ix_student_groups_organization_id', table_name='student_groups')
+    op.drop_index('ix_exam_attempts_user_id', table_name='exam_attempts')
+    op.drop_index('ix_exam_attempts_ongoing', table_name='exam_attempts')
+    op.drop_index('ix_exam_attempts_exam_id_user_id', table_name='exam_attempts')
+    op.drop_index('ix_options_question_id_order', table_name='options')
+    op.drop_index('ix_questions_exam_id_order', table_name='questions')
+    op.drop_index('ix_exams_organization_id_created_at', table_name='exams')
+    op.drop_index('ix_api_tokens_user_id_active', table_name='api_tokens')
+    op.drop_index('ix_user_organizations_user_id', table_name='user_organizations')
+    op.drop_index('ix_user_roles_user_id_role_id', table_name='user_roles')
+    op.drop_index('ix_role_permissions_role_id', table_name='role_permissions')
@@ -0,0 +1,39 @@
+"""unique organization membership
+
+Revision ID: 8b2d4e6f1a93
+Revises: 3f1a9c2e7b40
+Create Date: 2026-10-19 10:02:17.884120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2d4e6f1a93'
+down_revision = '3f1a9c2e7b40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        DELETE FROM user_organizations a
+        USING user_organizations b
+        WHERE a.organization_id = b.organization_id
+          AND a.user_id = b.user_id
+          AND a.ctid > b.ctid
+    """)
+    op.create_unique_constraint(
+        'uq_user_organizations_org_user',
+        'user_organizations',
+        ['organization_id', 'user_id']
+    )
+
+
+def downgrade():
+    op.drop_constraint(
+        'uq_user_organizations_org_user',
+        'user_organizations',
+        type_='unique'
+    )
@@ -0,0 +1,50 @@
+"""result_rollups table, backfilled from graded attempts
+
+Revision ID: a4c8e1f7d2b9
+Revises: f93a1d6b2c70
+Create Date: 2026-10-19 18:02:41.127305
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from app.rollups import RECONCILE
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c8e1f7d2b9'
+down_revision = 'f93a1d6b2c70'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'result_rollups',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('organization_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('scope', sa.Text(), nullable=False),
+        sa.Column('scope_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('label', sa.Text(), nullable=True),
+        sa.Column('graded', sa.Integer(), nullable=False),
+        sa.Column('passed', sa.Integer(), nullable=False),
+        sa.Column('percentage_sum', sa.Numeric(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ['organization_id'], ['organizations.id'],
+            name='result_rollups_organization_id_fkey'
+        ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('scope', 'scope_id', name='uq_result_rollups_scope_scope_id')
+    )
+    op.create_index('ix_result_rollups_organization_id_scope', 'result_rollups', ['organization_id', 'scope'])
+
+    conn = op.get_bind()
+    for organization_id in conn.execute(sa.text("SELECT id FROM organizations")).scalars().all():
+        conn.execute(RECONCILE, {"org": organization_id, "now": datetime.utcnow()})
+
+
+def downgrade():
+    op.drop_index('ix_result_rollups_organization_id_scope', table_name='result_rollups')
+    op.drop_table('result_rollups')
@@ -0,0 +1,136 @@
+"""partition exam_attempts by month and organization
+
+Revision ID: a6c3f1e89d54
+Revises: 5e9b8a3c0d27
+Create Date: 2026-10-19 14:41:09.615233
+
+"""
+from datetime import date
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6c3f1e89d54'
+down_revision = '5e9b8a3c0d27'
+branch_labels = None
+depends_on = None
+
+ORG_BUCKETS = 4
+MONTHS_AHEAD = 3
+INDEXES = (
+    ('ix_exam_attempts_exam_id_user_id', 'exam_id, user_id', None),
+    ('ix_exam_attempts_ongoing', 'exam_id, user_id', 'end_time IS NULL'),
+    ('ix_exam_attempts_user_id', 'user_id', None),
+    ('ix_exam_attempts_organization_id_created_at', 'organization_id, created_at', None),
+)
+
+
+def _add_months(month, n):
+    years, month_index = divmod(month.month - 1 + n, 12)
+    return date(month.year + years, month_index + 1, 1)
+
+
+def _create_month(month):
+    name = f"exam_attempts_y{month.year}m{month.month:02d}"
+    op.execute(
+        f"CREATE TABLE {name} PARTITION OF exam_attempts "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}') "
+        f"PARTITION BY HASH (organization_id)"
+    )
+    for remainder in range(ORG_BUCKETS):
+        op.execute(
+            f"CREATE TABLE {name}_h{remainder} PARTITION OF {name} "
+            f"FOR VALUES WITH (MODULUS {ORG_BUCKETS}, REMAINDER {remainder})"
+        )
+
+
+def _create_indexes(indexes=INDEXES):
+    for name, columns, where in indexes:
+        op.execute(
+            f"CREATE INDEX {name} ON exam_attempts ({columns})"
+            + (f" WHERE {where}" if where else "")
+        )
+
+
+def upgrade():
+    conn = op.get_bind()
+    op.execute("ALTER TABLE exam_attempts RENAME TO exam_attempts_legacy")
+    op.execute("ALTER TABLE exam_attempts_legacy RENAME CONSTRAINT exam_attempts_pkey TO exam_attempts_legacy_pkey")
+    for name, _, _ in INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+
+    op.execute("""
+        CREATE TABLE exam_attempts (
+            id UUID NOT NULL,
+            exam_id UUID NOT NULL,
+            user_id UUID NOT NULL,
+            start_time TIMESTAMP WITHOUT TIME ZONE,
+            end_time TIMESTAMP WITHOUT TIME ZONE,
+            status TEXT,
+            score INTEGER,
+            percentage NUMERIC,
+            answers JSONB,
+            organization_id UUID NOT NULL,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            CONSTRAINT exam_attempts_pkey PRIMARY KEY (id, created_at, organization_id),
+            CONSTRAINT exam_attempts_exam_id_fkey FOREIGN KEY (exam_id) REFERENCES exams (id),
+            CONSTRAINT exam_attempts_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id),
+            CONSTRAINT exam_attempts_organization_id_fkey FOREIGN KEY (organization_id) REFERENCES organizations (id)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    op.execute("CREATE TABLE exam_attempts_default PARTITION OF exam_attempts DEFAULT")
+
+    oldest = conn.execute(sa.text("SELECT min(created_at) FROM exam_attempts_legacy")).scalar()
+    current = date.today().replace(day=1)
+    month = date(oldest.year, oldest.month, 1) if oldest else current
+    while month <= _add_months(current, MONTHS_AHEAD):
+        _create_month(month)
+        month = _add_months(month, 1)
+
+    _create_indexes()
+    op.execute("""
+        INSERT INTO exam_attempts (
+            id, exam_id, user_id, start_time, end_time, status, score,
+            percentage, answers, organization_id, created_at
+        )
+        SELECT id, exam_id, user_id, start_time, end_time, status, score,
+               percentage, answers, organization_id, created_at
+        FROM exam_attempts_legacy
+    """)
+    op.execute("DROP TABLE exam_attempts_legacy")
+
+
+def downgrade():
+    op.execute("ALTER TABLE exam_attempts RENAME TO exam_attempts_partitioned")
+    op.execute("ALTER TABLE exam_attempts_partitioned RENAME CONSTRAINT exam_attempts_pkey TO exam_attempts_partitioned_pkey")
+    for name, _, _ in INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+
+    op.execute("""
+        CREATE TABLE exam_attempts (
+            id UUID NOT NULL,
+            exam_id UUID NOT NULL,
+            user_id UUID NOT NULL,
+            start_time TIMESTAMP WITHOUT TIME ZONE,
+            end_time TIMESTAMP WITHOUT TIME ZONE,
+            status TEXT,
+            score INTEGER,
+            percentage NUMERIC,
+            answers JSONB,
+            organization_id UUID NOT NULL,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            CONSTRAINT exam_attempts_pkey PRIMARY KEY (id),
+            CONSTRAINT exam_attempts_exam_id_fkey FOREIGN KEY (exam_id) REFERENCES exams (id),
+            CONSTRAINT exam_attempts_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id),
+            CONSTRAINT exam_attempts_organization_id_fkey FOREIGN KEY (organization_id) REFERENCES organizations (id)
+        )
+    """)
+    _create_indexes(INDEXES[:3])
+    op.execute("""
+        INSERT INTO exam_attempts
+        SELECT id, exam_id, user_id, start_time, end_time, status, score,
+               percentage, answers, organization_id, created_at
+        FROM exam_attempts_partitioned
+    """)
+    op.execute("DROP TABLE exam_attempts_partitioned CASCADE")
@@ -0,0 +1,55 @@
+"""question organization and search indexes
+
+Revision ID: b7e2d9c4a1f6
+Revises: a4c8e1f7d2b9
+Create Date: 2026-10-19 18:47:12.604318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2d9c4a1f6'
+down_revision = 'a4c8e1f7d2b9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('questions', sa.Column('organization_id', postgresql.UUID(as_uuid=True), nullable=True))
+    op.execute("""
+        UPDATE questions q
+        SET organization_id = e.organization_id
+        FROM exams e
+        WHERE e.id = q.exam_id
+    """)
+    op.alter_column('questions', 'organization_id', nullable=False)
+    op.create_foreign_key(
+        'questions_organization_id_fkey', 'questions', 'organizations', ['organization_id'], ['id']
+    )
+    op.create_index('ix_questions_organization_id_type', 'questions', ['organization_id', 'type'])
+
+    op.execute("""
+        ALTER TABLE questions
+        ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (to_tsvector('english', text)) STORED
+    """)
+    op.create_index('ix_questions_search_vector', 'questions', ['search_vector'], postgresql_using='gin')
+    # trigram GIN serves substring matches and the near-duplicate check; without
+    # pg_trgm, search is full-text only (app.search.has_trigram)
+    available = op.get_bind().execute(sa.text(
+        "SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'"
+    )).scalar()
+    if available:
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute("CREATE INDEX ix_questions_text_trgm ON questions USING gin (lower(text) gin_trgm_ops)")
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_questions_text_trgm")
+    op.drop_index('ix_questions_search_vector', table_name='questions')
+    op.drop_column('questions', 'search_vector')
+    op.drop_index('ix_questions_organization_id_type', table_name='questions')
+    op.drop_constraint('questions_organization_id_fkey', 'questions', type_='foreignkey')
+    op.drop_column('questions', 'organization_id')
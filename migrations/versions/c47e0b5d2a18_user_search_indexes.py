@@ -0,0 +1,46 @@
+"""user search indexes
+
+Revision ID: c47e0b5d2a18
+Revises: 8b2d4e6f1a93
+Create Date: 2026-10-19 11:20:53.140772
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c47e0b5d2a18'
+down_revision = '8b2d4e6f1a93'
+branch_labels = None
+depends_on = None
+
+SEARCH_COLUMNS = ('username', 'email', 'name')
+
+
+def upgrade():
+    # Without pg_trgm, search is prefix-only (app.search.has_trigram)
+    trigram = op.get_bind().execute(sa.text(
+        "SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'"
+    )).scalar()
+    if trigram:
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for column in SEARCH_COLUMNS:
+        # btree with text_pattern_ops serves LIKE 'prefix%' autocomplete
+        op.execute(
+            f"CREATE INDEX ix_users_{column}_prefix "
+            f"ON users (lower({column}) text_pattern_ops)"
+        )
+        if not trigram:
+            continue
+        # trigram GIN serves substring matches and similarity ranking
+        op.execute(
+            f"CREATE INDEX ix_users_{column}_trgm "
+            f"ON users USING gin (lower({column}) gin_trgm_ops)"
+        )
+
+
+def downgrade():
+    for column in SEARCH_COLUMNS:
+        op.execute(f"DROP INDEX IF EXISTS ix_users_{column}_trgm")
+        op.execute(f"DROP INDEX IF EXISTS ix_users_{column}_prefix")
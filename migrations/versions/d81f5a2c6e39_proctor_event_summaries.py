@@ -0,0 +1,55 @@
+"""proctor_event_summaries table for batched heartbeat persistence
+
+Revision ID: d81f5a2c6e39
+Revises: a6c3f1e89d54
+Create Date: 2026-10-19 15:12:47.508316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'd81f5a2c6e39'
+down_revision = 'a6c3f1e89d54'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'proctor_event_summaries',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('attempt_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('exam_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('organization_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('window_start', sa.DateTime(), nullable=False),
+        sa.Column('window_end', sa.DateTime(), nullable=False),
+        sa.Column('heartbeats', sa.Integer(), nullable=False),
+        sa.Column('unfocused_heartbeats', sa.Integer(), nullable=False),
+        sa.Column('focus_lost', sa.Integer(), nullable=False),
+        sa.Column('max_gap_seconds', sa.Numeric(), nullable=True),
+        sa.Column('time_remaining', sa.Integer(), nullable=True),
+        sa.Column('events', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['exam_id'], ['exams.id'], name='proctor_event_summaries_exam_id_fkey'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], name='proctor_event_summaries_user_id_fkey'),
+        sa.ForeignKeyConstraint(
+            ['organization_id'], ['organizations.id'],
+            name='proctor_event_summaries_organization_id_fkey'
+        ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(
+        'ix_proctor_event_summaries_attempt_id_window_start',
+        'proctor_event_summaries', ['attempt_id', 'window_start']
+    )
+    op.create_index('ix_proctor_event_summaries_exam_id', 'proctor_event_summaries', ['exam_id'])
+
+
+def downgrade():
+    op.drop_index('ix_proctor_event_summaries_exam_id', table_name='proctor_event_summaries')
+    op.drop_index('ix_proctor_event_summaries_attempt_id_window_start', table_name='proctor_event_summaries')
+    op.drop_table('proctor_event_summaries')
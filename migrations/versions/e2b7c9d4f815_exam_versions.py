@@ -0,0 +1,47 @@
+"""exam versions and copy-on-write question links
+
+Revision ID: e2b7c9d4f815
+Revises: d81f5a2c6e39
+Create Date: 2026-10-19 16:03:21.774102
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b7c9d4f815'
+down_revision = 'd81f5a2c6e39'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('exams', sa.Column('parent_exam_id', postgresql.UUID(as_uuid=True), nullable=True))
+    op.add_column('exams', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.alter_column('exams', 'version', server_default=None)
+    op.create_foreign_key('exams_parent_exam_id_fkey', 'exams', 'exams', ['parent_exam_id'], ['id'])
+    op.create_index('ix_exams_parent_exam_id', 'exams', ['parent_exam_id'])
+
+    op.create_table(
+        'exam_question_links',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('exam_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('question_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('order', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['exam_id'], ['exams.id'], name='exam_question_links_exam_id_fkey'),
+        sa.ForeignKeyConstraint(['question_id'], ['questions.id'], name='exam_question_links_question_id_fkey'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('exam_id', 'question_id', name='uq_exam_question_links_exam_question')
+    )
+    op.create_index('ix_exam_question_links_question_id', 'exam_question_links', ['question_id'])
+
+
+def downgrade():
+    op.drop_index('ix_exam_question_links_question_id', table_name='exam_question_links')
+    op.drop_table('exam_question_links')
+    op.drop_index('ix_exams_parent_exam_id', table_name='exams')
+    op.drop_constraint('exams_parent_exam_id_fkey', 'exams', type_='foreignkey')
+    op.drop_column('exams', 'version')
+    op.drop_column('exams', 'parent_exam_id')
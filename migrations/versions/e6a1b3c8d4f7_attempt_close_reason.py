@@ -0,0 +1,36 @@
+"""exam_attempts.close_reason, backfilled from status and the exam deadline
+
+Revision ID: e6a1b3c8d4f7
+Revises: c5d8f2a9e3b1
+Create Date: 2026-10-19 20:41:33.904175
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6a1b3c8d4f7'
+down_revision = 'c5d8f2a9e3b1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('exam_attempts', sa.Column('close_reason', sa.Text(), nullable=True))
+    # Graded attempts lost their status; auto-closing sets end_time to exactly the deadline
+    op.execute("""
+        UPDATE exam_attempts a
+        SET close_reason = CASE
+            WHEN a.status = 'auto_closed'
+                 OR (e.duration IS NOT NULL AND a.end_time = a.start_time + e.duration * interval '1 minute')
+            THEN 'auto_closed'
+            ELSE 'submitted'
+        END
+        FROM exams e
+        WHERE e.id = a.exam_id AND a.end_time IS NOT NULL
+    """)
+
+
+def downgrade():
+    op.drop_column('exam_attempts', 'close_reason')
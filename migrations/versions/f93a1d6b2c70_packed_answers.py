@@ -0,0 +1,59 @@
+"""packed attempt answers and answer layouts
+
+Revision ID: f93a1d6b2c70
+Revises: e2b7c9d4f815
+Create Date: 2026-10-19 17:21:09.318556
+
+"""
+import json
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from app.answer_codec import decode, packed_layout_id
+
+
+# revision identifiers, used by Alembic.
+revision = 'f93a1d6b2c70'
+down_revision = 'e2b7c9d4f815'
+branch_labels = None
+depends_on = None
+
+BATCH = 1000
+
+def upgrade():
+    op.create_table(
+        'answer_layouts',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('exam_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('layout', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['exam_id'], ['exams.id'], name='answer_layouts_exam_id_fkey'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.add_column('exam_attempts', sa.Column('answers_packed', postgresql.BYTEA(), nullable=True))
+    # Existing answers stay JSON: packing is opt-in (ANSWER_STORAGE = 'packed'),
+    # and `flask answers pack` converts already graded attempts once enabled
+
+
+def downgrade():
+    conn = op.get_bind()
+    layouts = {str(id_): layout for id_, layout in conn.execute(sa.text("SELECT id, layout FROM answer_layouts"))}
+    while True:
+        rows = conn.execute(sa.text("""
+            SELECT id, organization_id, created_at, answers_packed FROM exam_attempts
+            WHERE answers_packed IS NOT NULL
+            LIMIT :batch
+        """), {"batch": BATCH}).all()
+        if not rows:
+            break
+        conn.execute(sa.text("""
+            UPDATE exam_attempts SET answers = CAST(:answers AS jsonb), answers_packed = NULL
+            WHERE id = :id AND organization_id = :organization_id AND created_at = :created_at
+        """), [
+            {"answers": json.dumps(decode(packed, layouts[str(packed_layout_id(packed))])), "id": id_,
+             "organization_id": organization_id, "created_at": created_at}
+            for id_, organization_id, created_at, packed in rows
+        ])
+
+    op.drop_column('exam_attempts', 'answers_packed')
+    op.drop_table('answer_layouts')
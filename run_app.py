@@ -4,7 +4,17 @@ from app.routes.user_routes import bp as user_bp
 from app.routes.org_routes import bp as org_bp
 from app.routes.exam_routes import bp as exam_bp
 from app.routes.group_routes import bp as group_bp
-from app.database import init_db
+from app.routes.job_routes import bp as job_bp
+from app.routes.metrics_routes import bp as metrics_bp
+from app.routes.batch_routes import bp as batch_bp
+from app.routes.question_routes import bp as question_bp
+from app.database import init_db, seed_dev_data_command
+from app.replicas import init_replica_routing
+from app.accounting import init_tenant_accounting
+from app.tracing import init_logging, init_tracing
+from app.query_plans import check_query_plans_command
+from app.partitions import partitions_cli
+from app.answers import answers_cli
 from dotenv import load_dotenv
 import os
 import json
@@ -19,19 +29,67 @@ db_password = quote_plus(os.getenv('DB_PASSWORD'))
 db_host = os.getenv('DB_HOST')
 db_port = os.getenv('DB_PORT')
 db_name = os.getenv('DB_NAME')
+# Comma-separated SQLAlchemy URLs of read replicas
+db_replica_urls = [url.strip() for url in os.getenv('DB_REPLICA_URLS', '').split(',') if url.strip()]
 
 def create_app():
     app = Flask(__name__)
     app.config['SQLALCHEMY_DATABASE_URI'] = (
     f'postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}'
     )
+    app.config['SQLALCHEMY_BINDS'] = {
+        f'replica_{i}': url for i, url in enumerate(db_replica_urls)
+    }
+    app.config['REPLICA_MAX_LAG_SECONDS'] = float(os.getenv('REPLICA_MAX_LAG_SECONDS', 5))
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Sized per worker by gunicorn.conf.py; defaults apply under the dev server
+    if os.getenv('DB_POOL_SIZE'):
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            'pool_size': int(os.getenv('DB_POOL_SIZE')),
+            'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 0)),
+            'pool_pre_ping': True
+        }
+    app.config['ATTEMPT_ARCHIVE_DIR'] = os.getenv('ATTEMPT_ARCHIVE_DIR', 'archive/exam_attempts')
+    app.config['ATTEMPT_RETENTION_MONTHS'] = int(os.getenv('ATTEMPT_RETENTION_MONTHS', 24))
+    # Candidates without a heartbeat for this long are reported as disconnected
+    app.config['HEARTBEAT_ACTIVE_SECONDS'] = int(os.getenv('HEARTBEAT_ACTIVE_SECONDS', 15))
+    # Live SSE dashboards a WSGI process serves at once (each holds a thread); serve more through run_asgi.py
+    app.config['SSE_MAX_STREAMS'] = int(os.getenv('SSE_MAX_STREAMS', 2))
+    # 'packed' moves graded attempts' answers into the compact answers_packed column;
+    # `flask answers pack` converts the attempts graded before it was set
+    app.config['ANSWER_STORAGE'] = os.getenv('ANSWER_STORAGE', 'json')
+    # Caches are primed this long before each exam's scheduled_date
+    app.config['EXAM_PREWARM_LEAD_MINUTES'] = int(os.getenv('EXAM_PREWARM_LEAD_MINUTES', 15))
+    # {"<organization_id>" or "*": {"requests"|"db_ms"|"rows"|"bytes": limit}} per budget window
+    app.config['TENANT_BUDGETS'] = json.loads(os.getenv('TENANT_BUDGETS', '{}'))
+    app.config['TENANT_BUDGET_WINDOW_MINUTES'] = int(os.getenv('TENANT_BUDGET_WINDOW_MINUTES', 5))
+    # Jaccard similarity at which two text answers are reported, and processes used to compare them
+    app.config['SIMILARITY_THRESHOLD'] = float(os.getenv('SIMILARITY_THRESHOLD', 0.7))
+    app.config['SIMILARITY_WORKERS'] = int(os.getenv('SIMILARITY_WORKERS', 0)) or None
+    app.config['LOG_LEVEL'] = os.getenv('LOG_LEVEL', 'INFO')
+    # Share of requests whose trace is logged, and the duration from which a trace goes to TRACE_SLOW_FILE
+    app.config['TRACE_SAMPLE_RATE'] = float(os.getenv('TRACE_SAMPLE_RATE', 0))
+    app.config['TRACE_SLOW_MS'] = int(os.getenv('TRACE_SLOW_MS', 2000))
+    app.config['TRACE_SLOW_FILE'] = os.getenv('TRACE_SLOW_FILE', 'logs/slow_traces.jsonl')
+    init_logging(app)
+    # First, so the other request hooks run inside the trace
+    init_tracing(app)
     init_db(app)
+    init_replica_routing(app)
+    init_tenant_accounting(app)
     app.register_blueprint(auth_bp)
     app.register_blueprint(user_bp)
     app.register_blueprint(org_bp)
     app.register_blueprint(exam_bp)
     app.register_blueprint(group_bp)
+    app.register_blueprint(job_bp)
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(batch_bp)
+    app.register_blueprint(question_bp)
+    app.cli.add_command(check_query_plans_command)
+    app.cli.add_command(partitions_cli)
+    app.cli.add_command(answers_cli)
+    app.cli.add_command(seed_dev_data_command)
 
     return app
 
@@ -0,0 +1,26 @@
+from contextlib import asynccontextmanager
+from asgiref.wsgi import WsgiToAsgi
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from run_app import app as flask_app
+from app import aio
+from app.routes.async_routes import routes
+
+
+@asynccontextmanager
+async def lifespan(_):
+    aio.init_async(flask_app.config)
+    yield
+    await aio.close_async()
+
+
+# Async handlers for the I/O-heavy routes; everything else falls through to
+# the existing Flask blueprints.
+app = Starlette(
+    routes=routes + [Mount('/', app=WsgiToAsgi(flask_app))],
+    lifespan=lifespan
+)
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run("run_asgi:app", port=8080)
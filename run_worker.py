@@ -0,0 +1,61 @@
+"""Background job workers: ``python run_worker.py [--processes N] [--burst]``.
+
+Starts a pool of worker processes that run jobs from the Redis queues in
+app/jobs.py. Dead workers are restarted; SIGTERM or Ctrl-C lets each worker
+finish its current job before exiting. ``--burst`` drains the queues and exits.
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import time
+
+
+def work(burst):
+    # Ctrl-C reaches the whole process group; let the parent decide
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from run_app import app
+    from app import tasks  # noqa: F401  registers the job handlers
+    from app.jobs import Worker
+
+    Worker(app).run(burst=burst)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--processes', type=int,
+                        default=int(os.getenv('WORKER_PROCESSES', multiprocessing.cpu_count())))
+    parser.add_argument('--burst', action='store_true', help='exit once the queues are empty')
+    args = parser.parse_args()
+
+    stopping = False
+
+    def stop(*_):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    def spawn():
+        process = multiprocessing.Process(target=work, args=(args.burst,), daemon=False)
+        process.start()
+        return process
+
+    processes = [spawn() for _ in range(args.processes)]
+    while not stopping:
+        time.sleep(1)
+        if args.burst:
+            if not any(p.is_alive() for p in processes):
+                return
+            continue
+        processes = [p if p.is_alive() else spawn() for p in processes]
+
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+# The app creates its Redis clients at import time, so fakeredis has to be
+# patched in before anything under app/ is imported. Database tests use the
+# Postgres configured through DB_* (as for the app itself) and are skipped
+# when it is unreachable.
+import pytest
+
+fakeredis = pytest.importorskip('fakeredis')
+import redis
+
+_server = fakeredis.FakeServer()
+redis.Redis.from_url = classmethod(
+    lambda cls, url, **kwargs: fakeredis.FakeRedis(server=_server, **kwargs)
+)
+
+
+@pytest.fixture(autouse=True)
+def redis_client():
+    from app.redis import redis_client
+    redis_client.flushall()
+    yield redis_client
+    redis_client.flushall()
+
+
+@pytest.fixture(scope='session')
+def app():
+    try:
+        from run_app import app
+        with app.app_context():
+            from app.database import db
+            db.session.execute(db.text('SELECT 1'))
+            db.session.rollback()
+    except Exception as e:
+        pytest.skip(f"Database not available: {e}")
+    return app
+
+
+@pytest.fixture
+def app_context(app):
+    with app.app_context():
+        yield
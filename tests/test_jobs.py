@@ -0,0 +1,101 @@
+import time
+
+import pytest
+from flask import Flask
+
+pytest.importorskip('lupa')  # fakeredis needs it to run the claim script
+
+from app import jobs
+from app.jobs import DELAYED_KEY, RUNNING_KEY, Worker, enqueue, get_job, job
+
+calls = []
+
+
+@job('tests.flaky', max_retries=1)
+def flaky(value):
+    calls.append(value)
+    if len(calls) == 1:
+        raise RuntimeError("first attempt fails")
+    return value * 2
+
+
+@job('tests.noop', max_retries=1)
+def noop():
+    return None
+
+
+@pytest.fixture
+def worker():
+    calls.clear()
+    return Worker(Flask(__name__), poll_timeout=0.01)
+
+
+def _due(key, job_id, redis_client):
+    """Make ``job_id``'s deadline in ``key`` pass now."""
+    redis_client.zadd(key, {job_id: 0}, xx=True)
+    jobs._requeue_due(time.time())
+
+
+def test_failed_job_is_retried(worker, redis_client):
+    job_id = enqueue('tests.flaky', 21)
+
+    assert worker.claim() == job_id
+    assert get_job(job_id)['status'] == 'running'
+    assert get_job(job_id)['attempts'] == 1
+    assert redis_client.zscore(RUNNING_KEY, job_id) is not None
+    assert worker.claim() is None
+
+    worker.execute(job_id)
+    assert get_job(job_id)['status'] == 'retrying'
+    assert get_job(job_id)['error'] == "first attempt fails"
+    assert redis_client.zscore(DELAYED_KEY, job_id) > time.time()
+    assert redis_client.zscore(RUNNING_KEY, job_id) is None
+
+    # Not due yet
+    jobs._requeue_due(time.time())
+    assert worker.claim() is None
+
+    _due(DELAYED_KEY, job_id, redis_client)
+    assert get_job(job_id)['status'] == 'queued'
+    assert worker.claim() == job_id
+    worker.execute(job_id)
+
+    result = get_job(job_id)
+    assert result['status'] == 'succeeded'
+    assert result['attempts'] == 2
+    assert result['result'] == 42
+    assert calls == [21, 21]
+    assert not redis_client.zcard(DELAYED_KEY)
+    assert not redis_client.zcard(RUNNING_KEY)
+
+
+def test_claim_takes_higher_priority_first(worker):
+    low = enqueue('tests.noop', priority='low')
+    high = enqueue('tests.noop', priority='high')
+    assert worker.claim() == high
+    assert worker.claim() == low
+
+
+def test_lost_job_is_requeued_then_failed(worker, redis_client):
+    job_id = enqueue('tests.noop')
+
+    # The worker dies on the first attempt: the job is claimed again
+    assert worker.claim() == job_id
+    _due(RUNNING_KEY, job_id, redis_client)
+    assert get_job(job_id)['status'] == 'queued'
+
+    # ... and on the last allowed one: the job fails
+    assert worker.claim() == job_id
+    _due(RUNNING_KEY, job_id, redis_client)
+    result = get_job(job_id)
+    assert result['status'] == 'failed'
+    assert result['attempts'] == 2
+    assert worker.claim() is None
+
+
+def test_burst_run_waits_for_retries(worker, monkeypatch):
+    monkeypatch.setattr(jobs, 'BACKOFF_BASE', 0)
+    job_id = enqueue('tests.flaky', 1)
+    worker.run(burst=True)
+    assert get_job(job_id)['status'] == 'succeeded'
+    assert calls == [1, 1]
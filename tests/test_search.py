@@ -0,0 +1,97 @@
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from app.search import UserSearchIndex
+
+
+def _user(username, email=None, name=None):
+    return SimpleNamespace(id=uuid.uuid4(), username=username, email=email, name=name)
+
+
+def test_memory_index_ranks_exact_before_prefix():
+    index = UserSearchIndex()
+    prefix = _user('annabel', 'annabel@example.com')
+    exact = _user('anna', 'anna@example.com')
+    by_name = _user('zed', 'zed@example.com', 'Anna Smith')
+    other = _user('bob', 'bob@example.com')
+    for user in (prefix, exact, by_name, other):
+        index.add(user)
+
+    assert index.search('anna') == [exact, prefix, by_name]
+    assert index.search('anna', limit=1) == [exact]
+
+
+def test_memory_index_filters_by_organization():
+    index = UserSearchIndex()
+    member, outsider = _user('anna'), _user('annabel')
+    index.add(member)
+    index.add(outsider)
+    organization_id = uuid.uuid4()
+    index.add_membership(member.id, organization_id)
+
+    assert index.search('ann', organization_id) == [member]
+    assert index.search('ann', str(organization_id)) == [member]
+    assert index.search('ann', uuid.uuid4()) == []
+
+
+@pytest.fixture
+def users(app_context):
+    """Users sharing a random prefix, removed again afterwards."""
+    from app.database import db, User
+    tag = uuid.uuid4().hex[:8]
+    created = {
+        'exact': User(username=f't{tag}', email=f't{tag}@example.com'),
+        'prefix': User(username=f't{tag}-b', email=f't{tag}-b@example.com'),
+        'infix': User(username=f'x-t{tag}', email=f'x-t{tag}@example.com'),
+    }
+    db.session.add_all(created.values())
+    db.session.commit()
+    yield f't{tag}', created
+    db.session.rollback()
+    User.query.filter(User.id.in_([u.id for u in created.values()])).delete()
+    db.session.commit()
+
+
+def test_search_users_ranks_exact_before_prefix(app, users):
+    from app.search import search_users
+    query, created = users
+    results = search_users(query.upper())
+    assert results[:2] == [created['exact'], created['prefix']]
+
+
+def test_search_users_ranks_trigram_matches_last(app, users):
+    from app.search import has_trigram, search_users
+    if not has_trigram():
+        pytest.skip("pg_trgm is not installed")
+    query, created = users
+    assert search_users(query) == [created['exact'], created['prefix'], created['infix']]
+
+
+def test_memory_index_is_dropped_on_commit(app, users, monkeypatch):
+    from app.database import db, User
+    from app.search import search_users
+    monkeypatch.setitem(app.config, 'USER_SEARCH_BACKEND', 'memory')
+    query, created = users
+    app.extensions.pop('user_search_index', None)
+
+    assert search_users(query)[:2] == [created['exact'], created['prefix']]
+    assert 'user_search_index' in app.extensions
+
+    # A rolled-back write keeps the index
+    db.session.add(User(username=f'{query}-rolled-back'))
+    db.session.flush()
+    db.session.rollback()
+    assert 'user_search_index' in app.extensions
+
+    late = User(username=f'{query}-c', email=f'{query}-c@example.com')
+    db.session.add(late)
+    db.session.commit()
+    try:
+        assert 'user_search_index' not in app.extensions
+        assert late in search_users(query)
+    finally:
+        db.session.delete(late)
+        db.session.commit()
+        app.extensions.pop('user_search_index', None)